@@ -0,0 +1,226 @@
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from concurrency import ConcurrencyLimiter, Overloaded
+
+# Per-user and per-IP token buckets: sustained requests per second and burst.
+# A request's class decides how many tokens it takes.
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "1"))
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "20"))
+ADMISSION_IP_RATE = float(os.getenv("ADMISSION_IP_RATE", "5"))
+ADMISSION_IP_BURST = float(os.getenv("ADMISSION_IP_BURST", "60"))
+# Identities tracked at once; the least recently seen bucket is dropped
+ADMISSION_MAX_KEYS = int(os.getenv("ADMISSION_MAX_KEYS", "50000"))
+# Only the backend calls the agent, so its forwarded identity headers are
+# trusted; turn off if the agent is ever exposed directly
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "true").lower() == "true"
+
+USER_HEADER = b"x-user-id"
+FORWARDED_FOR_HEADER = b"x-forwarded-for"
+
+
+def _class_config(name: str, concurrency: int, queue: int, deadline: float, cost: float) -> Dict[str, float]:
+    prefix = f"ADMISSION_{name.upper()}_"
+    return {
+        "concurrency": int(os.getenv(prefix + "CONCURRENCY", str(concurrency))),
+        "queue": int(os.getenv(prefix + "QUEUE", str(queue))),
+        "deadline": float(os.getenv(prefix + "DEADLINE", str(deadline))),
+        "cost": float(os.getenv(prefix + "COST", str(cost)))
+    }
+
+
+# Priority classes: requests served at once, requests allowed to wait, the
+# longest a request may wait for a slot, and tokens taken from its buckets
+PRIORITY_CLASSES = {
+    "interactive": _class_config("interactive", 64, 128, 2.0, 1),
+    "plan": _class_config("plan", 16, 32, 5.0, 2),
+    "batch": _class_config("batch", 2, 4, 10.0, 5)
+}
+
+# Routes outside this map (health, metrics, stats) are never limited
+ROUTE_CLASSES = {
+    ("POST", "/chat"): "interactive",
+    ("POST", "/chat/stream"): "interactive",
+    ("POST", "/generate-plan"): "plan",
+    ("POST", "/generate-plan/stream"): "plan",
+    ("POST", "/generate-plan/days"): "plan",
+    ("POST", "/plan-jobs"): "plan",
+    ("POST", "/generate-plan/batch"): "batch",
+    ("POST", "/classify"): "batch"
+}
+
+
+class TokenBuckets:
+    """
+    One token bucket per key, refilled lazily on access. The number of keys
+    is bounded; a dropped bucket comes back full, which only ever errs in
+    the caller's favour.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = ADMISSION_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> [tokens, last refill]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.limited = 0
+
+    def take(self, key: str, cost: float = 1.0) -> float:
+        """Take cost tokens; returns 0 if admitted, else seconds until it would be"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        self.limited += 1
+        return (cost - bucket[0]) / self.rate if self.rate > 0 else math.inf
+
+    def refund(self, key: str, cost: float = 1.0):
+        """Return tokens for a request that was admitted by this bucket but shed elsewhere"""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(self.burst, bucket[0] + cost)
+
+    def stats(self) -> Dict[str, float]:
+        return {"keys": len(self._buckets), "rate": self.rate, "burst": self.burst, "limited": self.limited}
+
+
+class AdmissionController:
+    """
+    Decides whether a request is served. The caller's user and IP buckets
+    must both hold the class's cost, then the request takes a slot in its
+    priority class. A class sheds with 429 as soon as its queue is full or
+    the expected wait exceeds its deadline, so an overloaded class answers
+    in milliseconds and never holds up the others.
+    """
+
+    def __init__(
+        self,
+        classes: Dict[str, Dict[str, float]] = PRIORITY_CLASSES,
+        user_buckets: Optional[TokenBuckets] = None,
+        ip_buckets: Optional[TokenBuckets] = None
+    ):
+        self.classes = classes
+        self.limiters = {
+            name: ConcurrencyLimiter(
+                f"admission:{name}",
+                max_in_flight=config["concurrency"],
+                max_queue=config["queue"],
+                queue_timeout=config["deadline"]
+            )
+            for name, config in classes.items()
+        }
+        self.user_buckets = user_buckets or TokenBuckets(ADMISSION_USER_RATE, ADMISSION_USER_BURST)
+        self.ip_buckets = ip_buckets or TokenBuckets(ADMISSION_IP_RATE, ADMISSION_IP_BURST)
+        self.admitted: Dict[str, int] = {name: 0 for name in classes}
+        # (class, reason) -> count
+        self.shed: Dict[Tuple[str, str], int] = {}
+
+    def _shed(self, priority: str, reason: str, retry_after: float) -> Overloaded:
+        self.shed[(priority, reason)] = self.shed.get((priority, reason), 0) + 1
+        return Overloaded(f"{priority} requests are being {reason}", retry_after, status_code=429)
+
+    def check_rate(self, priority: str, user: Optional[str], ip: Optional[str]):
+        """Charge the caller's buckets; raises Overloaded (429) when either is empty"""
+        cost = self.classes[priority]["cost"]
+        charged: List[Tuple[TokenBuckets, str]] = []
+        for buckets, key in ((self.user_buckets, user), (self.ip_buckets, ip)):
+            if not key:
+                continue
+            wait = buckets.take(key, cost)
+            if wait:
+                for charged_buckets, charged_key in charged:
+                    charged_buckets.refund(charged_key, cost)
+                raise self._shed(priority, "rate limited", wait)
+            charged.append((buckets, key))
+
+    async def acquire(self, priority: str) -> ConcurrencyLimiter:
+        """Take a slot in the class, or raise Overloaded (429) without waiting out a hopeless queue"""
+        limiter = self.limiters[priority]
+        deadline = self.classes[priority]["deadline"]
+        if limiter.in_flight >= limiter.max_in_flight and limiter.retry_after() > deadline:
+            raise self._shed(priority, "shed", limiter.retry_after())
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            raise self._shed(priority, "shed", e.retry_after) from e
+        self.admitted[priority] += 1
+        return limiter
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "classes": {
+                name: dict(self.limiters[name].stats(), admitted=self.admitted[name], deadline=config["deadline"])
+                for name, config in self.classes.items()
+            },
+            "users": self.user_buckets.stats(),
+            "ips": self.ip_buckets.stats()
+        }
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1").strip() or None
+    return None
+
+
+def request_identity(scope) -> Tuple[Optional[str], Optional[str]]:
+    """(user id, client IP) of a request, preferring headers forwarded by the backend"""
+    user = ip = None
+    if ADMISSION_TRUST_FORWARDED:
+        user = _header(scope, USER_HEADER)
+        forwarded = _header(scope, FORWARDED_FOR_HEADER)
+        if forwarded:
+            # The original client is the first hop
+            ip = forwarded.split(",")[0].strip()
+    if not ip and scope.get("client"):
+        ip = scope["client"][0]
+    return user, ip
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware applying an AdmissionController to the routes in
+    ROUTE_CLASSES. The class slot is held until the response (including a
+    streamed body) is finished; shed requests get 429 with Retry-After.
+    """
+
+    def __init__(self, app, controller: AdmissionController, routes: Dict[Tuple[str, str], str] = ROUTE_CLASSES):
+        self.app = app
+        self.controller = controller
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        priority = self.routes.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            user, ip = request_identity(scope)
+            self.controller.check_rate(priority, user, ip)
+            limiter = await self.controller.acquire(priority)
+        except Overloaded as e:
+            await self.reject(send, e)
+            return
+        async with limiter.held():
+            await self.app(scope, receive, send)
+
+    async def reject(self, send, error: Overloaded):
+        body = json.dumps({"detail": str(error)}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        headers += [(name.lower().encode(), value.encode()) for name, value in error.headers.items()]
+        await send({"type": "http.response.start", "status": error.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,213 @@
+"""
+Local stand-ins for Ollama and Tavily used by the load benchmarks, with
+configurable latency, token rate and failure injection.
+
+Run standalone from the ai-agent directory:
+    python -m benchmarks.fakes --ollama-port 11535 --tavily-port 11536 --token-rate 40
+then point the agent at them with
+    OLLAMA_HOST=http://127.0.0.1:11535 TAVILY_SEARCH_URL=http://127.0.0.1:11536/search
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# A schema-valid plan, streamed back by the fake Ollama in small chunks
+SAMPLE_PLAN = {
+    "day_by_day_plan": [
+        {
+            "day": f"Day {day}",
+            "morning": "Coffee and a walk through the old town",
+            "afternoon": "Museum visit followed by a food market",
+            "evening": "Dinner at a local bistro"
+        }
+        for day in range(1, 4)
+    ],
+    "activity_cards": [
+        {
+            "title": "Historical Walking Tour",
+            "address": "Old Town Center",
+            "price_tier": "Mid-range",
+            "duration": "3 hours",
+            "tags": ["history", "walking"],
+            "wheelchair_friendly": True,
+            "child_friendly": True
+        }
+    ],
+    "restaurant_recommendations": [
+        {
+            "name": "Harbor Bistro",
+            "cuisine": "Seafood",
+            "address": "Waterfront District",
+            "price_tier": "Mid-range",
+            "dietary_options": ["vegetarian"]
+        }
+    ],
+    "packing_checklist": ["Comfortable walking shoes", "Light jacket", "Reusable water bottle"]
+}
+
+# Output that fails validation at the first plan element
+INVALID_PLAN = '{"day_by_day_plan": [{"day": "Day 1", "notes": "missing fields"}]}'
+
+
+class FakeConfig:
+    """Behaviour of a fake backend"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        token_rate: float = 50.0,
+        chars_per_token: int = 4,
+        failure_rate: float = 0.0,
+        invalid_rate: float = 0.0,
+        seed: int = 7
+    ):
+        # Seconds before the first byte (model prefill / search round trip)
+        self.latency = latency
+        # Generated tokens per second, per request
+        self.token_rate = token_rate
+        self.chars_per_token = chars_per_token
+        # Share of requests answered with HTTP 500
+        self.failure_rate = failure_rate
+        # Share of Ollama generations that produce schema-invalid output
+        self.invalid_rate = invalid_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+
+    def should_fail(self) -> bool:
+        self.requests += 1
+        if self.random.random() < self.failure_rate:
+            self.failures += 1
+            return True
+        return False
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "failures": self.failures}
+
+
+def chunk_text(text: str, size: int) -> list:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def create_ollama_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        if not body.get("prompt"):
+            # Model load request (keep_alive warm-up)
+            return {"model": body.get("model"), "done": True}
+        if config.should_fail():
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+
+        invalid = config.random.random() < config.invalid_rate
+        text = INVALID_PLAN if invalid else json.dumps(SAMPLE_PLAN)
+        chunks = chunk_text(text, config.chars_per_token)
+        delay = 1.0 / config.token_rate if config.token_rate > 0 else 0.0
+
+        if not body.get("stream", True):
+            await asyncio.sleep(config.latency + delay * len(chunks))
+            return {"model": body.get("model"), "response": text, "done": True}
+
+        async def lines():
+            await asyncio.sleep(config.latency)
+            for chunk in chunks:
+                yield json.dumps({"response": chunk, "done": False}) + "\n"
+                if delay:
+                    await asyncio.sleep(delay)
+            yield json.dumps({"response": "", "done": True, "eval_count": len(chunks)}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/stats")
+    async def stats():
+        return config.stats()
+
+    return app
+
+
+def create_tavily_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake Tavily")
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        if config.should_fail():
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+        await asyncio.sleep(config.latency)
+        query = body.get("query", "")
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"Result {i + 1} for {query}",
+                    "url": f"https://example.com/{i + 1}",
+                    "content": f"Travel notes about {query}. " * 8
+                }
+                for i in range(body.get("max_results", 3))
+            ]
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return config.stats()
+
+    return app
+
+
+def make_server(app: FastAPI, port: int, host: str = "127.0.0.1"):
+    """uvicorn server for an app; run with `await server.serve()`, stop with should_exit"""
+    import uvicorn
+    return uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+
+
+def add_fake_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--ollama-port", type=int, default=11535)
+    parser.add_argument("--tavily-port", type=int, default=11536)
+    parser.add_argument("--ollama-latency", type=float, default=0.2,
+                        help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=50.0,
+                        help="generated tokens per second per request")
+    parser.add_argument("--ollama-failure-rate", type=float, default=0.0)
+    parser.add_argument("--ollama-invalid-rate", type=float, default=0.0,
+                        help="share of generations with schema-invalid output")
+    parser.add_argument("--tavily-latency", type=float, default=0.1)
+    parser.add_argument("--tavily-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def configs_from_args(args) -> tuple:
+    ollama = FakeConfig(
+        latency=args.ollama_latency,
+        token_rate=args.token_rate,
+        failure_rate=args.ollama_failure_rate,
+        invalid_rate=args.ollama_invalid_rate,
+        seed=args.seed
+    )
+    tavily = FakeConfig(latency=args.tavily_latency, failure_rate=args.tavily_failure_rate, seed=args.seed)
+    return ollama, tavily
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+    ollama, tavily = configs_from_args(args)
+
+    async def run():
+        await asyncio.gather(
+            make_server(create_ollama_app(ollama), args.ollama_port).serve(),
+            make_server(create_tavily_app(tavily), args.tavily_port).serve()
+        )
+
+    print(f"Fake Ollama on :{args.ollama_port}, fake Tavily on :{args.tavily_port}")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Microbenchmark: compiled single-pass intent classifier vs the original
+per-list keyword `any(...)` scans from generate_chat_response/chat_with_agent.
+
+Run from the ai-agent directory:
+    python -m benchmarks.intent_bench --messages 20000
+    python -m benchmarks.intent_bench --extra-phrases 500   # larger intent table
+
+Exits non-zero if any REGRESSION_CASES message is misclassified.
+"""
+import argparse
+import random
+import sys
+import time
+
+from intents import DEFAULT_INTENT_TABLE, IntentClassifier
+
+# Keyword lists exactly as the original substring implementation used them
+LEGACY_LISTS = {
+    "greeting": ["hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening"],
+    "plan": ["plan", "itinerary", "schedule", "activities", "what to do", "recommendations"],
+    "restaurant": ["restaurant", "food", "eat", "dining", "cafe", "cuisine", "where to eat"],
+    "weather": ["weather", "climate", "temperature", "rain", "sunny", "warm", "cold"],
+    "packing": ["pack", "bring", "packing list", "luggage", "what to pack"],
+    "event": ["event", "festival", "concert", "show", "happening"],
+    "plan_trigger": [
+        "plan", "itinerary", "schedule", "what to do", "activities",
+        "recommendations", "suggestions"
+    ]
+}
+
+SAMPLE_MESSAGES = [
+    "Hi there! Can you plan my trip?",
+    "What's the weather going to be like this weekend?",
+    "Where should we eat tonight? Something vegetarian please",
+    "Any concerts or festivals happening while we are there?",
+    "What should I pack for a family trip with two kids?",
+    "This apartment looks great, thanks",
+    "Give me some suggestions for activities near the beach",
+    "Is it going to rain? Should I bring an umbrella?",
+    "Good morning, I need restaurant recommendations for a birthday dinner",
+    "Can you build a three day itinerary that includes museums and art galleries?"
+]
+
+# Messages with known intents, including words that share a prefix with a
+# stem but are not one of its inflections
+REGRESSION_CASES = [
+    ("my plane lands at 9", set()),
+    ("we saw planets and plants on the walk", set()),
+    ("eventually we want to go to the coast", set()),
+    ("the package arrived at the apartment", set()),
+    ("Can you plan my trip?", {"plan"}),
+    ("We planned a lot and are still planning", {"plan"}),
+    ("Any tips for scheduling the museum days?", {"plan"}),
+    ("Send me the itineraries", {"plan"}),
+    ("I packed too much, what should I bring?", {"packing"}),
+    ("Are there events this weekend?", {"event"}),
+    ("Is it raining there?", {"weather"}),
+    ("We are eating out tonight", {"restaurant"}),
+    ("this is fine", set())
+]
+
+
+def check_regressions(classify) -> list:
+    """(message, expected, got) for every misclassified regression case"""
+    return [
+        (message, expected, classify(message))
+        for message, expected in REGRESSION_CASES
+        if classify(message) != expected
+    ]
+
+
+def legacy_classify(message: str, lists=LEGACY_LISTS) -> set:
+    message_lower = message.lower()
+    return {
+        intent for intent, keywords in lists.items()
+        if any(keyword in message_lower for keyword in keywords)
+    }
+
+
+def with_extra_phrases(table: dict, count: int) -> dict:
+    """Pad every intent with synthetic phrases to model a larger intent table"""
+    return {
+        intent: phrases + [f"{intent}{i}phrase" for i in range(count)]
+        for intent, phrases in table.items()
+    }
+
+
+def bench(fn, messages, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for message in messages:
+            fn(message)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--extra-phrases", type=int, default=0,
+                        help="synthetic phrases added to every intent")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    messages = [rng.choice(SAMPLE_MESSAGES) for _ in range(args.messages)]
+
+    legacy_lists = with_extra_phrases(LEGACY_LISTS, args.extra_phrases)
+    classifier = IntentClassifier(with_extra_phrases(DEFAULT_INTENT_TABLE, args.extra_phrases))
+
+    def legacy_classify_padded(message: str) -> set:
+        return legacy_classify(message, legacy_lists)
+
+    compiled_classify = classifier.classify
+
+    legacy = bench(legacy_classify_padded, messages, args.repeat)
+    compiled = bench(compiled_classify, messages, args.repeat)
+
+    print(f"messages: {args.messages}, best of {args.repeat}, "
+          f"extra phrases per intent: {args.extra_phrases}")
+    print(f"legacy any() scans : {legacy * 1e6 / args.messages:8.2f} us/msg")
+    print(f"compiled classifier: {compiled * 1e6 / args.messages:8.2f} us/msg")
+    print(f"speedup            : {legacy / compiled:8.2f}x")
+
+    disagreements = [m for m in SAMPLE_MESSAGES if legacy_classify(m) - {"plan_trigger"} != compiled_classify(m)]
+    for message in disagreements:
+        print(f"  differs: {message!r} legacy={sorted(legacy_classify(message))} compiled={sorted(compiled_classify(message))}")
+
+    failures = check_regressions(IntentClassifier(DEFAULT_INTENT_TABLE).classify)
+    for message, expected, got in failures:
+        print(f"  regression: {message!r} expected={sorted(expected)} got={sorted(got)}")
+    print(f"regression cases   : {len(REGRESSION_CASES) - len(failures)}/{len(REGRESSION_CASES)} passed")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
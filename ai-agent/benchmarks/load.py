@@ -0,0 +1,294 @@
+"""
+Load benchmark for the AI agent against local Ollama/Tavily stand-ins.
+
+Starts the fake backends in-process, launches the agent with uvicorn pointed
+at them, drives each scenario at the given concurrency and reports
+throughput and p50/p95/p99 latency. Streaming scenarios also report time to
+first event. Admission control is opened up on the started agent so the
+service is measured rather than the rate limiter; pass --admission to keep
+the production limits.
+
+Run from the ai-agent directory:
+    python -m benchmarks.load --concurrency 32 --requests 500
+    python -m benchmarks.load --ai-plans --token-rate 80 --ollama-invalid-rate 0.1
+    python -m benchmarks.load --output results/run.json --compare results/baseline.json
+    python -m benchmarks.load --target http://localhost:8000   # already running agent
+    python -m benchmarks.load --admission --scenarios plan      # with admission limits
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fakes import (
+    add_fake_arguments, configs_from_args, create_ollama_app, create_tavily_app, make_server
+)
+from benchmarks.report import finish, flag_rate_limited, latency_summary, print_table
+from admission import PRIORITY_CLASSES
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOCATIONS = [
+    "San Jose, CA", "San Francisco, CA", "New York, NY", "Austin, TX", "Seattle, WA",
+    "Chicago, IL", "Miami, FL", "Denver, CO", "Boston, MA", "Portland, OR"
+]
+INTERESTS = ["food", "culture", "history", "nature", "art", "shopping", "nightlife"]
+MESSAGES = [
+    "Hi! Can you plan my trip?",
+    "Where should we eat tonight? Something vegetarian please",
+    "What's the weather going to be like?",
+    "What should I pack for a family trip?",
+    "Any festivals or concerts happening?",
+    "Give me an itinerary with museums and food markets"
+]
+
+
+class Workload:
+    """Deterministic request variants; `distinct` bounds how often the caches can hit"""
+
+    def __init__(self, distinct: int, seed: int):
+        rng = random.Random(seed)
+        start = date(2025, 6, 1)
+        self.plans = []
+        for i in range(distinct):
+            check_in = start + timedelta(days=rng.randrange(60))
+            self.plans.append({
+                "booking_context": {
+                    "location": LOCATIONS[i % len(LOCATIONS)],
+                    "start_date": check_in.isoformat(),
+                    "end_date": (check_in + timedelta(days=rng.randint(1, 5))).isoformat(),
+                    "party_type": rng.choice(["couple", "family", "solo", "friends"])
+                },
+                "preferences": {
+                    "budget": rng.choice(["Budget", "Mid-range", "Luxury"]),
+                    "interests": rng.sample(INTERESTS, 2),
+                    "dietary_filters": rng.choice([[], ["vegetarian"], ["vegan"]])
+                }
+            })
+
+    def plan(self, i: int) -> Dict:
+        return self.plans[i % len(self.plans)]
+
+    def chat(self, i: int) -> Dict:
+        return {
+            "user_message": MESSAGES[i % len(MESSAGES)],
+            "booking_context": self.plan(i)["booking_context"]
+        }
+
+
+# A request function returns (ok, status, seconds to first event or None)
+RequestFn = Callable[[httpx.AsyncClient, int], Awaitable[Tuple[bool, int, Optional[float]]]]
+
+
+def json_request(path: str, body: Callable[[int], Dict]) -> RequestFn:
+    async def send(client: httpx.AsyncClient, i: int):
+        response = await client.post(path, json=body(i))
+        return response.status_code < 400, response.status_code, None
+    return send
+
+
+def stream_request(path: str, body: Callable[[int], Dict]) -> RequestFn:
+    async def send(client: httpx.AsyncClient, i: int):
+        started = time.perf_counter()
+        first_event = None
+        async with client.stream("POST", path, json=body(i)) as response:
+            async for line in response.aiter_lines():
+                if first_event is None and line.startswith("event:"):
+                    first_event = time.perf_counter() - started
+        return response.status_code < 400, response.status_code, first_event
+    return send
+
+
+def build_scenarios(workload: Workload, batch_size: int) -> Dict[str, RequestFn]:
+    return {
+        "chat": json_request("/chat", workload.chat),
+        "chat-stream": stream_request("/chat/stream", workload.chat),
+        "plan": json_request("/generate-plan", workload.plan),
+        "plan-stream": stream_request("/generate-plan/stream", workload.plan),
+        "plan-batch": json_request(
+            "/generate-plan/batch",
+            lambda i: {"requests": [workload.plan(i * batch_size + j) for j in range(batch_size)]}
+        ),
+        "classify": json_request(
+            "/classify",
+            lambda i: {"messages": [MESSAGES[(i + j) % len(MESSAGES)] for j in range(batch_size)]}
+        )
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, send: RequestFn, requests: int,
+                       concurrency: int, warmup: int) -> Dict:
+    for i in range(warmup):
+        try:
+            await send(client, i)
+        except Exception:
+            pass
+
+    latencies: List[float] = []
+    first_events: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    next_index = [0]
+
+    async def worker():
+        nonlocal errors
+        while next_index[0] < requests:
+            i = next_index[0]
+            next_index[0] += 1
+            started = time.perf_counter()
+            try:
+                ok, status, first_event = await send(client, warmup + i)
+            except Exception as e:
+                ok, status, first_event = False, type(e).__name__, None
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if first_event is not None:
+                first_events.append(first_event)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "statuses": statuses
+    }
+    result.update(latency_summary(latencies))
+    if first_events:
+        result["first_event"] = latency_summary(first_events)
+    return result
+
+
+def unlimited_admission() -> Dict[str, str]:
+    """Environment lifting every admission limit well above what a run can reach"""
+    env = {
+        "ADMISSION_USER_RATE": "1000000", "ADMISSION_USER_BURST": "1000000",
+        "ADMISSION_IP_RATE": "1000000", "ADMISSION_IP_BURST": "1000000"
+    }
+    for name in PRIORITY_CLASSES:
+        prefix = f"ADMISSION_{name.upper()}_"
+        env.update({prefix + "CONCURRENCY": "100000", prefix + "QUEUE": "100000", prefix + "DEADLINE": "3600"})
+    return env
+
+
+def start_agent(port: int, args) -> subprocess.Popen:
+    env = dict(os.environ)
+    if not args.admission:
+        env.update(unlimited_admission())
+    env.update({
+        "OLLAMA_HOST": f"http://127.0.0.1:{args.ollama_port}",
+        "TAVILY_API_KEY": "benchmark",
+        "TAVILY_SEARCH_URL": f"http://127.0.0.1:{args.tavily_port}/search",
+        "AI_PLANS_ENABLED": "true" if args.ai_plans else "false",
+        "WARMUP_RETRY_INITIAL": "0.2"
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=AGENT_DIR, env=env, stdout=subprocess.DEVNULL if args.quiet else None
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"agent not ready after {timeout:.0f}s")
+
+
+async def run(args) -> Dict:
+    ollama_config, tavily_config = configs_from_args(args)
+    servers = []
+    agent = None
+    target = args.target
+    if not target:
+        servers = [
+            make_server(create_ollama_app(ollama_config), args.ollama_port),
+            make_server(create_tavily_app(tavily_config), args.tavily_port)
+        ]
+        server_tasks = [asyncio.create_task(server.serve()) for server in servers]
+        agent = start_agent(args.agent_port, args)
+        target = f"http://127.0.0.1:{args.agent_port}"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    try:
+        async with httpx.AsyncClient(base_url=target, timeout=args.timeout, limits=limits) as client:
+            await wait_ready(client, args.startup_timeout)
+            scenarios = build_scenarios(Workload(args.distinct, args.seed), args.batch_size)
+            for name in args.scenarios.split(","):
+                name = name.strip()
+                if name not in scenarios:
+                    raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(scenarios)}")
+                print(f"Running {name}: {args.requests} requests at concurrency {args.concurrency}")
+                results[name] = await run_scenario(
+                    client, scenarios[name], args.requests, args.concurrency, args.warmup
+                )
+    finally:
+        if agent:
+            agent.terminate()
+            agent.wait(timeout=10)
+        for server in servers:
+            server.should_exit = True
+        if servers:
+            await asyncio.gather(*server_tasks)
+    if not args.target:
+        results["_backends"] = {"ollama": ollama_config.stats(), "tavily": tavily_config.stats()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="chat,plan,plan-stream,plan-batch,classify",
+                        help="comma-separated: chat, chat-stream, plan, plan-stream, plan-batch, classify")
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--distinct", type=int, default=50, help="distinct booking contexts in the workload")
+    parser.add_argument("--batch-size", type=int, default=20, help="items per batch/classify request")
+    parser.add_argument("--ai-plans", action="store_true", help="run the agent with AI_PLANS_ENABLED=true")
+    parser.add_argument("--admission", action="store_true",
+                        help="keep the agent's admission limits instead of lifting them")
+    parser.add_argument("--target", help="benchmark an already running agent instead of starting one")
+    parser.add_argument("--agent-port", type=int, default=18000)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--quiet", action="store_true", help="hide the agent's own output")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change counted as a regression (default 0.1)")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    flag_rate_limited(results)
+    print()
+    print_table(
+        {name: row for name, row in results.items() if not name.startswith("_")},
+        ["throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"]
+    )
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    sys.exit(finish("load", config, results, args.output, args.compare, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Microbenchmarks for the agent's in-process hot paths: generate_chat_response,
+generate_mock_travel_plan_detailed and plan serialization.
+
+Run from the ai-agent directory:
+    python -m benchmarks.micro --iterations 2000
+    python -m benchmarks.micro --output results/micro.json --compare results/micro-baseline.json
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Keep the agent's module-level clients offline while benchmarking
+os.environ.pop("TAVILY_API_KEY", None)
+
+from benchmarks.load import MESSAGES, Workload  # noqa: E402
+from benchmarks.report import finish, print_table  # noqa: E402
+
+
+def best_of(fn, iterations: int, repeat: int) -> float:
+    """Best wall time per call across `repeat` runs of `iterations` calls"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for i in range(iterations):
+            fn(i)
+        best = min(best, (time.perf_counter() - started) / iterations)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    import main as agent
+
+    workload = Workload(args.distinct, args.seed)
+    plan_requests = [agent.AgentRequest(**workload.plan(i)) for i in range(args.distinct)]
+    chats = [workload.chat(i) for i in range(args.distinct)]
+    local_info = "\nLocal guide: " + "Markets, museums and waterfront walks. " * 10
+    loop = asyncio.new_event_loop()
+
+    def chat_response(i: int):
+        chat = chats[i % len(chats)]
+        loop.run_until_complete(agent.generate_chat_response(
+            MESSAGES[i % len(MESSAGES)], chat["booking_context"], local_info, []
+        ))
+
+    def mock_plan(i: int):
+        agent.generate_mock_travel_plan_detailed(plan_requests[i % len(plan_requests)], local_info)
+
+    sample_plans = [agent.generate_mock_travel_plan_detailed(request, local_info) for request in plan_requests]
+
+    def encode_plan(i: int):
+        agent.CachedPlan.from_plan(sample_plans[i % len(sample_plans)])
+
+    def classify(i: int):
+        agent.intent_classifier.classify(MESSAGES[i % len(MESSAGES)])
+
+    benchmarks = {
+        "generate_chat_response": chat_response,
+        "generate_mock_travel_plan_detailed": mock_plan,
+        "plan_encode": encode_plan,
+        "intent_classify": classify
+    }
+    results = {}
+    for name, fn in benchmarks.items():
+        per_call = best_of(fn, args.iterations, args.repeat)
+        results[name] = {"us_per_call": round(per_call * 1e6, 3), "calls_per_s": round(1 / per_call, 1)}
+    loop.close()
+
+    print(f"best of {args.repeat} x {args.iterations} calls")
+    print_table(results, ["us_per_call", "calls_per_s"])
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    sys.exit(finish("micro", config, results, args.output, args.compare, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Result summaries, JSON output and regression comparison shared by the benchmarks"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of an already sorted list (q in 0..100)"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """Latency distribution in milliseconds"""
+    values = sorted(seconds)
+    if not values:
+        return {}
+    return {
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3)
+    }
+
+
+def environment() -> Dict[str, str]:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except Exception:
+        revision = ""
+    return {
+        "git_revision": revision,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": str(os.cpu_count()),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    }
+
+
+def write_results(path: str, kind: str, config: Dict, results: Dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"kind": kind, "environment": environment(), "config": config, "results": results},
+            f, indent=2, sort_keys=True
+        )
+    print(f"Results written to {path}")
+
+
+# Metrics compared between runs and whether higher values are better
+COMPARED_METRICS = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "error_rate": False,
+    "us_per_call": False
+}
+
+
+# Share of 429 responses above which a scenario measured the rate limiter
+# rather than the service
+RATE_LIMITED_SHARE = 0.5
+
+
+def flag_rate_limited(results: Dict) -> List[str]:
+    """
+    Mark (and warn about) scenarios whose responses were mostly 429; their
+    latency and throughput figures are not comparable with other runs.
+    """
+    flagged = []
+    for name, row in results.items():
+        statuses = row.get("statuses") if isinstance(row, dict) else None
+        if not statuses:
+            continue
+        share = statuses.get("429", 0) / sum(statuses.values())
+        row["rate_limited"] = share > RATE_LIMITED_SHARE
+        if row["rate_limited"]:
+            flagged.append(name)
+            print(f"WARNING: {name}: {share:.0%} of responses were 429; the run measured admission control")
+    return flagged
+
+
+def compare(results: Dict, baseline_path: str, threshold: float) -> List[str]:
+    """
+    Compare results with a saved run and print the deltas. Returns the
+    regressions, i.e. metrics that got worse by more than `threshold` (0.1 = 10%).
+    Scenarios flagged as rate limited in either run are skipped.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    print(f"\nCompared with {baseline_path}:")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current.get("rate_limited") or previous.get("rate_limited"):
+            print(f"  {name:36} skipped: rate limited")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > threshold else ""
+            print(f"  {name:36} {metric:15} {old:12.3f} -> {new:12.3f} ({change:+.1%}){flag}")
+            if flag:
+                regressions.append(f"{name} {metric} {change:+.1%}")
+    return regressions
+
+
+def print_table(results: Dict, columns: List[str]):
+    print(f"{'':36}" + "".join(f"{column:>15}" for column in columns))
+    for name, row in results.items():
+        cells = "".join(
+            f"{row[column]:>15.3f}" if isinstance(row.get(column), float) else f"{str(row.get(column, '')):>15}"
+            for column in columns
+        )
+        print(f"{name:36}{cells}")
+
+
+def finish(kind: str, config: Dict, results: Dict, output: Optional[str],
+           baseline: Optional[str], threshold: float) -> int:
+    """Write and compare results; returns the process exit code"""
+    if output:
+        write_results(output, kind, config, results)
+    if baseline:
+        regressions = compare(results, baseline, threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {threshold:.0%}")
+            return 1
+    return 0
@@ -0,0 +1,152 @@
+import asyncio
+import os
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+# "memory" runs jobs inside this process; "kafka" uses KAFKA_BROKERS like the
+# Node services (services/shared/kafka-*.js)
+JOB_BROKER = os.getenv("JOB_BROKER", "memory")
+KAFKA_BROKERS = os.getenv("KAFKA_BROKERS", "localhost:9092")
+KAFKA_CLIENT_ID = os.getenv("KAFKA_CLIENT_ID", "ai-agent")
+
+
+class Message:
+    __slots__ = ("topic", "key", "value")
+
+    def __init__(self, topic: str, key: str, value: bytes):
+        self.topic = topic
+        self.key = key
+        self.value = value
+
+
+class InMemoryBroker:
+    """
+    Local stand-in for Kafka with the same delivery model: every consumer
+    group receives each message once, and consumers in a group share the
+    work. Messages published before any group subscribes are held for the
+    first one, like a topic read from the earliest offset. A subscriber
+    without a group receives every message published while it is attached.
+    """
+
+    def __init__(self):
+        self._groups: Dict[str, Dict[str, asyncio.Queue]] = {}
+        self._backlog: Dict[str, List[Message]] = {}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, topic: str, key: str, value: bytes):
+        message = Message(topic, key, value)
+        groups = self._groups.get(topic)
+        if not groups:
+            self._backlog.setdefault(topic, []).append(message)
+            return
+        for queue in groups.values():
+            queue.put_nowait(message)
+
+    async def subscribe(self, topic: str, group_id: Optional[str], from_beginning: bool = True) -> AsyncIterator[Message]:
+        groups = self._groups.setdefault(topic, {})
+        key = group_id if group_id is not None else object()
+        queue = groups.get(key)
+        if queue is None:
+            queue = groups[key] = asyncio.Queue()
+            if from_beginning:
+                for message in self._backlog.pop(topic, []):
+                    queue.put_nowait(message)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            if group_id is None:
+                groups.pop(key, None)
+
+
+class KafkaBroker:
+    """Kafka via aiokafka, imported on start so the memory broker needs no client"""
+
+    def __init__(self, brokers: str = KAFKA_BROKERS, client_id: str = KAFKA_CLIENT_ID):
+        self.brokers = brokers.split(",")
+        self.client_id = client_id
+        self._producer = None
+
+    async def start(self):
+        from aiokafka import AIOKafkaProducer
+        self._producer = AIOKafkaProducer(bootstrap_servers=self.brokers, client_id=self.client_id)
+        await self._producer.start()
+
+    async def stop(self):
+        if self._producer:
+            await self._producer.stop()
+
+    async def publish(self, topic: str, key: str, value: bytes):
+        await self._producer.send_and_wait(topic, value, key=key.encode("utf-8"))
+
+    async def subscribe(self, topic: str, group_id: Optional[str], from_beginning: bool = True) -> AsyncIterator[Message]:
+        """
+        Consume a topic in a consumer group; without a group the consumer
+        reads every partition and commits no offsets, so nothing is left
+        behind on the cluster when the process goes away
+        """
+        from aiokafka import AIOKafkaConsumer
+        consumer = AIOKafkaConsumer(
+            topic,
+            bootstrap_servers=self.brokers,
+            client_id=self.client_id,
+            group_id=group_id,
+            enable_auto_commit=group_id is not None,
+            auto_offset_reset="earliest" if from_beginning else "latest"
+        )
+        await consumer.start()
+        try:
+            async for record in consumer:
+                key = record.key.decode("utf-8") if record.key else ""
+                yield Message(record.topic, key, record.value)
+        finally:
+            await consumer.stop()
+
+
+def open_broker(kind: str = JOB_BROKER):
+    if kind == "memory":
+        return InMemoryBroker()
+    if kind == "kafka":
+        return KafkaBroker()
+    raise ValueError(f"Unknown job broker '{kind}'")
+
+
+async def follow(
+    broker,
+    topic: str,
+    group_id: Optional[str],
+    handler,
+    from_beginning: bool = False,
+    on_state: Optional[Callable[[bool], None]] = None
+):
+    """
+    Pass every message on a topic to an async handler, resubscribing with
+    backoff when the consumer fails (e.g. Kafka not reachable yet).
+    on_state(False) is called when the consumer fails and on_state(True)
+    when it resubscribes.
+    """
+    delay = 1.0
+    while True:
+        try:
+            async for message in broker.subscribe(topic, group_id, from_beginning=from_beginning):
+                delay = 1.0
+                try:
+                    await handler(message)
+                except Exception as e:
+                    print(f"Error handling message from {topic}: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Consumer for {topic} failed: {e}, retrying in {delay:g}s")
+        else:
+            print(f"Consumer for {topic} stopped, retrying in {delay:g}s")
+        if on_state:
+            on_state(False)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 30.0)
+        if on_state:
+            on_state(True)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+def normalize_key_part(value: str) -> str:
+    """Lowercase and collapse whitespace so equivalent inputs share a key"""
+    return " ".join((value or "").lower().split())
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with TTL expiry and LRU eviction.
+    Concurrent misses for the same key are coalesced (single-flight) so only
+    one loader runs upstream and every waiter receives its result.
+    With a shared tier, local misses are looked up there before loading and
+    loaded values are written back, so other worker processes reuse them.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 900.0, shared=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value, or None on miss/expiry"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        cache_if: Callable[[Any], bool] = bool
+    ) -> Any:
+        """
+        Return the cached value for key, running loader on a miss.
+        Only results accepted by cache_if are stored, so failures are retried.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            # Shield so one waiter timing out does not cancel the shared load
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        # Remaining lifetime of a value taken from the shared tier
+        ttl: list = [None]
+
+        async def load() -> Any:
+            if self.shared is not None:
+                entry = await self.shared.get(key)
+                if entry is not None:
+                    ttl[0] = entry[1]
+                    return entry[0]
+            value = await loader()
+            if self.shared is not None and cache_if(value):
+                self.shared.set(key, value, self.ttl_seconds)
+            return value
+
+        future = asyncio.ensure_future(load())
+        self._inflight[key] = future
+
+        def _complete(done: asyncio.Future):
+            # Runs even if every waiter was cancelled, so the load is not wasted
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            if not done.cancelled() and done.exception() is None and cache_if(done.result()):
+                self.set(key, done.result(), ttl[0])
+
+        future.add_done_callback(_complete)
+        return await asyncio.shield(future)
+
+    def loading(self, key: Hashable) -> bool:
+        """True while a load for key is running"""
+        return key in self._inflight
+
+    def store(self, key: Hashable, value: Any):
+        """Set a value locally and in the shared tier"""
+        self.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value, self.ttl_seconds)
+
+    def clear(self):
+        """Clear the local entries (the shared tier is left alone)"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "in_flight": len(self._inflight),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        if self.shared is not None:
+            stats["shared"] = self.shared.stats()
+        return stats
@@ -0,0 +1,229 @@
+import heapq
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CATALOG_PATH = os.getenv("CATALOG_PATH")
+
+# Entries under this city key apply to every location
+GENERIC_CITY = "*"
+
+DIETARY_FLAGS = {
+    "vegetarian": 1 << 0,
+    "vegan": 1 << 1,
+    "gluten-free": 1 << 2,
+    "dairy-free": 1 << 3,
+    "nut-free": 1 << 4,
+    "halal": 1 << 5,
+    "kosher": 1 << 6,
+    "pescatarian": 1 << 7
+}
+
+WHEELCHAIR = 1 << 0
+CHILD_FRIENDLY = 1 << 1
+
+# Built-in generic catalog, used when no CATALOG_PATH is configured and as a
+# fallback layer for cities the catalog does not cover
+DEFAULT_ACTIVITIES = [
+    {"title": "Cultural Museum Tour", "area": "Museum District", "duration": "2-3 hours", "tags": ["culture", "history", "indoor"]},
+    {"title": "Food Market Experience", "area": "Local Market Square", "duration": "1-2 hours", "tags": ["food", "shopping", "local"]},
+    {"title": "Historical Walking Tour", "area": "Old Town Center", "duration": "3-4 hours", "tags": ["history", "walking", "sightseeing"]},
+    {"title": "Art Gallery Visit", "area": "Arts Quarter", "duration": "2 hours", "tags": ["art", "culture", "indoor"]},
+    {"title": "Scenic Viewpoint", "area": "City Overlook", "duration": "1 hour", "tags": ["nature", "photography", "scenic"]},
+    {"title": "Local Food Tour", "area": "Restaurant Quarter", "duration": "2-3 hours", "tags": ["food", "culture", "local"]}
+]
+
+DEFAULT_RESTAURANTS = [
+    {"cuisine": cuisine, "area": "Restaurant District"}
+    for cuisine in ["Italian", "Local", "Mediterranean", "Asian Fusion", "French", "Seafood", "Farm-to-Table"]
+]
+
+
+def city_key(location: str) -> str:
+    """Catalog key for a location: the city part, lowercased"""
+    city = location.split(",")[0] if "," in location else location
+    return " ".join(city.lower().split())
+
+
+def dietary_mask(options: Iterable[str]) -> int:
+    mask = 0
+    for option in options:
+        mask |= DIETARY_FLAGS.get(option.strip().lower(), 0)
+    return mask
+
+
+class CatalogEntry:
+    """
+    One activity or restaurant. Masks are None when the source did not say,
+    in which case callers fall back to request-derived defaults.
+    """
+
+    __slots__ = (
+        "city", "title", "area", "duration", "cuisine", "price_tier", "tags",
+        "popularity", "order", "dietary_options", "dietary_mask", "access_mask"
+    )
+
+    def __init__(self, city: str, data: Dict, order: int):
+        self.city = city
+        # Coerced to str here since plans are built from entries without
+        # re-validation
+        self.title = str(data.get("title") or data.get("name") or "")
+        self.area = str(data.get("area") or data.get("address") or "")
+        self.duration = str(data.get("duration", ""))
+        self.cuisine = str(data.get("cuisine", ""))
+        price_tier = data.get("price_tier")
+        self.price_tier = str(price_tier) if price_tier is not None else None
+        self.tags = tuple(str(tag).lower() for tag in data.get("tags", []))
+        self.popularity = float(data.get("popularity", 0.0))
+        self.order = order
+        options = data.get("dietary_options")
+        self.dietary_options = [str(option) for option in options] if options is not None else None
+        self.dietary_mask = dietary_mask(options) if options is not None else None
+        if "wheelchair_friendly" in data or "child_friendly" in data:
+            self.access_mask = (
+                (WHEELCHAIR if data.get("wheelchair_friendly") else 0)
+                | (CHILD_FRIENDLY if data.get("child_friendly") else 0)
+            )
+        else:
+            self.access_mask = None
+
+    @property
+    def generic(self) -> bool:
+        return self.city == GENERIC_CITY
+
+    @property
+    def wheelchair_friendly(self) -> Optional[bool]:
+        return None if self.access_mask is None else bool(self.access_mask & WHEELCHAIR)
+
+    @property
+    def child_friendly(self) -> Optional[bool]:
+        return None if self.access_mask is None else bool(self.access_mask & CHILD_FRIENDLY)
+
+
+class _Index:
+    """Inverted index from (city, tag) to entry positions for one entry kind"""
+
+    def __init__(self, entries: List[CatalogEntry]):
+        self.entries = entries
+        self.by_city_tag: Dict[Tuple[str, str], List[int]] = {}
+        # Per-city positions ordered by popularity, used to fill up the top-k
+        self.by_city: Dict[str, List[int]] = {}
+        for position, entry in enumerate(entries):
+            self.by_city.setdefault(entry.city, []).append(position)
+            for tag in set(entry.tags):
+                self.by_city_tag.setdefault((entry.city, tag), []).append(position)
+        for positions in self.by_city.values():
+            positions.sort(key=lambda p: (-entries[p].popularity, entries[p].order))
+
+    def top_k(
+        self,
+        city: str,
+        interests: Iterable[str],
+        k: int,
+        required_dietary: int = 0,
+        required_access: int = 0
+    ) -> List[CatalogEntry]:
+        """
+        Highest interest-overlap entries for a city, topped up from the
+        generic layer. Cost depends on the posting lists for the requested
+        tags, not on catalog size.
+        """
+        tags = {tag.lower() for tag in interests}
+        layers = [city, GENERIC_CITY] if city != GENERIC_CITY else [GENERIC_CITY]
+        entries = self.entries
+        selected: List[CatalogEntry] = []
+        for layer in layers:
+            overlap: Dict[int, int] = {}
+            for tag in tags:
+                for position in self.by_city_tag.get((layer, tag), ()):
+                    overlap[position] = overlap.get(position, 0) + 1
+            candidates = [
+                p for p in overlap
+                if self._admissible(entries[p], required_dietary, required_access)
+            ]
+            best = heapq.nsmallest(
+                k - len(selected),
+                candidates,
+                key=lambda p: (-overlap[p], -entries[p].popularity, entries[p].order)
+            )
+            selected.extend(entries[p] for p in best)
+            if len(selected) == k:
+                break
+        # Top up with the most popular admissible entries not already chosen
+        for layer in layers:
+            if len(selected) == k:
+                break
+            for position in self.by_city.get(layer, ()):
+                entry = entries[position]
+                if entry not in selected and self._admissible(entry, required_dietary, required_access):
+                    selected.append(entry)
+                    if len(selected) == k:
+                        break
+        return selected
+
+    @staticmethod
+    def _admissible(entry: CatalogEntry, required_dietary: int, required_access: int) -> bool:
+        # Entries without dietary/accessibility data are not filtered out
+        if required_dietary and entry.dietary_mask is not None:
+            if entry.dietary_mask & required_dietary != required_dietary:
+                return False
+        if required_access and entry.access_mask is not None:
+            if entry.access_mask & required_access != required_access:
+                return False
+        return True
+
+
+class Catalog:
+    """Activity and restaurant catalog indexed by city and tag"""
+
+    def __init__(self, activities: List[CatalogEntry], restaurants: List[CatalogEntry]):
+        self.activities = _Index(activities)
+        self.restaurants = _Index(restaurants)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Catalog":
+        def build(items: List[Dict]) -> List[CatalogEntry]:
+            return [
+                CatalogEntry(city_key(item.get("city", GENERIC_CITY)) or GENERIC_CITY, item, order)
+                for order, item in enumerate(items)
+            ]
+        return cls(build(data.get("activities", [])), build(data.get("restaurants", [])))
+
+    def top_activities(self, location: str, interests: Iterable[str], k: int = 3,
+                       required_access: int = 0) -> List[CatalogEntry]:
+        return self.activities.top_k(city_key(location), interests, k, required_access=required_access)
+
+    def top_restaurants(self, location: str, interests: Iterable[str], k: int = 4,
+                        dietary_filters: Iterable[str] = ()) -> List[CatalogEntry]:
+        return self.restaurants.top_k(
+            city_key(location), interests, k, required_dietary=dietary_mask(dietary_filters)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "activities": len(self.activities.entries),
+            "restaurants": len(self.restaurants.entries),
+            "cities": len(set(self.activities.by_city) | set(self.restaurants.by_city))
+        }
+
+
+def load_catalog(path: Optional[str] = CATALOG_PATH) -> Catalog:
+    """
+    Load the catalog from a JSON file of {"activities": [...], "restaurants": [...]}.
+    The built-in generic entries are always appended as the fallback layer.
+    """
+    data = {"activities": [], "restaurants": []}
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            data["activities"].extend(loaded.get("activities", []))
+            data["restaurants"].extend(loaded.get("restaurants", []))
+            print(f"Loaded catalog from {path}")
+        except Exception as e:
+            print(f"Failed to load catalog from {path}: {e}, using built-in entries")
+    data["activities"].extend(DEFAULT_ACTIVITIES)
+    data["restaurants"].extend(DEFAULT_RESTAURANTS)
+    catalog = Catalog.from_dict(data)
+    print(f"Catalog ready: {catalog.stats()}")
+    return catalog
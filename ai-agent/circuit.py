@@ -0,0 +1,120 @@
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+# Seconds of Ollama generations the breaker judges
+PLAN_BREAKER_WINDOW = float(os.getenv("PLAN_BREAKER_WINDOW", "60"))
+PLAN_BREAKER_MIN_SAMPLES = int(os.getenv("PLAN_BREAKER_MIN_SAMPLES", "5"))
+# Trip when the window's p95 generation time or error rate exceeds these
+PLAN_BREAKER_P95 = float(os.getenv("PLAN_BREAKER_P95", "20"))
+PLAN_BREAKER_ERROR_RATE = float(os.getenv("PLAN_BREAKER_ERROR_RATE", "0.5"))
+# Seconds open before a single probe request is let through
+PLAN_BREAKER_COOLDOWN = float(os.getenv("PLAN_BREAKER_COOLDOWN", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker. While closed every call is allowed; once
+    the last `window` seconds hold at least `min_samples` results and their
+    p95 latency or error rate is over threshold, it opens and rejects calls
+    for `cooldown` seconds. Then one probe goes through (half-open): a fast
+    success closes it with a fresh window, anything else opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = PLAN_BREAKER_WINDOW,
+        min_samples: int = PLAN_BREAKER_MIN_SAMPLES,
+        p95_threshold: float = PLAN_BREAKER_P95,
+        error_rate_threshold: float = PLAN_BREAKER_ERROR_RATE,
+        cooldown: float = PLAN_BREAKER_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.window = window
+        self.min_samples = min_samples
+        self.p95_threshold = p95_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        # (finished at, seconds, ok)
+        self._samples: deque = deque()
+        self._opened_at = 0.0
+        self._probe_started = None
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        now = self.clock()
+        if self.state == OPEN:
+            if now - self._opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probe_started = None
+        if self.state == HALF_OPEN:
+            # A probe that never reports back (cancelled) is replaced after a cooldown
+            if self._probe_started is not None and now - self._probe_started < self.cooldown:
+                self.rejected += 1
+                return False
+            self._probe_started = now
+        return True
+
+    def record(self, seconds: float, ok: bool):
+        now = self.clock()
+        if self.state == HALF_OPEN:
+            if ok and seconds <= self.p95_threshold:
+                self.state = CLOSED
+                self._samples.clear()
+            else:
+                self._open(now)
+            return
+        self._samples.append((now, seconds, ok))
+        self._prune(now)
+        if self.state == CLOSED and len(self._samples) >= self.min_samples:
+            p95, error_rate = self._summary()
+            if p95 > self.p95_threshold or error_rate > self.error_rate_threshold:
+                print(f"Circuit '{self.name}' opened: p95 {p95:.1f}s, error rate {error_rate:.0%}")
+                self._open(now)
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self.opened += 1
+
+    def _prune(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def _summary(self):
+        if not self._samples:
+            return 0.0, 0.0
+        p95 = percentile([sample[1] for sample in self._samples], 0.95)
+        errors = sum(1 for sample in self._samples if not sample[2])
+        return p95, errors / len(self._samples)
+
+    def stats(self) -> Dict[str, Any]:
+        self._prune(self.clock())
+        p95, error_rate = self._summary()
+        return {
+            "state": self.state,
+            "samples": len(self._samples),
+            "p95_seconds": round(p95, 3),
+            "error_rate": round(error_rate, 4),
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
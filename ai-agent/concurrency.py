@@ -0,0 +1,119 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+
+class Overloaded(Exception):
+    """Raised when a limiter cannot admit a request; maps to an HTTP error"""
+
+    def __init__(self, message: str, retry_after: float = 1.0, status_code: int = 503):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight work and queues a bounded number of waiters in FIFO order.
+    A full queue or an expired queue wait raises Overloaded immediately
+    instead of letting callers pile up behind a slow backend.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: Optional[float] = None
+    ):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        # Exponentially weighted average of how long a slot is held
+        self._avg_hold = 1.0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.max_in_flight and len(self._waiters) >= self.max_queue
+
+    def retry_after(self) -> float:
+        """Rough estimate of when a slot will free up for a new arrival"""
+        backlog = len(self._waiters) + 1
+        return self._avg_hold * backlog / self.max_in_flight
+
+    async def acquire(self):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.name} queue is full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Overloaded(f"{self.name} queue wait timed out", self.retry_after())
+        except asyncio.CancelledError:
+            # The slot may have been handed to us just before cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        # Hand the slot directly to the next live waiter to keep FIFO order
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        async with self.held():
+            yield
+
+    @asynccontextmanager
+    async def held(self):
+        """Release a slot taken with acquire() when the block exits"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * (time.monotonic() - started)
+            self.release()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "saturated": int(self.saturated),
+            "avg_hold_seconds": round(self._avg_hold, 3)
+        }
@@ -0,0 +1,84 @@
+import gzip
+import json
+import os
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback, same output modulo whitespace
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed (roughly one TCP segment)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1400"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dumps_with_raw(obj: Dict[str, Any], raw: Dict[str, bytes]) -> bytes:
+    """
+    Encode a dict and splice in fields that are already JSON bytes (e.g. a
+    cached plan body) without decoding and re-encoding them
+    """
+    body = dumps(obj)
+    parts = [body[:-1]]
+    separator = b"," if obj else b""
+    for key, value in raw.items():
+        parts.append(separator + dumps(key) + b":" + value)
+        separator = b","
+    parts.append(b"}")
+    return b"".join(parts)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    wildcard = accepted.get("*", 0)
+    best, best_quality = None, 0.0
+    # Listed in order of preference when qualities tie
+    for name in ("br", "gzip"):
+        if name == "br" and brotli is None:
+            continue
+        quality = accepted.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
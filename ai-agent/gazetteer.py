@@ -0,0 +1,336 @@
+import json
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH")
+# Most index keys a suggestion scans past the prefix, bounding its cost
+GAZETTEER_SUGGEST_SCAN = int(os.getenv("GAZETTEER_SUGGEST_SCAN", "256"))
+
+# Country code -> (name, other spellings)
+COUNTRIES = {
+    "US": ("United States", ["usa", "us", "united states of america", "america", "u s a", "u s"]),
+    "CA": ("Canada", []),
+    "MX": ("Mexico", ["méxico"]),
+    "CR": ("Costa Rica", []),
+    "BR": ("Brazil", ["brasil"]),
+    "AR": ("Argentina", []),
+    "CO": ("Colombia", []),
+    "PE": ("Peru", ["perú"]),
+    "GB": ("United Kingdom", ["uk", "u k", "great britain", "britain", "england", "scotland"]),
+    "IE": ("Ireland", []),
+    "FR": ("France", []),
+    "ES": ("Spain", ["españa"]),
+    "PT": ("Portugal", []),
+    "IT": ("Italy", ["italia"]),
+    "DE": ("Germany", ["deutschland"]),
+    "AT": ("Austria", ["österreich"]),
+    "CH": ("Switzerland", ["schweiz", "suisse"]),
+    "NL": ("Netherlands", ["the netherlands", "holland"]),
+    "BE": ("Belgium", []),
+    "DK": ("Denmark", []),
+    "SE": ("Sweden", []),
+    "NO": ("Norway", []),
+    "IS": ("Iceland", []),
+    "CZ": ("Czechia", ["czech republic"]),
+    "PL": ("Poland", ["polska"]),
+    "HU": ("Hungary", []),
+    "GR": ("Greece", []),
+    "TR": ("Turkey", ["türkiye"]),
+    "AE": ("United Arab Emirates", ["uae"]),
+    "IN": ("India", []),
+    "TH": ("Thailand", []),
+    "SG": ("Singapore", []),
+    "JP": ("Japan", []),
+    "KR": ("South Korea", ["korea"]),
+    "CN": ("China", []),
+    "AU": ("Australia", []),
+    "NZ": ("New Zealand", []),
+    "ZA": ("South Africa", []),
+    "EG": ("Egypt", []),
+    "MA": ("Morocco", [])
+}
+
+# US states and Canadian provinces used by the built-in places
+REGIONS = {
+    "CA": "California", "NY": "New York", "WA": "Washington", "OR": "Oregon", "NV": "Nevada",
+    "AZ": "Arizona", "TX": "Texas", "IL": "Illinois", "MA": "Massachusetts", "FL": "Florida",
+    "CO": "Colorado", "GA": "Georgia", "LA": "Louisiana", "TN": "Tennessee", "HI": "Hawaii",
+    "DC": "District of Columbia", "PA": "Pennsylvania", "UT": "Utah", "MO": "Missouri", "ME": "Maine",
+    "BC": "British Columbia", "ON": "Ontario", "QC": "Quebec"
+}
+
+# Built-in places, used when no GAZETTEER_PATH is configured and merged
+# under a configured file: (name, region code, country code, population, aliases)
+DEFAULT_PLACES = [
+    ("San Jose", "CA", "US", 1_000_000, []),
+    ("San Francisco", "CA", "US", 870_000, ["sf", "san fran", "frisco"]),
+    ("Los Angeles", "CA", "US", 3_900_000, ["la", "l a"]),
+    ("San Diego", "CA", "US", 1_400_000, []),
+    ("Oakland", "CA", "US", 430_000, []),
+    ("Santa Clara", "CA", "US", 130_000, []),
+    ("Palo Alto", "CA", "US", 68_000, []),
+    ("Sunnyvale", "CA", "US", 155_000, []),
+    ("Mountain View", "CA", "US", 82_000, []),
+    ("Santa Cruz", "CA", "US", 62_000, []),
+    ("Monterey", "CA", "US", 30_000, []),
+    ("Napa", "CA", "US", 79_000, []),
+    ("Sacramento", "CA", "US", 525_000, []),
+    ("Lake Tahoe", "CA", "US", 22_000, ["tahoe", "south lake tahoe"]),
+    ("Palm Springs", "CA", "US", 45_000, []),
+    ("New York", "NY", "US", 8_300_000, ["new york city", "nyc", "manhattan"]),
+    ("Seattle", "WA", "US", 750_000, []),
+    ("Portland", "OR", "US", 640_000, []),
+    ("Las Vegas", "NV", "US", 650_000, ["vegas"]),
+    ("Phoenix", "AZ", "US", 1_600_000, []),
+    ("Austin", "TX", "US", 960_000, []),
+    ("Chicago", "IL", "US", 2_700_000, []),
+    ("Boston", "MA", "US", 650_000, []),
+    ("Miami", "FL", "US", 450_000, []),
+    ("Orlando", "FL", "US", 310_000, []),
+    ("Denver", "CO", "US", 710_000, []),
+    ("Atlanta", "GA", "US", 500_000, []),
+    ("New Orleans", "LA", "US", 380_000, ["nola"]),
+    ("Nashville", "TN", "US", 690_000, []),
+    ("Honolulu", "HI", "US", 350_000, []),
+    ("Washington", "DC", "US", 690_000, ["washington dc", "dc", "d c"]),
+    ("Philadelphia", "PA", "US", 1_600_000, ["philly"]),
+    ("Salt Lake City", "UT", "US", 200_000, ["slc"]),
+    ("Saint Louis", "MO", "US", 290_000, []),
+    ("Portland", "ME", "US", 68_000, []),
+    ("Vancouver", "BC", "CA", 660_000, []),
+    ("Toronto", "ON", "CA", 2_800_000, []),
+    ("Montréal", "QC", "CA", 1_760_000, ["montreal"]),
+    ("Mexico City", "", "MX", 9_200_000, ["ciudad de méxico", "cdmx"]),
+    ("Cancún", "", "MX", 890_000, []),
+    ("San José", "", "CR", 350_000, []),
+    ("São Paulo", "", "BR", 12_300_000, ["sao paulo"]),
+    ("Rio de Janeiro", "", "BR", 6_700_000, ["rio"]),
+    ("Buenos Aires", "", "AR", 3_100_000, []),
+    ("Bogotá", "", "CO", 7_900_000, []),
+    ("Lima", "", "PE", 9_700_000, []),
+    ("London", "", "GB", 8_900_000, []),
+    ("Edinburgh", "", "GB", 530_000, []),
+    ("Dublin", "", "IE", 590_000, []),
+    ("Paris", "", "FR", 2_100_000, []),
+    ("Nice", "", "FR", 340_000, []),
+    ("Barcelona", "", "ES", 1_600_000, []),
+    ("Madrid", "", "ES", 3_300_000, []),
+    ("Málaga", "", "ES", 580_000, []),
+    ("Lisbon", "", "PT", 550_000, ["lisboa"]),
+    ("Porto", "", "PT", 230_000, ["oporto"]),
+    ("Rome", "", "IT", 2_800_000, ["roma"]),
+    ("Florence", "", "IT", 370_000, ["firenze"]),
+    ("Venice", "", "IT", 260_000, ["venezia"]),
+    ("Milan", "", "IT", 1_400_000, ["milano"]),
+    ("Berlin", "", "DE", 3_700_000, []),
+    ("Munich", "", "DE", 1_500_000, ["münchen"]),
+    ("Düsseldorf", "", "DE", 620_000, []),
+    ("Vienna", "", "AT", 1_900_000, ["wien"]),
+    ("Zürich", "", "CH", 420_000, []),
+    ("Amsterdam", "", "NL", 870_000, []),
+    ("Brussels", "", "BE", 1_200_000, ["bruxelles", "brussel"]),
+    ("Copenhagen", "", "DK", 640_000, ["københavn"]),
+    ("Stockholm", "", "SE", 980_000, []),
+    ("Oslo", "", "NO", 700_000, []),
+    ("Reykjavík", "", "IS", 140_000, []),
+    ("Prague", "", "CZ", 1_300_000, ["praha"]),
+    ("Kraków", "", "PL", 780_000, ["cracow"]),
+    ("Budapest", "", "HU", 1_700_000, []),
+    ("Athens", "", "GR", 660_000, ["athina"]),
+    ("Istanbul", "", "TR", 15_500_000, ["constantinople"]),
+    ("Dubai", "", "AE", 3_500_000, []),
+    ("Mumbai", "", "IN", 12_400_000, ["bombay"]),
+    ("New Delhi", "", "IN", 250_000, ["delhi"]),
+    ("Bangkok", "", "TH", 10_500_000, []),
+    ("Singapore", "", "SG", 5_600_000, []),
+    ("Tokyo", "", "JP", 14_000_000, []),
+    ("Kyoto", "", "JP", 1_460_000, []),
+    ("Seoul", "", "KR", 9_700_000, []),
+    ("Beijing", "", "CN", 21_500_000, ["peking"]),
+    ("Sydney", "", "AU", 5_300_000, []),
+    ("Melbourne", "", "AU", 5_000_000, []),
+    ("Auckland", "", "NZ", 1_700_000, []),
+    ("Cape Town", "", "ZA", 4_700_000, []),
+    ("Cairo", "", "EG", 10_000_000, []),
+    ("Marrakesh", "", "MA", 930_000, ["marrakech"])
+]
+
+# Abbreviations spelled out when folding, so "St. Louis" and "Saint Louis" match
+_ABBREVIATIONS = {"st": "saint", "ste": "sainte", "ft": "fort", "mt": "mount"}
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def fold(text: str) -> str:
+    """Key form of a place name: accents removed, case folded, punctuation dropped"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    words = _NON_WORD.sub(" ", stripped.casefold().replace("&", " and ")).split()
+    return " ".join(_ABBREVIATIONS.get(word, word) for word in words)
+
+
+def slug(text: str) -> str:
+    return fold(text).replace(" ", "-")
+
+
+class Place:
+    __slots__ = ("place_id", "name", "region", "region_code", "country", "country_code", "population", "aliases", "qualifiers")
+
+    def __init__(self, data: Dict):
+        self.name = str(data["name"])
+        self.region_code = str(data.get("region_code") or "")
+        self.country_code = str(data.get("country_code") or "").upper()
+        country, country_aliases = COUNTRIES.get(self.country_code, (data.get("country") or "", []))
+        self.country = str(data.get("country") or country)
+        self.region = str(data.get("region") or (REGIONS.get(self.region_code, "") if self.country_code in ("US", "CA") else ""))
+        self.population = int(data.get("population") or 0)
+        self.aliases = [str(alias) for alias in data.get("aliases", [])]
+        self.place_id = str(data.get("id") or "-".join(
+            part for part in (self.country_code.lower(), self.region_code.lower(), slug(self.name)) if part
+        ))
+        # Folded strings that may follow the name ("CA", "California", "USA", ...)
+        self.qualifiers = {
+            fold(value)
+            for value in [self.region, self.region_code, self.country, self.country_code, *country_aliases]
+            if value
+        }
+
+    @property
+    def label(self) -> str:
+        """Display form, also used as the canonical location string"""
+        return ", ".join(part for part in (self.name, self.region_code or self.region, self.country) if part)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "place_id": self.place_id,
+            "name": self.name,
+            "label": self.label,
+            "region": self.region,
+            "country": self.country
+        }
+
+
+class Gazetteer:
+    """
+    Place index for canonicalizing free-text locations and autocompleting
+    them. Names and aliases are folded (accents, case, punctuation) into a
+    sorted key array: exact lookups go through a dict of the same keys and
+    prefix suggestions are a bisect plus a short scan.
+    """
+
+    def __init__(self, places: Iterable[Place]):
+        self.places: Dict[str, Place] = {}
+        # Folded name or alias -> places, most populous first
+        self._by_name: Dict[str, List[Place]] = {}
+        pairs: List[Tuple[str, int, str]] = []
+        for place in places:
+            self.places[place.place_id] = place
+            names = {fold(name) for name in [place.name, *place.aliases]}
+            for name in names:
+                self._by_name.setdefault(name, []).append(place)
+                pairs.append((name, -place.population, place.place_id))
+            # "san jose ca" and "san jose california" complete to San Jose, CA
+            for qualifier in place.qualifiers:
+                pairs.append((f"{fold(place.name)} {qualifier}", -place.population, place.place_id))
+        for candidates in self._by_name.values():
+            candidates.sort(key=lambda place: -place.population)
+        pairs.sort()
+        self._keys = [pair[0] for pair in pairs]
+        self._ids = [pair[2] for pair in pairs]
+        self.resolved = 0
+        self.unresolved = 0
+
+    def get(self, place_id: str) -> Optional[Place]:
+        return self.places.get(place_id)
+
+    def lookup(self, location: str) -> Optional[Place]:
+        """
+        The place a free-text location names, or None. Text after the first
+        comma (or trailing words) must match the place's region or country
+        when given; among equal matches the most populous place wins.
+        """
+        parts = [fold(part) for part in (location or "").split(",")]
+        parts = [part for part in parts if part]
+        if not parts:
+            return None
+        place = self._match(parts[0], parts[1:])
+        if place is None and len(parts) == 1:
+            # "San Jose CA", "Paris France": peel trailing words off as qualifiers
+            words = parts[0].split()
+            for split in range(len(words) - 1, 0, -1):
+                place = self._match(" ".join(words[:split]), [" ".join(words[split:])])
+                if place is not None:
+                    break
+        if place is None:
+            self.unresolved += 1
+        else:
+            self.resolved += 1
+        return place
+
+    def _match(self, name: str, qualifiers: List[str]) -> Optional[Place]:
+        candidates = self._by_name.get(name)
+        if not candidates:
+            return None
+        if not qualifiers:
+            return candidates[0]
+        best, best_score = None, 0
+        for place in candidates:
+            score = sum(1 for qualifier in qualifiers if qualifier in place.qualifiers)
+            if score > best_score:
+                best, best_score = place, score
+        return best
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Place]:
+        """Places whose name, alias or "name region" starts with prefix, most populous first"""
+        folded = fold(prefix)
+        if not folded:
+            return []
+        found: Dict[str, Place] = {}
+        position = bisect_left(self._keys, folded)
+        end = min(len(self._keys), position + GAZETTEER_SUGGEST_SCAN)
+        while position < end and self._keys[position].startswith(folded):
+            place_id = self._ids[position]
+            if place_id not in found:
+                found[place_id] = self.places[place_id]
+            position += 1
+        return sorted(found.values(), key=lambda place: -place.population)[:max(1, limit)]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "places": len(self.places),
+            "keys": len(self._keys),
+            "resolved": self.resolved,
+            "unresolved": self.unresolved
+        }
+
+
+def load_gazetteer(path: Optional[str] = GAZETTEER_PATH) -> Gazetteer:
+    """
+    Load places from a JSON file of {"places": [{"name", "region_code",
+    "country_code", "population", "aliases", "id"}, ...]}. The built-in places
+    are always included; a file entry with the same id replaces one.
+    """
+    rows = [
+        {"name": name, "region_code": region, "country_code": country, "population": population, "aliases": aliases}
+        for name, region, country, population, aliases in DEFAULT_PLACES
+    ]
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rows.extend(json.load(f).get("places", []))
+            print(f"Loaded gazetteer from {path}")
+        except Exception as e:
+            print(f"Failed to load gazetteer from {path}: {e}, using built-in places")
+    places: Dict[str, Place] = {}
+    for row in rows:
+        try:
+            place = Place(row)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Skipping gazetteer entry {row!r}: {e}")
+            continue
+        places[place.place_id] = place
+    gazetteer = Gazetteer(places.values())
+    print(f"Gazetteer ready: {gazetteer.stats()}")
+    return gazetteer
@@ -0,0 +1,40 @@
+"""
+Multi-worker mode: one uvicorn worker per available core.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Workers share search results, plans and chat sessions through the node-local
+cache tier configured by SHARED_CACHE_URL (e.g. sqlite:////dev/shm/ai-agent-cache.db).
+Per-process limits such as OLLAMA_MAX_IN_FLIGHT apply to each worker. Each
+worker publishes its metrics and status to the same tier, so /metrics,
+/readyz and /cache/stats cover every worker whichever one answers. Without a
+shared tier they describe only the answering worker, so run one worker.
+"""
+import math
+import os
+
+
+def available_cpus() -> int:
+    """CPUs this container may use: the cgroup quota if set, else the affinity mask"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# Several workers need the shared tier for caches, sessions and metrics
+workers = int(os.getenv("WEB_CONCURRENCY", str(available_cpus() if os.getenv("SHARED_CACHE_URL") else 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Generations can stream for a long time; this only bounds a stuck worker
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = None
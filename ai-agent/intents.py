@@ -0,0 +1,147 @@
+import json
+import os
+import re
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+INTENT_TABLE_PATH = os.getenv("INTENT_TABLE_PATH")
+
+# Phrases per intent. Matching is case-insensitive on whole words; a trailing
+# "*" also matches the last word's regular inflections (see STEM_SUFFIXES),
+# so "plan*" matches "plans", "planned" and "planning" but not "plane" or
+# "planets", and "activity*" matches "activities".
+DEFAULT_INTENT_TABLE: Dict[str, List[str]] = {
+    "greeting": [
+        "hello", "hi", "hey", "greetings", "good morning", "good afternoon",
+        "good evening"
+    ],
+    "plan": [
+        "plan*", "itinerary*", "schedule*", "activity*", "what to do",
+        "recommendation*", "suggestion*"
+    ],
+    "restaurant": [
+        "restaurant*", "food*", "eat*", "dining", "dine", "cafe*", "café*",
+        "cuisine*", "where to eat"
+    ],
+    "weather": [
+        "weather", "climate", "temperature*", "rain*", "sunny", "warm*", "cold*"
+    ],
+    "packing": [
+        "pack*", "bring*", "packing list", "luggage", "what to pack"
+    ],
+    "event": [
+        "event*", "festival*", "concert*", "show", "shows", "happening*"
+    ]
+}
+
+
+def load_intent_table(path: Optional[str] = INTENT_TABLE_PATH) -> Dict[str, List[str]]:
+    """Load the intent table from a JSON file, falling back to the defaults"""
+    if not path:
+        return DEFAULT_INTENT_TABLE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        print(f"Loaded intent table with {len(table)} intents from {path}")
+        return table
+    except Exception as e:
+        print(f"Failed to load intent table from {path}: {e}, using defaults")
+        return DEFAULT_INTENT_TABLE
+
+
+_WORD_RE = re.compile(r"\w+")
+
+# Endings a "*" word may take. An open prefix would let "plan*" match
+# "plane" and "event*" match "eventually".
+STEM_SUFFIXES = ("", "s", "es", "ed", "ing", "er", "ers", "est", "y", "ies", "ied")
+
+
+def inflections(word: str) -> FrozenSet[str]:
+    """
+    Regular inflections of a word: suffixes added directly, after a doubled
+    final consonant (planning), after a dropped final "e" (scheduling) or
+    with "y" turned into "i" (activities)
+    """
+    bases = {word}
+    if word[-1] not in "aeiouy" and len(word) > 2:
+        bases.add(word + word[-1])
+    if word.endswith("e"):
+        bases.add(word[:-1])
+    forms = {base + suffix for base in bases for suffix in STEM_SUFFIXES}
+    if word.endswith("y"):
+        forms.update(word[:-1] + suffix for suffix in ("ies", "ied"))
+    forms.add(word)
+    return frozenset(forms)
+
+_NO_INTENTS: FrozenSet[str] = frozenset()
+
+
+class IntentClassifier:
+    """
+    Multi-pattern matcher that finds every intent in a message in one pass.
+    The message is tokenized once and each token is looked up in phrase
+    indexes built from the intent table, so matching works on whole words:
+    "hi" does not fire on "this" and "eat" does not fire on "weather".
+    """
+
+    def __init__(self, table: Dict[str, List[str]]):
+        self.intents = list(table.keys())
+        # single word -> intents, for one-word phrases and every inflection
+        # of a one-word stem
+        words_index: Dict[str, Set[str]] = {}
+        # first word -> [(remaining words but the last, accepted last words, intent)]
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], FrozenSet[str], str]]] = {}
+        for intent, phrases in table.items():
+            for phrase in phrases:
+                stem = phrase.endswith("*")
+                words = tuple(_WORD_RE.findall(phrase.rstrip("*").lower()))
+                if not words:
+                    continue
+                last = inflections(words[-1]) if stem else frozenset((words[-1],))
+                if len(words) > 1:
+                    self._phrases.setdefault(words[0], []).append((words[1:-1], last, intent))
+                else:
+                    for word in last:
+                        words_index.setdefault(word, set()).add(intent)
+        self._words: Dict[str, FrozenSet[str]] = {word: frozenset(intents) for word, intents in words_index.items()}
+
+    def _phrase_intents(self, words: List[str], index: int) -> List[str]:
+        found = []
+        for middle, last, intent in self._phrases[words[index]]:
+            end = index + 1 + len(middle)
+            if end < len(words) and tuple(words[index + 1:end]) == middle and words[end] in last:
+                found.append(intent)
+        return found
+
+    def classify(self, text: str) -> Set[str]:
+        """Return the set of intents present in the text"""
+        found: Set[str] = set()
+        if not text:
+            return found
+        words = _WORD_RE.findall(text.lower())
+        single_words = self._words
+        phrases = self._phrases
+        for index, word in enumerate(words):
+            intents = single_words.get(word, _NO_INTENTS)
+            if intents:
+                found.update(intents)
+            if word in phrases:
+                found.update(self._phrase_intents(words, index))
+        return found
+
+    def counts(self, text: str) -> Dict[str, int]:
+        """Return how many words/phrases matched each intent in the text"""
+        result: Dict[str, int] = {}
+        if not text:
+            return result
+        words = _WORD_RE.findall(text.lower())
+        for index, word in enumerate(words):
+            intents = self._words.get(word, _NO_INTENTS)
+            matched = set(intents)
+            if word in self._phrases:
+                matched.update(self._phrase_intents(words, index))
+            for intent in matched:
+                result[intent] = result.get(intent, 0) + 1
+        return result
+
+
+intent_classifier = IntentClassifier(load_intent_table())
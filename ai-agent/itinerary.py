@@ -0,0 +1,105 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Days included in a plan response, and the default size of each later page
+PLAN_PAGE_DAYS = int(os.getenv("PLAN_PAGE_DAYS", "5"))
+# Largest page a caller may ask for
+PLAN_MAX_PAGE_DAYS = int(os.getenv("PLAN_MAX_PAGE_DAYS", "14"))
+# Days generated per Ollama call, so a long stay is never one huge prompt
+PLAN_DAY_CHUNK = int(os.getenv("PLAN_DAY_CHUNK", "5"))
+# Longest stay that is planned day by day
+PLAN_MAX_DAYS = int(os.getenv("PLAN_MAX_DAYS", "366"))
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed, past the last day, or was issued for another request"""
+
+
+def trip_days(request) -> int:
+    try:
+        start = datetime.strptime(request.booking_context.start_date, "%Y-%m-%d")
+        end = datetime.strptime(request.booking_context.end_date, "%Y-%m-%d")
+    except ValueError:
+        return 1
+    return min(max(1, (end - start).days), PLAN_MAX_DAYS)
+
+
+def request_fingerprint(request) -> str:
+    """Short canonical hash of the booking and preferences a plan is built from"""
+    fields = request.model_dump(include={"booking_context", "preferences"})
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(fingerprint: str, seed: int, day: int) -> str:
+    raw = f"{fingerprint}:{seed}:{day}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, fingerprint: str) -> Tuple[int, int]:
+    """(seed, first day index) of a cursor issued for this request"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        issued_for, seed, day = raw.split(":")
+        seed, day = int(seed), int(day)
+    except (ValueError, binascii.Error) as e:
+        raise InvalidCursor("malformed cursor") from e
+    if issued_for != fingerprint:
+        raise InvalidCursor("cursor was issued for a different plan request")
+    if day < 0:
+        raise InvalidCursor("malformed cursor")
+    return seed, day
+
+
+class DayPage:
+    """
+    Days [start, end) of a trip of `total` days. The seed comes from the
+    request and travels in the cursor, so every page of a plan is generated
+    with the same one.
+    """
+
+    __slots__ = ("fingerprint", "seed", "start", "end", "total")
+
+    def __init__(self, fingerprint: str, seed: int, start: int, end: int, total: int):
+        self.fingerprint = fingerprint
+        self.seed = seed
+        self.start = start
+        self.end = end
+        self.total = total
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        if self.end >= self.total:
+            return None
+        return encode_cursor(self.fingerprint, self.seed, self.end)
+
+    def chunks(self, size: int = PLAN_DAY_CHUNK) -> List[Tuple[int, int]]:
+        """
+        Generation ranges covering the page, aligned to multiples of size so
+        pages of any length share the same cached chunks
+        """
+        size = max(1, size)
+        first = self.start - self.start % size
+        return [(day, min(day + size, self.total)) for day in range(first, self.end, size)]
+
+
+def first_page(request, size: int = PLAN_PAGE_DAYS) -> DayPage:
+    fingerprint = request_fingerprint(request)
+    total = trip_days(request)
+    return DayPage(fingerprint, int(fingerprint[:8], 16), 0, min(total, max(1, size)), total)
+
+
+def page_from_cursor(request, cursor: str, limit: Optional[int] = None) -> DayPage:
+    """The page a cursor points at, limit days long (capped at PLAN_MAX_PAGE_DAYS)"""
+    fingerprint = request_fingerprint(request)
+    seed, start = decode_cursor(cursor, fingerprint)
+    total = trip_days(request)
+    if start >= total:
+        raise InvalidCursor("cursor is past the last day of the trip")
+    size = min(max(1, limit or PLAN_PAGE_DAYS), PLAN_MAX_PAGE_DAYS)
+    return DayPage(fingerprint, seed, start, min(total, start + size), total)
@@ -0,0 +1,306 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from broker import follow
+from cache import TTLCache
+from encoding import dumps, dumps_with_raw
+
+# Requests are consumed by agent workers in one consumer group; job status
+# events (including the finished plan) go to every API process and to any
+# other service that wants completion notifications
+PLAN_JOB_TOPIC = os.getenv("PLAN_JOB_TOPIC", "ai-plan-jobs")
+PLAN_JOB_EVENTS_TOPIC = os.getenv("PLAN_JOB_EVENTS_TOPIC", "ai-plan-job-events")
+PLAN_JOB_GROUP = os.getenv("PLAN_JOB_GROUP", "ai-agent-plan-workers")
+# Jobs each worker process runs at once
+PLAN_JOB_CONCURRENCY = int(os.getenv("PLAN_JOB_CONCURRENCY", "4"))
+PLAN_JOB_TTL = float(os.getenv("PLAN_JOB_TTL", "3600"))
+PLAN_JOB_MAX_ENTRIES = int(os.getenv("PLAN_JOB_MAX_ENTRIES", "10000"))
+BROKER_RETRY_MAX = float(os.getenv("BROKER_RETRY_MAX", "30"))
+
+# Later states win when events arrive out of order or twice
+STATUS_RANK = {"queued": 0, "running": 1, "done": 2, "failed": 2}
+
+
+class JobQueueUnavailable(Exception):
+    """The broker is not connected yet, or publishing failed"""
+
+
+class Job:
+    __slots__ = ("job_id", "status", "submitted_at", "updated_at", "error", "etag", "result", "owner")
+
+    def __init__(self, job_id: str, status: str = "queued", submitted_at: Optional[float] = None,
+                 updated_at: Optional[float] = None, error: Optional[str] = None,
+                 etag: Optional[str] = None, result: Optional[bytes] = None,
+                 owner: Optional[str] = None):
+        self.job_id = job_id
+        self.status = status
+        self.submitted_at = submitted_at or time.time()
+        self.updated_at = updated_at or self.submitted_at
+        self.error = error
+        self.etag = etag
+        # Result as JSON bytes, spliced into responses without re-encoding
+        self.result = result
+        # User that submitted the job; None for anonymous callers, whose jobs
+        # are readable by whoever holds the (random) id
+        self.owner = owner
+
+    @property
+    def finished(self) -> bool:
+        return STATUS_RANK[self.status] == STATUS_RANK["done"]
+
+    def allows(self, user: Optional[str]) -> bool:
+        return self.owner is None or self.owner == user
+
+    def transition(self, status: str, **fields) -> "Job":
+        job = Job(self.job_id, status, self.submitted_at, time.time(), self.error, self.etag, self.result, self.owner)
+        for name, value in fields.items():
+            setattr(job, name, value)
+        return job
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "updated_at": self.updated_at
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.etag:
+            data["etag"] = self.etag
+        return data
+
+    def _encode(self, fields: Dict[str, Any]) -> bytes:
+        if self.result is None:
+            return dumps(fields)
+        return dumps_with_raw(fields, {"result": self.result})
+
+    def to_bytes(self) -> bytes:
+        """Record form for job events and the shared tier, with the owner"""
+        fields = self.to_dict()
+        if self.owner:
+            fields["owner"] = self.owner
+        return self._encode(fields)
+
+    def response_bytes(self) -> bytes:
+        """Response body: status fields and the plan, without the owner"""
+        return self._encode(self.to_dict())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Job":
+        fields = json.loads(data)
+        result = fields.pop("result", None)
+        return cls(result=None if result is None else dumps(result), **fields)
+
+
+class JobStore:
+    """
+    Job status by id. Updates never move a job back to an earlier state; with
+    a shared tier, jobs submitted or finished in another worker process on
+    the node can be polled here too.
+    """
+
+    def __init__(self, ttl_seconds: float = PLAN_JOB_TTL, max_entries: int = PLAN_JOB_MAX_ENTRIES, shared=None):
+        self.ttl_seconds = ttl_seconds
+        self._jobs = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.shared = shared
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if self.shared and (job is None or not job.finished):
+            entry = await self.shared.get(job_id)
+            if entry is not None and (job is None or STATUS_RANK[entry[0].status] > STATUS_RANK[job.status]):
+                job = entry[0]
+                self._jobs.set(job_id, job, entry[1])
+        return job
+
+    def update(self, job: Job) -> bool:
+        """Record a job state; False if a later state is already known"""
+        current = self._jobs.get(job.job_id)
+        if current is not None and STATUS_RANK[current.status] > STATUS_RANK[job.status]:
+            return False
+        self._jobs.set(job.job_id, job)
+        if self.shared:
+            self.shared.set(job.job_id, job, self.ttl_seconds)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"jobs": self._jobs.stats()["entries"]}
+        if self.shared:
+            stats["shared"] = self.shared.stats()
+        return stats
+
+
+class JobQueue:
+    """
+    Submit jobs to a broker topic and run them in worker loops with bounded
+    concurrency. Workers publish each state change to the events topic; every
+    API process listens to it with its own consumer group, so a job can be
+    polled on any replica. Delivery is at most once: a worker that dies
+    mid-job leaves it "running" until it expires. While either consumer is
+    down (and resubscribing), submissions are refused rather than accepted
+    into a queue nobody reads.
+    """
+
+    def __init__(
+        self,
+        broker,
+        store: JobStore,
+        handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+        topic: str = PLAN_JOB_TOPIC,
+        events_topic: str = PLAN_JOB_EVENTS_TOPIC,
+        group_id: str = PLAN_JOB_GROUP,
+        concurrency: int = PLAN_JOB_CONCURRENCY
+    ):
+        self.broker = broker
+        self.store = store
+        # Takes the submitted payload, returns an object with .body and .etag
+        self.handler = handler
+        self.topic = topic
+        self.events_topic = events_topic
+        self.group_id = group_id
+        self.concurrency = concurrency
+        self.connected = False
+        # Consumer loops ("events", "jobs") currently failed and retrying
+        self.consumers_down: Set[str] = set()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self._tasks = set()
+
+    async def connect(self):
+        """Start the broker, retrying with backoff until it is reachable"""
+        delay = 1.0
+        while True:
+            try:
+                await self.broker.start()
+                self.connected = True
+                return
+            except Exception as e:
+                print(f"Job broker unavailable: {e}, retrying in {delay:g}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BROKER_RETRY_MAX)
+
+    @property
+    def available(self) -> bool:
+        return self.connected and not self.consumers_down
+
+    def _consumer_state(self, name: str) -> Callable[[bool], None]:
+        def on_state(healthy: bool):
+            if healthy:
+                self.consumers_down.discard(name)
+            else:
+                self.consumers_down.add(name)
+        return on_state
+
+    async def run(self, worker: bool = True):
+        """Connect, then follow job events (and run jobs when worker is set)"""
+        await self.connect()
+        loops = [self.listen()]
+        if worker:
+            loops.append(self.work())
+        await asyncio.gather(*loops)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self.connected:
+            await self.broker.stop()
+            self.connected = False
+
+    async def submit(self, payload: Dict[str, Any], owner: Optional[str] = None) -> Job:
+        if not self.connected:
+            raise JobQueueUnavailable("job broker is not connected")
+        if self.consumers_down:
+            raise JobQueueUnavailable(f"job consumers are reconnecting: {', '.join(sorted(self.consumers_down))}")
+        job = Job(uuid.uuid4().hex, owner=owner)
+        self.store.update(job)
+        message = dumps({"job_id": job.job_id, "submitted_at": job.submitted_at, "owner": owner, "payload": payload})
+        try:
+            await self.broker.publish(self.topic, job.job_id, message)
+        except Exception as e:
+            self.store.update(job.transition("failed", error="could not be queued"))
+            raise JobQueueUnavailable(str(e)) from e
+        return job
+
+    async def listen(self):
+        # No consumer group: every API process reads all events and commits
+        # no offsets, so restarts leave no orphaned groups behind
+        await follow(
+            self.broker, self.events_topic, None, self._record_event,
+            on_state=self._consumer_state("events")
+        )
+
+    async def _record_event(self, message):
+        try:
+            self.store.update(Job.from_bytes(message.value))
+        except Exception as e:
+            print(f"Bad job event {message.key}: {e}")
+
+    async def work(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def start_job(message):
+            # Stop taking messages while every slot is busy, so unclaimed
+            # jobs stay on the topic for other workers
+            await semaphore.acquire()
+            task = asyncio.create_task(self.process(message.value))
+            self._tasks.add(task)
+
+            def finished(task):
+                self._tasks.discard(task)
+                semaphore.release()
+            task.add_done_callback(finished)
+
+        await follow(
+            self.broker, self.topic, self.group_id, start_job,
+            from_beginning=True, on_state=self._consumer_state("jobs")
+        )
+
+    async def process(self, value: bytes):
+        try:
+            message = json.loads(value)
+            job = Job(message["job_id"], submitted_at=message.get("submitted_at"), owner=message.get("owner"))
+        except Exception as e:
+            print(f"Bad job message: {e}")
+            return
+        self.running += 1
+        try:
+            job = job.transition("running")
+            await self.publish(job)
+            try:
+                result = await self.handler(message["payload"])
+                job = job.transition("done", result=result.body, etag=result.etag)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job {job.job_id} failed: {e}")
+                job = job.transition("failed", error=str(e))
+                self.failed += 1
+            await self.publish(job)
+        finally:
+            self.running -= 1
+
+    async def publish(self, job: Job):
+        """Record a state change locally and announce it on the events topic"""
+        self.store.update(job)
+        try:
+            await self.broker.publish(self.events_topic, job.job_id, job.to_bytes())
+        except Exception as e:
+            print(f"Could not publish job event {job.job_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "consumers_down": sorted(self.consumers_down),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "concurrency": self.concurrency,
+            "store": self.store.stats()
+        }
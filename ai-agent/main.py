@@ -1,32 +1,49 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, ValidationError, model_validator
+from typing import Any, List, Dict, Optional, Set, Tuple
 import os
-import json
 import asyncio
-from datetime import datetime, timedelta
+import hmac
+import time
+import json
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Import LangChain components
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain_community.llms import Ollama
-from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
-from langchain.memory import ConversationBufferMemory
-
-# Tavily for web search (optional)
-try:
-    from tavily import TavilyClient
-    tavily_available = True
-except ImportError:
-    tavily_available = False
-    print("Tavily not available - web search features will be limited")
+# Async Tavily search layer (pooled keep-alive client, per-topic fan-out)
+from search import TavilySearch
+from cache import TTLCache, normalize_key_part
+from plan_cache import CachedPlan, plan_cache_key, etag_matches
+from ollama_client import OllamaClient, OllamaOverloaded
+from streaming import SSE_HEADERS, sse_event, sse_comment, plan_section_event, plan_section_events, within_deadline
+from intents import intent_classifier
+from catalog import load_catalog, WHEELCHAIR
+from gazetteer import load_gazetteer
+from sessions import SessionAccessDenied, SessionStore, Session
+from prompts import PlanPrompt, build_travel_plan_prompt, build_day_range_prompt
+from plan_parser import IncrementalPlanParser, PlanParseError, parse_plan
+from warmup import WarmupState, WARMUP_RETRY_INITIAL, WARMUP_RETRY_MAX
+from metrics import MetricsRegistry, RequestMetricsMiddleware, WorkerStats
+from admission import AdmissionController, AdmissionMiddleware, request_identity
+from itinerary import DayPage, InvalidCursor, first_page, page_from_cursor
+from encoding import FastJSONResponse, dumps, dumps_with_raw
+from shared_cache import SharedTier, open_backend
+from broker import follow, open_broker
+from jobs import Job, JobQueue, JobQueueUnavailable, JobStore
+from precompute import Precomputer
+from circuit import CircuitBreaker
+from semantic_cache import SemanticPlanCache
+from profiler import PROFILING_ENABLED, PROFILE_TOKEN, ProfilingMiddleware, SamplingProfiler
 
-app = FastAPI(title="Airbnb AI Concierge Agent", version="1.0.1")
+app = FastAPI(
+    title="Airbnb AI Concierge Agent",
+    version="1.0.1",
+    default_response_class=FastJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -37,12 +54,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus metrics. Recording is a dict lookup and a few additions per
+# observation; gauges for queues and caches are read only when scraped.
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.histogram(
+    "ai_agent_request_seconds", "HTTP request latency", ("method", "path", "status")
+)
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    "ai_agent_requests_in_flight", "HTTP requests currently being served"
+)
+STAGE_SECONDS = metrics.histogram(
+    "ai_agent_stage_seconds",
+    "Latency of each pipeline stage (search, prompt_build, llm_first_token, "
+    "llm_total, parse, chat_reply, plan_build, response_encode)",
+    ("stage",)
+)
+CHAT_INTENTS = metrics.counter(
+    "ai_agent_chat_intents_total", "Intents detected in chat messages", ("intent",)
+)
+PLAN_FALLBACKS = metrics.counter(
+    "ai_agent_plan_fallbacks_total", "AI plan requests answered with the mock plan", ("reason",)
+)
+# Per-user/IP rate limits and per-class concurrency, inside the metrics
+# middleware so shed requests are counted as 429s
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+app.add_middleware(RequestMetricsMiddleware, duration=REQUEST_SECONDS, in_flight=REQUESTS_IN_FLIGHT)
+# Opt-in sampling profiler, outermost so a profile covers the whole request;
+# when disabled, or enabled without a token, nothing is installed
+profiler = SamplingProfiler() if PROFILING_ENABLED and PROFILE_TOKEN else None
+if PROFILING_ENABLED and not PROFILE_TOKEN:
+    print("PROFILING_ENABLED is set but PROFILE_TOKEN is empty; profiler not installed")
+if profiler:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
 # Models
 class BookingContext(BaseModel):
     location: str
     start_date: str
     end_date: str
     party_type: str
+    # Gazetteer id (from /locations/suggest); set on validation when the
+    # location is recognised
+    place_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def canonicalize_location(self) -> "BookingContext":
+        """Replace a recognised location with its canonical label, so every spelling shares cache keys"""
+        place = (gazetteer.get(self.place_id) if self.place_id else None) or gazetteer.lookup(self.location)
+        self.place_id = place.place_id if place else None
+        if place:
+            self.location = place.label
+        return self
 
 class Preferences(BaseModel):
     budget: str
@@ -62,7 +125,16 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     user_message: str
     booking_context: Optional[Dict] = None
+    # Full transcript is only needed by clients that do not use session_id
     conversation_history: Optional[List[ChatMessage]] = []
+    session_id: Optional[str] = None
+
+class ClassifyRequest(BaseModel):
+    messages: List[str]
+
+class BatchPlanRequest(BaseModel):
+    requests: List[Dict[str, Any]]
+    parallelism: Optional[int] = None
 
 class ActivityCard(BaseModel):
     title: str
@@ -91,164 +163,1186 @@ class AgentResponse(BaseModel):
     activity_cards: List[ActivityCard]
     restaurant_recommendations: List[RestaurantRec]
     packing_checklist: List[str]
+    # Long stays: day_by_day_plan holds the first page of days; the rest are
+    # fetched from /generate-plan/days with next_cursor
+    total_days: Optional[int] = None
+    next_cursor: Optional[str] = None
 
-# Initialize Ollama LLM
+class PlanDaysRequest(AgentRequest):
+    cursor: str
+    limit: Optional[int] = None
+
+class DayRange(BaseModel):
+    day_by_day_plan: List[DayPlan]
+
+# Element type of each list section, used to validate model output as it streams
+PLAN_SECTION_TYPES = {
+    "day_by_day_plan": DayPlan,
+    "activity_cards": ActivityCard,
+    "restaurant_recommendations": RestaurantRec,
+    "packing_checklist": str
+}
+DAY_RANGE_SECTIONS = {"day_by_day_plan": DayPlan}
+
+# Initialize Ollama LLM (native async client with per-model concurrency limits)
 ollama_base_url = os.getenv("OLLAMA_HOST", "http://localhost:11434")
-try:
-    llm = Ollama(model="mistral", base_url=ollama_base_url)
-    ollama_available = True
-except Exception as e:
-    print(f"Ollama not available: {e}")
-    llm = None
-    ollama_available = False
+ollama_client = OllamaClient(ollama_base_url)
+
+# Ollama plans are opt-in; the fast mock response is served by default.
+# Set AI_PLANS_ENABLED=true to enable Ollama (slow but AI-generated)
+AI_PLANS_ENABLED = os.getenv("AI_PLANS_ENABLED", "false").lower() == "true"
+OLLAMA_PLAN_TIMEOUT = float(os.getenv("OLLAMA_PLAN_TIMEOUT", "30"))
+# Seconds a plan request waits for Ollama before it is answered with the
+# template plan (per request via X-Latency-Budget, capped at the timeout)
+PLAN_LATENCY_BUDGET = float(os.getenv("PLAN_LATENCY_BUDGET", "8"))
+# Output formats tried in order; invalid free-form output is retried once in
+# Ollama's constrained JSON mode before falling back to the mock plan
+OLLAMA_PLAN_FORMATS = [None, "json"]
+
+# Batch plan generation: default and maximum number of plans built at once
+BATCH_PLAN_PARALLELISM = int(os.getenv("BATCH_PLAN_PARALLELISM", "8"))
+BATCH_PLAN_MAX_PARALLELISM = int(os.getenv("BATCH_PLAN_MAX_PARALLELISM", "32"))
+BATCH_PLAN_MAX_ITEMS = int(os.getenv("BATCH_PLAN_MAX_ITEMS", "5000"))
+
+# Stops sending plan requests to Ollama while its recent generations are
+# slow or failing; requests get the template plan instead
+plan_breaker = CircuitBreaker("ollama_plans")
+
+# Upper bound on messages per /classify call
+CLASSIFY_MAX_BATCH = int(os.getenv("CLASSIFY_MAX_BATCH", "20000"))
+
+# Activity/restaurant catalog indexed by (city, tag), loaded once at startup
+catalog = load_catalog()
+# Known places; booking locations are canonicalized against it before any
+# cache key or search is built from them
+gazetteer = load_gazetteer()
+
+# Optional cache tier shared by all worker processes on the node
+# (SHARED_CACHE_URL); each in-process cache below falls back to it on a miss
+shared_backend = open_backend()
+
+def shared_tier(namespace: str, encode, decode) -> Optional[SharedTier]:
+    return SharedTier(shared_backend, namespace, encode, decode) if shared_backend else None
+
+# Server-side conversation sessions (windowed history + running summary)
+session_store = SessionStore(
+    shared=shared_tier("sessions", Session.to_bytes, Session.from_bytes)
+)
+
+# Local-information cache shared by /chat and plan generation, keyed by
+# normalized (location, topic)
+local_info_cache = TTLCache(
+    max_entries=int(os.getenv("LOCAL_INFO_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("LOCAL_INFO_CACHE_TTL", "3600")),
+    shared=shared_tier("local_info", str.encode, bytes.decode)
+)
+
+# Generated plans keyed by canonical request hash + local-info version; the
+# mock generator is deterministic so repeat requests are served from here
+plan_cache = TTLCache(
+    max_entries=int(os.getenv("PLAN_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("PLAN_CACHE_TTL", "3600")),
+    shared=shared_tier(
+        "plans", lambda cached: cached.body, lambda body: CachedPlan.from_body(body, AgentResponse)
+    )
+)
+
+# Ollama-generated later days of long stays, per AI plan key and day range
+day_chunk_cache = TTLCache(
+    max_entries=int(os.getenv("PLAN_DAY_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("PLAN_CACHE_TTL", "3600"))
+)
+
+# Background plan jobs (POST /plan-jobs): queued on a broker topic (Kafka,
+# or in-process with JOB_BROKER=memory) and run by worker loops, in this
+# process unless PLAN_JOB_WORKER is false (see plan_worker.py)
+PLAN_JOB_WORKER = os.getenv("PLAN_JOB_WORKER", "true").lower() == "true"
+# Tries while Ollama is overloaded before a job gets the mock plan
+PLAN_JOB_OVERLOAD_RETRIES = int(os.getenv("PLAN_JOB_OVERLOAD_RETRIES", "5"))
+# Seconds clients are asked to wait between polls
+PLAN_JOB_POLL_INTERVAL = int(os.getenv("PLAN_JOB_POLL_INTERVAL", "2"))
+plan_jobs_task: Optional[asyncio.Task] = None
+
+# Precompute plans for new bookings from the booking service's Kafka topics,
+# using only capacity interactive traffic leaves idle
+PRECOMPUTE_BOOKINGS = os.getenv("PRECOMPUTE_BOOKINGS", "false").lower() == "true"
+BOOKING_TOPICS = ["booking-created", "booking-accepted"]
+# Events that make a pending precomputation pointless
+BOOKING_CANCEL_TOPICS = ["booking-cancelled", "booking-status-updated"]
+# One group across replicas, so each booking is built once
+PRECOMPUTE_GROUP = os.getenv("PRECOMPUTE_GROUP", "ai-agent-precompute")
+# HTTP requests in flight at which precomputation waits (and running builds yield)
+PRECOMPUTE_MAX_ACTIVE_REQUESTS = int(os.getenv("PRECOMPUTE_MAX_ACTIVE_REQUESTS", "4"))
+precompute_tasks: List[asyncio.Task] = []
+
+# Ollama plans by request similarity, so near-duplicate requests (other
+# interest order, "family" vs "family with kids", adjacent dates) reuse a
+# generated plan with its days and dates adapted
+semantic_plans = SemanticPlanCache()
 
 # Initialize Tavily client if available
 tavily_client = None
-if tavily_available and os.getenv("TAVILY_API_KEY"):
+if os.getenv("TAVILY_API_KEY"):
     try:
-        tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+        tavily_client = TavilySearch(api_key=os.getenv("TAVILY_API_KEY"), cache=local_info_cache)
         print("Tavily client initialized successfully")
     except Exception as e:
         print(f"Failed to initialize Tavily client: {e}")
         tavily_client = None
 
+# Popular locations whose local information is fetched during warm-up
+WARMUP_LOCATIONS = [
+    location.strip() for location in os.getenv("WARMUP_LOCATIONS", "").split(";") if location.strip()
+]
+# Sample traffic used to exercise the hot paths once before taking requests
+WARMUP_MESSAGES = [
+    "Hello!",
+    "Can you plan my trip?",
+    "Any vegan restaurant recommendations?",
+    "What's the weather like and what should I pack?"
+]
+
+# The model only has to be loaded before taking traffic when plans use it
+warmup_state = WarmupState(["caches", "model"] if AI_PLANS_ENABLED else ["caches"])
+warmup_task: Optional[asyncio.Task] = None
+
+def warmup_request(location: str) -> AgentRequest:
+    start = datetime.now().date()
+    return AgentRequest(
+        booking_context=BookingContext(
+            location=location,
+            start_date=start.isoformat(),
+            end_date=(start + timedelta(days=3)).isoformat(),
+            party_type="couple"
+        ),
+        preferences=Preferences(budget="Mid-range", interests=["food", "culture"])
+    )
+
+async def warm_caches():
+    """Run the mock plan and intent paths once and prefetch popular locations"""
+    for message in WARMUP_MESSAGES:
+        intent_classifier.classify(message)
+    sample = warmup_request(WARMUP_LOCATIONS[0] if WARMUP_LOCATIONS else "San Jose, CA")
+    CachedPlan.from_plan(generate_mock_travel_plan_detailed(sample, ""))
+    if tavily_client and WARMUP_LOCATIONS:
+        await asyncio.gather(
+            *(fetch_plan_local_info(location) for location in WARMUP_LOCATIONS)
+        )
+
+async def warm_stage(stage: str, warm):
+    """Run a warm-up stage, retrying with backoff until it succeeds"""
+    delay = WARMUP_RETRY_INITIAL
+    while True:
+        warmup_state.attempt(stage)
+        try:
+            await warm()
+            warmup_state.done(stage)
+            print(f"Warm-up stage '{stage}' done")
+            return
+        except Exception as e:
+            warmup_state.failed(stage, e)
+            print(f"Warm-up stage '{stage}' failed: {e}, retrying in {delay:g}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX)
+
+async def warm_up():
+    stages = [warm_stage("caches", warm_caches)]
+    if AI_PLANS_ENABLED:
+        stages.append(warm_stage("model", ollama_client.load_model))
+    await asyncio.gather(*stages)
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Runs in the background so /healthz answers while the model loads
+    global warmup_task
+    warmup_task = asyncio.create_task(warm_up())
+
+@app.on_event("startup")
+async def start_plan_jobs():
+    # Connects in the background; submissions get 503 until the broker is up
+    global plan_jobs_task
+    plan_jobs_task = asyncio.create_task(plan_jobs.run(worker=PLAN_JOB_WORKER))
+
+@app.on_event("startup")
+async def start_precompute():
+    global precompute_tasks
+    if not PRECOMPUTE_BOOKINGS:
+        return
+    precompute_tasks = [asyncio.create_task(precomputer.run())] + [
+        asyncio.create_task(follow(plan_jobs.broker, topic, PRECOMPUTE_GROUP, handle_booking_event))
+        for topic in BOOKING_TOPICS + BOOKING_CANCEL_TOPICS
+    ]
+
+@app.on_event("startup")
+async def start_worker_stats():
+    global worker_stats_task
+    if worker_stats:
+        worker_stats_task = asyncio.create_task(worker_stats.run())
+
+@app.on_event("startup")
+async def start_profiler():
+    if profiler:
+        profiler.start(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+async def close_clients():
+    if profiler:
+        profiler.stop()
+    if worker_stats_task:
+        worker_stats_task.cancel()
+        worker_stats.stop()
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    if plan_jobs_task and not plan_jobs_task.done():
+        plan_jobs_task.cancel()
+    for task in precompute_tasks:
+        task.cancel()
+    await plan_jobs.stop()
+    if tavily_client:
+        await tavily_client.aclose()
+    await ollama_client.aclose()
+
+def collect_cache_lookups():
+    for name, cache in (("local_info", local_info_cache), ("plans", plan_cache)):
+        stats = cache.stats()
+        for result in ("hits", "misses", "coalesced"):
+            yield (name, result), stats[result]
+    stats = semantic_plans.stats()
+    for result in ("hits", "misses"):
+        yield ("semantic_plans", result), stats[result]
+
+def collect_cache_hit_ratio():
+    for name, cache in (("local_info", local_info_cache), ("plans", plan_cache)):
+        yield (name,), cache.stats()["hit_ratio"]
+    yield ("semantic_plans",), semantic_plans.stats()["hit_ratio"]
+
+def collect_admission(field: str):
+    def collect():
+        for name, stats in admission.stats()["classes"].items():
+            yield (name,), stats[field]
+    return collect
+
+def collect_admission_shed():
+    for labels, count in admission.shed.items():
+        yield labels, count
+
+def collect_ollama(field: str):
+    def collect():
+        for model, stats in ollama_client.stats().items():
+            yield (model,), stats[field]
+    return collect
+
+metrics.callback(
+    "ai_agent_cache_lookups_total", "Cache lookups by result", ("cache", "result"),
+    collect_cache_lookups, kind="counter"
+)
+metrics.callback(
+    "ai_agent_cache_hit_ratio", "Cache hit ratio since start (mean over worker processes)", ("cache",),
+    collect_cache_hit_ratio, aggregate="mean"
+)
+metrics.callback("ai_agent_ollama_in_flight", "Ollama generations running", ("model",), collect_ollama("in_flight"))
+metrics.callback("ai_agent_ollama_queue_depth", "Requests waiting for an Ollama slot", ("model",), collect_ollama("queue_depth"))
+metrics.callback(
+    "ai_agent_ollama_saturated", "1 while every Ollama slot and queue place is taken", ("model",),
+    collect_ollama("saturated"), aggregate="max"
+)
+metrics.callback(
+    "ai_agent_ollama_rejected_total", "Requests shed because the Ollama queue was full", ("model",),
+    collect_ollama("rejected"), kind="counter"
+)
+metrics.callback("ai_agent_admission_in_flight", "Admitted requests being served", ("class",), collect_admission("in_flight"))
+metrics.callback("ai_agent_admission_queue_depth", "Requests waiting for a slot in their class", ("class",), collect_admission("queue_depth"))
+metrics.callback(
+    "ai_agent_admission_shed_total", "Requests answered 429 by class and reason", ("class", "reason"),
+    collect_admission_shed, kind="counter"
+)
+metrics.callback(
+    "ai_agent_plan_circuit_open", "1 while the Ollama plan circuit breaker is open", (),
+    lambda: [((), 1 if plan_breaker.state == "open" else 0)], aggregate="max"
+)
+metrics.callback("ai_agent_sessions", "Live chat sessions", (), lambda: [((), session_store.stats()["sessions"])])
+metrics.callback(
+    "ai_agent_precompute_total", "Background plan builds from booking events by result", ("result",),
+    lambda: [((result,), precomputer.stats()[result]) for result in ("completed", "preempted", "failed", "dropped")],
+    kind="counter"
+)
+metrics.callback("ai_agent_precompute_pending", "Bookings waiting for idle capacity", (), lambda: [((), precomputer.stats()["pending"])])
+
+def local_stats() -> Dict[str, Any]:
+    """Cache and queue counters of this worker process"""
+    return {
+        "local_info": local_info_cache.stats(),
+        "plans": plan_cache.stats(),
+        "plan_days": day_chunk_cache.stats(),
+        "semantic_plans": semantic_plans.stats(),
+        "sessions": session_store.stats(),
+        "plan_jobs": plan_jobs.stats(),
+        "precompute": precomputer.stats(),
+        "admission": admission.stats(),
+        "locations": gazetteer.stats(),
+        "profiler": profiler.stats() if profiler else {"enabled": False}
+    }
+
+# With a shared tier, worker processes publish their metrics and status so
+# any of them can answer /metrics, /readyz and /cache/stats for the pod
+worker_stats = WorkerStats(
+    metrics, shared_tier("workers", dumps, json.loads),
+    lambda: {"ready": warmup_state.ready, "stats": local_stats()}
+) if shared_backend else None
+worker_stats_task: Optional[asyncio.Task] = None
+
 @app.get("/")
 async def root():
     return {"message": "Airbnb AI Concierge Agent is running!"}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint, aggregated over the pod's worker processes"""
+    text = await worker_stats.render() if worker_stats else metrics.render()
+    return PlainTextResponse(text, media_type=metrics.content_type)
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving the event loop"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: warm-up finished (model loaded when AI plans are enabled).
+    A saturated Ollama queue does not make the pod unready, since chat,
+    mock and cached plans never touch Ollama: AI plans fall back to the mock
+    plan, admission control sheds excess traffic with 429, and saturation
+    is exported as ai_agent_ollama_saturated. With several worker
+    processes, every live worker must have finished warm-up.
+    """
+    others = await worker_stats.others() if worker_stats else {}
+    workers_ready = int(warmup_state.ready) + sum(1 for record in others.values() if record["status"]["ready"])
+    ready = workers_ready == 1 + len(others)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not ready",
+            "warmup": warmup_state.stats(),
+            "workers": {"ready": workers_ready, "total": 1 + len(others)},
+            "ollama_saturated": ollama_client.saturated,
+            "plan_circuit": plan_breaker.state
+        }
+    )
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss/eviction counters for the in-process caches, with those of the
+    pod's other worker processes under "other_workers"
+    """
+    stats = local_stats()
+    if worker_stats:
+        stats["worker"] = worker_stats.worker_id
+        stats["other_workers"] = {
+            worker_id: record["status"]["stats"] for worker_id, record in (await worker_stats.others()).items()
+        }
+    return stats
+
+@app.get("/locations/suggest")
+async def suggest_locations(q: str = "", limit: int = 8):
+    """Autocomplete places by name, alias or "name, region" prefix (accent- and case-insensitive)"""
+    places = gazetteer.suggest(q, min(max(1, limit), 20))
+    return FastJSONResponse(
+        {"query": q, "suggestions": [place.to_dict() for place in places]},
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
+
+def require_profiler(request: Request) -> SamplingProfiler:
+    """The profiler, for admin endpoints; 404 when profiling is off"""
+    if not profiler:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", "").encode(), PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    return profiler
+
+@app.get("/admin/profiles")
+async def list_profiles(sampler: SamplingProfiler = Depends(require_profiler)):
+    """Request profiles kept for download, newest first"""
+    profiles = list(sampler.active.values()) + list(reversed(sampler.finished.values()))
+    return {"profiles": [profile.summary() for profile in profiles]}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, sampler: SamplingProfiler = Depends(require_profiler)):
+    """A request profile as a speedscope file, one lane per task"""
+    profile = sampler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired profile")
+    return FastJSONResponse(
+        profile.to_speedscope(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'}
+    )
+
+@app.get("/admin/hot-stacks")
+async def hot_stacks(limit: int = 50, format: str = "json", sampler: SamplingProfiler = Depends(require_profiler)):
+    """Aggregated event-loop stacks from continuous sampling (json, collapsed or speedscope)"""
+    if format == "collapsed":
+        return PlainTextResponse(sampler.hot_collapsed())
+    if format == "speedscope":
+        return FastJSONResponse(
+            sampler.hot_speedscope(),
+            headers={"Content-Disposition": 'attachment; filename="hot-stacks.speedscope.json"'}
+        )
+    return {"stats": sampler.stats(), "stacks": sampler.hot(min(max(1, limit), 500))}
+
+def agent_request_from_context(booking_context: Dict) -> AgentRequest:
+    """Convert a chat booking_context dict to proper types for AgentRequest"""
+    return AgentRequest(
+        booking_context=BookingContext(
+            location=booking_context.get("location", ""),
+            start_date=booking_context.get("start_date", ""),
+            end_date=booking_context.get("end_date", ""),
+            party_type=booking_context.get("party_type", ""),
+            place_id=booking_context.get("place_id")
+        ),
+        preferences=Preferences(
+            budget=booking_context.get("budget", "moderate"),
+            interests=booking_context.get("interests", []),
+            mobility_needs=booking_context.get("mobility_needs"),
+            dietary_filters=booking_context.get("dietary_filters", [])
+        )
+    )
+
+def canonical_booking_context(booking_context: Optional[Dict]) -> Dict:
+    """A chat booking_context with its location canonicalized when it is recognised"""
+    if not booking_context or not booking_context.get("location"):
+        return booking_context or {}
+    place = (gazetteer.get(booking_context.get("place_id") or "")
+             or gazetteer.lookup(str(booking_context["location"])))
+    if place is None:
+        return booking_context
+    return dict(booking_context, location=place.label, place_id=place.place_id)
+
+async def fetch_chat_local_info(location: str) -> str:
+    """Search for local information using Tavily for a chat turn"""
+    if not tavily_client or location == "a location":
+        return ""
+    try:
+        return await search_local_information(
+            location,
+            "attractions restaurants events weather"
+        )
+    except Exception as e:
+        print(f"Tavily search error: {e}")
+        return ""
+
+def request_user(raw_request: Request) -> Optional[str]:
+    """Caller's user id (X-User-Id, forwarded by the backend) that sessions and plan jobs belong to"""
+    return request_identity(raw_request.scope)[0]
+
+async def resolve_session(request: ChatRequest, user: Optional[str]) -> Tuple[Session, List[ChatMessage]]:
+    """
+    Look up (or start) the conversation session for a chat turn and return it
+    with its windowed history. A transcript sent by the client only seeds a
+    new session; an existing session's stored history takes precedence.
+    Raises SessionAccessDenied for another user's session.
+    """
+    session, created = await session_store.get_or_create(request.session_id, user)
+    if created and request.conversation_history:
+        for message in request.conversation_history:
+            session_store.append(session, message.role, message.content)
+    history = [ChatMessage(**message) for message in session.history()]
+    return session, history
+
+def record_turn(session: Session, user_message: str, response: str):
+    session_store.append(session, "user", user_message)
+    session_store.append(session, "assistant", response)
+    session_store.save(session)
+
+@app.delete("/sessions/{session_id}")
+async def end_session(session_id: str, raw_request: Request):
+    """Forget a conversation session"""
+    try:
+        deleted = await session_store.delete(session_id, request_user(raw_request))
+    except SessionAccessDenied:
+        raise HTTPException(status_code=403, detail="Session belongs to another user")
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"deleted": session_id}
+
+async def build_chat_plan(booking_context: Dict, search: asyncio.Future) -> CachedPlan:
+    """Build the mock plan for a chat turn from the turn's own search result"""
+    request = agent_request_from_context(booking_context)
+    # Shielded so cancelling the plan does not cancel the search the reply needs
+    return await get_cached_mock_plan(request, await asyncio.shield(search))
+
+def start_chat_tasks(booking_context: Dict, intents) -> Tuple[asyncio.Future, Optional[asyncio.Future]]:
+    """
+    Start a chat turn's I/O before anything waits on it: one local-info
+    search, shared by the reply and the plan, and - when the message asks for
+    a plan - a speculative plan build that runs alongside the reply instead
+    of after it. Cancel the plan task with cancel_chat_tasks if it goes unused.
+    """
+    location = booking_context.get("location", "a location")
+    search = asyncio.ensure_future(fetch_chat_local_info(location))
+    plan_task = None
+    if "plan" in intents and booking_context and location != "a location":
+        plan_task = asyncio.ensure_future(build_chat_plan(booking_context, search))
+    return search, plan_task
+
+def cancel_chat_tasks(*tasks: Optional[asyncio.Future]):
+    for task in tasks:
+        if task is None:
+            continue
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            # Mark a failure nobody awaited as retrieved
+            task.exception()
+
 @app.post("/chat")
-async def chat_with_agent(request: ChatRequest):
+async def chat_with_agent(request: ChatRequest, raw_request: Request):
     """
     Chat with the AI agent using natural language
     Supports free-text queries with NLU understanding
+    Pass the returned session_id back to continue a conversation without
+    re-sending its history
     """
+    session = None
+    search = plan_task = None
     try:
         user_message = request.user_message
-        booking_context = request.booking_context or {}
-        conversation_history = request.conversation_history or []
-        
-        # Extract context from user message or provided context
-        location = booking_context.get("location", "a location")
-        
-        # Search for local information using Tavily
-        local_info = ""
-        if tavily_client and location != "a location":
-            try:
-                local_info = await search_local_information(
-                    location,
-                    "attractions restaurants events weather"
-                )
-            except Exception as e:
-                print(f"Tavily search error: {e}")
+        booking_context = canonical_booking_context(request.booking_context)
+        intents = intent_classifier.classify(user_message)
+        search, plan_task = start_chat_tasks(booking_context, intents)
+
+        # The session lookup overlaps the search
+        session, conversation_history = await resolve_session(request, request_user(raw_request))
         
-        # Build context-aware response
+        # Build context-aware response while the plan builds from the same search
         response = await generate_chat_response(
             user_message, 
             booking_context, 
-            local_info,
-            conversation_history
+            await search,
+            conversation_history,
+            intents
         )
         
-        # Check if the user is asking for a travel plan
-        should_generate_plan = any(keyword in user_message.lower() for keyword in [
-            "plan", "itinerary", "schedule", "what to do", "activities", 
-            "recommendations", "suggestions"
-        ])
+        record_turn(session, user_message, response)
         
         result = {
             "assistant_message": response,
-            "travel_plan": None
+            "session_id": session.session_id
         }
         
-        if should_generate_plan and booking_context and location != "a location":
+        # The plan is spliced in as its cached JSON bytes instead of being
+        # re-encoded through the generic encoder
+        travel_plan = b"null"
+        if plan_task is not None:
             try:
-                # Convert Dict to proper types for AgentRequest
-                agent_req = AgentRequest(
-                    booking_context=BookingContext(
-                        location=booking_context.get("location", ""),
-                        start_date=booking_context.get("start_date", ""),
-                        end_date=booking_context.get("end_date", ""),
-                        party_type=booking_context.get("party_type", "")
-                    ),
-                    preferences=Preferences(
-                        budget=booking_context.get("budget", "moderate"),
-                        interests=booking_context.get("interests", []),
-                        mobility_needs=booking_context.get("mobility_needs"),
-                        dietary_filters=booking_context.get("dietary_filters", [])
-                    )
-                )
-                travel_plan = await generate_enhanced_mock_travel_plan(agent_req)
-                result["travel_plan"] = travel_plan
+                travel_plan = (await plan_task).body
             except Exception as e:
                 print(f"Error generating travel plan: {e}")
         
-        return result
-        
+        with STAGE_SECONDS.time("response_encode"):
+            body = dumps_with_raw(result, {"travel_plan": travel_plan})
+        return Response(content=body, media_type="application/json")
+
+    except SessionAccessDenied:
+        raise HTTPException(status_code=403, detail="Session belongs to another user")
     except Exception as e:
         print(f"Chat error: {e}")
         return {
             "assistant_message": f"I apologize, but I encountered an error: {str(e)}. How can I help you with your travel plans?",
-            "travel_plan": None
+            "travel_plan": None,
+            "session_id": session.session_id if session else None
         }
+    finally:
+        cancel_chat_tasks(search, plan_task)
+
+@app.post("/chat/stream")
+async def chat_with_agent_stream(request: ChatRequest, raw_request: Request):
+    """
+    Streaming variant of /chat using Server-Sent Events
+    Emits `message` deltas for the assistant text, then one `plan_section`
+    event per travel plan section when a plan was requested, then `done`
+    """
+    user = request_user(raw_request)
+
+    async def events():
+        yield sse_comment("stream open")
+        search = plan_task = None
+        try:
+            user_message = request.user_message
+            booking_context = canonical_booking_context(request.booking_context)
+            intents = intent_classifier.classify(user_message)
+            search, plan_task = start_chat_tasks(booking_context, intents)
+            session, conversation_history = await resolve_session(request, user)
+            yield sse_event("session", {"session_id": session.session_id})
+
+            response = await generate_chat_response(
+                user_message,
+                booking_context,
+                await search,
+                conversation_history,
+                intents
+            )
+            record_turn(session, user_message, response)
+            for line in response.split("\n"):
+                yield sse_event("message", {"delta": line + "\n"})
+
+            if plan_task is not None:
+                try:
+                    for event in plan_section_events((await plan_task).plan):
+                        yield event
+                except Exception as e:
+                    print(f"Error generating travel plan: {e}")
+        except SessionAccessDenied:
+            yield sse_event("error", {"detail": "Session belongs to another user", "status": 403})
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            # Also runs when the client disconnects mid-stream
+            cancel_chat_tasks(search, plan_task)
+        yield sse_event("done", {})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def plan_response(raw_request: Request, cached: CachedPlan, extra_headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serve pre-serialized plan bytes, honouring If-None-Match. Large plans are
+    sent gzip/brotli compressed when the client accepts it.
+    """
+    body, encoding, etag = cached.encoded(raw_request.headers.get("accept-encoding"))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if extra_headers:
+        headers.update(extra_headers)
+    if etag_matches(raw_request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.post("/classify")
+async def classify_messages(request: ClassifyRequest):
+    """
+    Batch intent classification for offline analytics
+    Returns the per-intent match counts for every message, in input order
+    """
+    if len(request.messages) > CLASSIFY_MAX_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {CLASSIFY_MAX_BATCH} messages per call"
+        )
+    results = [intent_classifier.counts(message) for message in request.messages]
+    totals: Dict[str, int] = {}
+    for counts in results:
+        for intent in counts:
+            totals[intent] = totals.get(intent, 0) + 1
+    return {
+        "intents": intent_classifier.intents,
+        "results": [{"intents": sorted(counts), "counts": counts} for counts in results],
+        "totals": totals
+    }
+
+def plan_source_headers(source: str, reason: Optional[str] = None, upgrading: bool = False) -> Dict[str, str]:
+    """X-Plan-* headers saying where a plan (or page of days) came from"""
+    headers = {"X-Plan-Source": source}
+    if reason:
+        headers["X-Plan-Fallback"] = reason
+    if upgrading:
+        headers["X-Plan-Upgrade"] = "pending"
+    return headers
+
+class PlanOutcome:
+    """A plan and how it was chosen"""
+
+    __slots__ = ("cached", "source", "reason", "upgrading")
+
+    def __init__(self, cached: CachedPlan, source: str, reason: Optional[str] = None, upgrading: bool = False):
+        self.cached = cached
+        # "ai", "semantic" (a similar request's Ollama plan) or "template"
+        self.source = source
+        # Why the template was served (disabled, circuit_open, budget, timeout, ...)
+        self.reason = reason
+        # An Ollama plan is still being generated and will be cached
+        self.upgrading = upgrading
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return plan_source_headers(self.source, self.reason, self.upgrading)
+
+def request_budget(raw_request: Request) -> float:
+    """Seconds this request may wait for an Ollama plan"""
+    budget = PLAN_LATENCY_BUDGET
+    header = raw_request.headers.get("x-latency-budget")
+    if header:
+        try:
+            budget = float(header)
+        except ValueError:
+            pass
+    return max(0.0, min(budget, OLLAMA_PLAN_TIMEOUT))
+
+async def build_plan(request: AgentRequest, budget: Optional[float] = None) -> PlanOutcome:
+    """
+    Latency-budgeted plan selection. The template plan is built first as the
+    answer in hand; the Ollama plan replaces it when it is already cached or
+    arrives within `budget` seconds (None: OLLAMA_PLAN_TIMEOUT), and only
+    while the circuit breaker lets requests through. A generation that
+    misses the budget keeps running and is cached, so a later request for
+    the same plan (e.g. an If-None-Match revalidation) gets the upgrade.
+    """
+    if not AI_PLANS_ENABLED:
+        return PlanOutcome(await get_cached_mock_plan(request), "template", "disabled")
+
+    template, (key, local_info) = await asyncio.gather(
+        get_cached_mock_plan(request), ai_plan_lookup(request)
+    )
+    found = cached_ai_plan(request, key)
+    if found is not None:
+        return PlanOutcome(*found)
+    if not plan_breaker.allow():
+        PLAN_FALLBACKS.inc("circuit_open")
+        return PlanOutcome(template, "template", "circuit_open")
+
+    try:
+        load = plan_cache.get_or_load(key, lambda: generate_ai_plan(request, local_info))
+        return PlanOutcome(await asyncio.wait_for(load, budget), "ai")
+    except asyncio.TimeoutError:
+        # The shared load is shielded, so it outlives the budget unless it
+        # hit the generation timeout itself
+        reason = "budget" if plan_cache.loading(key) else "timeout"
+    except Exception as e:
+        print(f"AI generation error: {e}, falling back to template plan")
+        reason = fallback_reason(e)
+    PLAN_FALLBACKS.inc(reason)
+    return PlanOutcome(template, "template", reason, upgrading=reason == "budget")
+
+async def ai_plan_lookup(request: AgentRequest) -> Tuple[str, str]:
+    """Plan cache key and local information for an Ollama plan"""
+    # Get local information if Tavily is available
+    local_info = ""
+    if tavily_client:
+        local_info = await search_local_information(
+            request.booking_context.location,
+            "attractions and activities"
+        )
+    return "ai:" + plan_cache_key(request, local_info), local_info
+
+def cached_ai_plan(request: AgentRequest, key: str) -> Optional[Tuple[CachedPlan, str]]:
+    """
+    An Ollama plan available without generating: the exact cached plan
+    ("ai"), or a similar request's plan adapted to this one ("semantic"),
+    which is then cached under this request's key
+    """
+    cached = plan_cache.get(key)
+    if cached is not None:
+        return cached, "ai"
+    match = semantic_plans.lookup(request)
+    if match is None:
+        return None
+    with STAGE_SECONDS.time("response_encode"):
+        cached = CachedPlan.from_plan(with_page(match[1], first_page(request)))
+    plan_cache.store(key, cached)
+    return cached, "semantic"
+
+async def generate_ai_plan(request: AgentRequest, local_info: str) -> CachedPlan:
+    """
+    Generate with Ollama, validating sections as they stream; a timeout or
+    cancellation stops the generation
+    """
+    plan = None
+    started = time.perf_counter()
+    try:
+        async with asyncio.timeout(OLLAMA_PLAN_TIMEOUT):
+            async for kind, value in stream_ai_plan(request, local_info):
+                if kind == "plan":
+                    plan = value
+    except Exception:
+        plan_breaker.record(time.perf_counter() - started, False)
+        raise
+    plan_breaker.record(time.perf_counter() - started, True)
+    semantic_plans.add(request, plan)
+    with STAGE_SECONDS.time("response_encode"):
+        return CachedPlan.from_plan(plan)
 
 @app.post("/generate-plan", response_model=AgentResponse)
-async def generate_travel_plan(request: AgentRequest):
+async def generate_travel_plan(request: AgentRequest, raw_request: Request):
     """
     Generate a personalized travel plan based on booking context and preferences
+    Responses carry a content-hash ETag; a matching If-None-Match returns 304.
+    X-Plan-Source says whether the Ollama or template plan was served; with
+    X-Plan-Upgrade: pending, repeating the request later returns the Ollama
+    plan under a new ETag.
+    """
+    outcome = await build_plan(request, request_budget(raw_request))
+    return plan_response(raw_request, outcome.cached, outcome.headers)
+
+async def run_plan_job(payload: Dict[str, Any]) -> CachedPlan:
+    """
+    Job handler: jobs have no latency budget beyond the generation timeout,
+    and wait out a busy model with backoff before settling for the template
+    """
+    request = AgentRequest.model_validate(payload)
+    for attempt in range(PLAN_JOB_OVERLOAD_RETRIES):
+        outcome = await build_plan(request)
+        if outcome.reason != "overloaded":
+            break
+        await asyncio.sleep(2 ** attempt)
+    return outcome.cached
+
+plan_jobs = JobQueue(
+    open_broker(),
+    JobStore(shared=shared_tier("plan_jobs", Job.to_bytes, Job.from_bytes)),
+    run_plan_job
+)
+
+def booking_plan_request(event: Dict[str, Any]) -> Optional[AgentRequest]:
+    """
+    The plan request a guest's concierge makes for a booking: the context the
+    frontend derives from it (getBookingContext in AIAgent.js) with its
+    default preferences. None when the event lacks the location or dates, or
+    the stay is over.
+    """
+    location = event.get("property_location")
+    check_in, check_out = event.get("check_in_date"), event.get("check_out_date")
+    if not (location and check_in and check_out):
+        return None
+    # Dates arrive as ISO timestamps (JSON-encoded JS Dates)
+    start_date, end_date = str(check_in)[:10], str(check_out)[:10]
+    if end_date < date.today().isoformat():
+        return None
+    guests = int(event.get("number_of_guests") or 1)
+    return agent_request_from_context({
+        "location": location,
+        "start_date": start_date,
+        "end_date": end_date,
+        "party_type": f"{guests} {'guest' if guests == 1 else 'guests'}"
+    })
+
+async def precompute_plan(request: AgentRequest):
+    """
+    Build and cache the plans a guest's first requests will read. Runs at low
+    priority: cancelling it stops any Ollama generation in progress.
+    """
+    # /generate-plan without AI plans serves the mock plan; /chat attaches
+    # one built from its own search
+    location = request.booking_context.location
+    await asyncio.gather(
+        get_cached_mock_plan(request),
+        get_cached_mock_plan(request, await fetch_chat_local_info(location))
+    )
+    if AI_PLANS_ENABLED:
+        key, local_info = await ai_plan_lookup(request)
+        if cached_ai_plan(request, key) is None and plan_breaker.allow():
+            # Generated directly rather than through get_or_load, whose shared
+            # load would keep running after preemption
+            plan_cache.store(key, await generate_ai_plan(request, local_info))
+
+def ollama_busy() -> bool:
+    return any(stats["queue_depth"] for stats in ollama_client.stats().values())
+
+def users_waiting() -> bool:
+    """True while chat or plan requests are queued for admission"""
+    return any(admission.limiters[name].queue_depth for name in ("interactive", "plan"))
+
+def precompute_idle() -> bool:
+    return (
+        REQUESTS_IN_FLIGHT.value < PRECOMPUTE_MAX_ACTIVE_REQUESTS
+        and not ollama_busy()
+        and not users_waiting()
+        and all(stats["in_flight"] < stats["max_in_flight"] for stats in ollama_client.stats().values())
+    )
+
+def precompute_contended() -> bool:
+    return REQUESTS_IN_FLIGHT.value >= PRECOMPUTE_MAX_ACTIVE_REQUESTS or ollama_busy() or users_waiting()
+
+precomputer = Precomputer(precompute_plan, precompute_idle, precompute_contended)
+
+async def handle_booking_event(message):
+    event = json.loads(message.value)
+    booking_id = event.get("booking_id")
+    if not booking_id:
+        return
+    if message.topic in BOOKING_CANCEL_TOPICS:
+        if event.get("status") in ("cancelled", "declined", "rejected"):
+            precomputer.discard(booking_id)
+        return
+    request = booking_plan_request(event)
+    if request is not None:
+        precomputer.offer(booking_id, request)
+
+def job_response(job: Job, status_code: int = 200) -> Response:
+    headers = {"Cache-Control": "no-store"}
+    if not job.finished:
+        headers["Retry-After"] = str(PLAN_JOB_POLL_INTERVAL)
+    return Response(
+        content=job.response_bytes(), status_code=status_code, media_type="application/json", headers=headers
+    )
+
+@app.post("/plan-jobs", status_code=202)
+async def submit_plan_job(request: AgentRequest, raw_request: Request):
+    """
+    Queue a plan for background generation and return its job id right away.
+    Poll GET /plan-jobs/{job_id} until the status is done (the plan is in
+    `result`) or failed; completion is also published on the job events topic.
+    Only the submitting user can poll the job.
     """
     try:
-        # Skip Ollama for now due to performance issues - use fast mock response
-        # TODO: Integrate a faster LLM API in the future (OpenAI, Anthropic, etc.)
-        use_ai = False  # Set to True to enable Ollama (slow but AI-generated)
-        
-        if not use_ai or not ollama_available or not llm:
-            # Use enhanced mock response for fast performance
-            return await generate_enhanced_mock_travel_plan(request)
-        
-        # Get local information if Tavily is available
-        local_info = ""
-        if tavily_client:
-            local_info = await search_local_information(
-                request.booking_context.location,
-                "attractions and activities"
-            )
+        job = await plan_jobs.submit(request.model_dump(), request_user(raw_request))
+    except JobQueueUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Plan job queue unavailable: {e}",
+                            headers={"Retry-After": "5"})
+    response = job_response(job, status_code=202)
+    response.headers["Location"] = f"/plan-jobs/{job.job_id}"
+    return response
 
-        # Create enhanced prompt with local information
-        prompt = create_travel_plan_prompt(request, local_info)
+@app.get("/plan-jobs/{job_id}")
+async def get_plan_job(job_id: str, raw_request: Request):
+    """Status of a plan job, with the plan once it is done"""
+    job = await plan_jobs.store.get(job_id)
+    # Another user's job is reported as unknown rather than confirmed to exist
+    if job is None or not job.allows(request_user(raw_request)):
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job_response(job)
 
-        # Generate response using Ollama (use invoke instead of deprecated predict)
-        # Set a shorter timeout to avoid hanging
+async def generate_ai_days(request: AgentRequest, page: DayPage, start: int, end: int, local_info: str) -> List[DayPlan]:
+    """Days [start, end) from Ollama, in one JSON-mode call seeded from the page"""
+    prompt = build_day_range_prompt(request, start, end, page.total, local_info)
+    started = time.perf_counter()
+    try:
+        output = await ollama_client.generate(
+            prompt.prompt, system=prompt.system, format="json", seed=page.seed, timeout=OLLAMA_PLAN_TIMEOUT
+        )
+        with STAGE_SECONDS.time("parse"):
+            days = parse_plan(output, DAY_RANGE_SECTIONS, DayRange).day_by_day_plan
+        if not days:
+            raise PlanParseError("no days in output")
+    except Exception:
+        plan_breaker.record(time.perf_counter() - started, False)
+        raise
+    plan_breaker.record(time.perf_counter() - started, True)
+    # Number the days by their place in the stay; a short answer is topped up with template days
+    days = [day.model_copy(update={"day": f"Day {start + i + 1}"}) for i, day in enumerate(days[:end - start])]
+    return days + mock_days(request, start + len(days), end)
+
+async def ai_day_chunk(
+    request: AgentRequest, page: DayPage, start: int, end: int, key: str, local_info: str
+) -> Tuple[List[DayPlan], Optional[str]]:
+    """Ollama days [start, end), or the template days and why they were used"""
+    chunk_key = f"{key}:days:{start}-{end}"
+    cached = day_chunk_cache.get(chunk_key)
+    if cached is not None:
+        return cached, None
+    if not plan_breaker.allow():
+        reason = "circuit_open"
+    else:
         try:
-            response = await asyncio.wait_for(
-                asyncio.get_event_loop().run_in_executor(
-                    None, lambda: llm.invoke(prompt)
+            days = await asyncio.wait_for(
+                day_chunk_cache.get_or_load(
+                    chunk_key, lambda: generate_ai_days(request, page, start, end, local_info)
                 ),
-                timeout=30.0  # 30 second timeout
+                PLAN_LATENCY_BUDGET
             )
-
-            # Parse the AI response
-            parsed_response = parse_ai_response(response, request)
-            return parsed_response
+            return days, None
         except asyncio.TimeoutError:
-            print("Ollama timeout - falling back to mock response")
-            return await generate_enhanced_mock_travel_plan(request)
+            # A load that is still running finishes into the cache for the next request
+            reason = "budget" if day_chunk_cache.loading(chunk_key) else "timeout"
+        except Exception as e:
+            print(f"AI day generation error: {e}, falling back to template days")
+            reason = fallback_reason(e)
+    PLAN_FALLBACKS.inc(reason)
+    return mock_days(request, start, end), reason
 
-    except Exception as e:
-        # If AI generation fails, provide mock response as fallback
-        print(f"AI generation error: {e}, falling back to mock response")
-        return await generate_enhanced_mock_travel_plan(request)
+async def build_days(request: AgentRequest, page: DayPage) -> Tuple[List[DayPlan], Optional[str]]:
+    """The page's days and, if any template days were used, why"""
+    if not AI_PLANS_ENABLED:
+        return mock_days(request, page.start, page.end), "disabled"
+    key, local_info = await ai_plan_lookup(request)
+    chunks = await asyncio.gather(*(
+        ai_day_chunk(request, page, start, end, key, local_info) for start, end in page.chunks()
+    ))
+    days = []
+    reason = None
+    for (start, _), (chunk_days, chunk_reason) in zip(page.chunks(), chunks):
+        days.extend(chunk_days[max(0, page.start - start):page.end - start])
+        reason = reason or chunk_reason
+    return days, reason
+
+@app.post("/generate-plan/days")
+async def generate_plan_days(request: PlanDaysRequest):
+    """
+    Later days of a long stay's plan. Send the same booking and preferences
+    with the plan's (or the previous page's) next_cursor; pages are built
+    deterministically, so a cursor always yields the same days. In AI mode
+    days are generated PLAN_DAY_CHUNK at a time and cached.
+    """
+    plan_request = AgentRequest(booking_context=request.booking_context, preferences=request.preferences)
+    try:
+        page = page_from_cursor(plan_request, request.cursor, request.limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    days, reason = await build_days(plan_request, page)
+    return FastJSONResponse(
+        {
+            "days": [day.model_dump() for day in days],
+            "total_days": page.total,
+            "next_cursor": page.next_cursor
+        },
+        headers=plan_source_headers("template" if reason else "ai", reason)
+    )
 
+@app.post("/generate-plan/stream")
+async def generate_travel_plan_stream(request: AgentRequest, raw_request: Request):
+    """
+    Streaming variant of /generate-plan using Server-Sent Events
+    The template plan's sections are sent first, so the client holds a full
+    answer at once. In AI mode Ollama tokens are then forwarded as `token`
+    events and each section that validates replaces the template one as a
+    `plan_section` event; clients keep the latest event per section. The
+    upgrade stops at the request's latency budget, in which case (or after a
+    `fallback` event) the template sections are sent again. A final
+    `plan_source` event says which plan the client ended up with.
+    """
+    budget = request_budget(raw_request)
+
+    async def events():
+        yield sse_comment("stream open")
+        template = (await get_cached_mock_plan(request)).plan
+        for event in plan_section_events(template):
+            yield event
+        source, reason = "template", "disabled"
+        if AI_PLANS_ENABLED:
+            reason = None
+            upgraded = False
+            key, local_info = await ai_plan_lookup(request)
+            found = cached_ai_plan(request, key)
+            if found is not None:
+                cached, source = found
+                for event in plan_section_events(cached.plan):
+                    yield event
+            elif not plan_breaker.allow():
+                reason = "circuit_open"
+            else:
+                started = time.perf_counter()
+                try:
+                    # The budget only times waits for the generation, never
+                    # the writes to the client
+                    async for kind, value in within_deadline(stream_ai_plan(request, local_info), budget):
+                        if kind == "token":
+                            yield sse_event("token", {"text": value})
+                        elif kind == "section":
+                            # Validated sections are published before the plan completes
+                            upgraded = True
+                            yield plan_section_event(*value)
+                        elif kind == "retry":
+                            yield sse_event("retry", {"reason": value})
+                        else:
+                            source = "ai"
+                    plan_breaker.record(time.perf_counter() - started, True)
+                except asyncio.TimeoutError:
+                    # A generation that outlives the budget counts as slow
+                    plan_breaker.record(time.perf_counter() - started, False)
+                    reason = "budget"
+                except Exception as e:
+                    print(f"AI generation error: {e}, falling back to template plan")
+                    plan_breaker.record(time.perf_counter() - started, False)
+                    reason = fallback_reason(e)
+                    yield sse_event("fallback", {"reason": str(e)})
+            if reason:
+                PLAN_FALLBACKS.inc(reason)
+                if upgraded:
+                    for event in plan_section_events(template):
+                        yield event
+        yield sse_event("plan_source", {"source": source, "reason": reason})
+        yield sse_event("done", {})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/generate-plan/batch")
+async def generate_travel_plan_batch(request: BatchPlanRequest):
+    """
+    Generate plans for many AgentRequests in one call (nightly pre-generation)
+    Local information is fetched once per location, plans are built with
+    bounded parallelism, and results stream back as NDJSON in input order with
+    a per-item status. Plans land in the same cache /generate-plan reads from.
+    """
+    if len(request.requests) > BATCH_PLAN_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BATCH_PLAN_MAX_ITEMS} requests per batch"
+        )
+
+    parallelism = max(1, min(request.parallelism or BATCH_PLAN_PARALLELISM, BATCH_PLAN_MAX_PARALLELISM))
+    semaphore = asyncio.Semaphore(parallelism)
+    local_info_tasks: Dict[str, asyncio.Future] = {}
+
+    async def fetch_local_info(location: str) -> str:
+        async with semaphore:
+            return await fetch_plan_local_info(location)
+
+    async def build(item: AgentRequest) -> CachedPlan:
+        location = item.booking_context.location
+        key = normalize_key_part(location)
+        if key not in local_info_tasks:
+            local_info_tasks[key] = asyncio.ensure_future(fetch_local_info(location))
+        local_info = await local_info_tasks[key]
+        async with semaphore:
+            return await get_cached_mock_plan(item, local_info)
+
+    tasks = []
+    for raw in request.requests:
+        try:
+            tasks.append(asyncio.ensure_future(build(AgentRequest.model_validate(raw))))
+        except ValidationError as e:
+            tasks.append(e)
+
+    async def results():
+        try:
+            for index, task in enumerate(tasks):
+                if isinstance(task, ValidationError):
+                    yield dumps({
+                        "index": index,
+                        "status": "error",
+                        "error": "invalid request",
+                        "details": task.errors(include_url=False)
+                    }) + b"\n"
+                    continue
+                try:
+                    cached = await task
+                    yield (
+                        b'{"index":' + str(index).encode("ascii")
+                        + b',"status":"ok","etag":' + dumps(cached.etag)
+                        + b',"plan":' + cached.body + b"}\n"
+                    )
+                except Exception as e:
+                    print(f"Batch plan error for item {index}: {e}")
+                    yield dumps({"index": index, "status": "error", "error": str(e)}) + b"\n"
+        finally:
+            # Client went away or we finished; stop any work still queued
+            for task in tasks:
+                if isinstance(task, asyncio.Future) and not task.done():
+                    task.cancel()
+            for task in local_info_tasks.values():
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@STAGE_SECONDS.timed("chat_reply")
 async def generate_chat_response(
     user_message: str,
     booking_context: Dict,
     local_info: str,
-    conversation_history: List[ChatMessage]
+    conversation_history: List[ChatMessage],
+    intents: Optional[Set[str]] = None
 ) -> str:
     """
     Generate a context-aware chat response using NLU
     Understands user intent and provides helpful travel assistance
     """
-    message_lower = user_message.lower()
+    # NLU Intent Detection (single pass over the message), unless the caller
+    # already classified it
+    if intents is None:
+        intents = intent_classifier.classify(user_message)
+    for intent in intents or ("none",):
+        CHAT_INTENTS.inc(intent)
     
     # Extract booking info for context
     location = booking_context.get("location", "")
@@ -256,25 +1350,17 @@ async def generate_chat_response(
     check_out = booking_context.get("end_date", "")
     party_type = booking_context.get("party_type", "")
     
-    # NLU Intent Detection
-    greetings = ["hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening"]
-    plan_requests = ["plan", "itinerary", "schedule", "activities", "what to do", "recommendations"]
-    restaurant_queries = ["restaurant", "food", "eat", "dining", "cafe", "cuisine", "where to eat"]
-    weather_queries = ["weather", "climate", "temperature", "rain", "sunny", "warm", "cold"]
-    packing_queries = ["pack", "bring", "packing list", "luggage", "what to pack"]
-    event_queries = ["event", "festival", "concert", "show", "happening"]
-    
     # Generate contextual response
     response_parts = []
     
     # Detect greeting
-    if any(greeting in message_lower for greeting in greetings):
+    if "greeting" in intents:
         response_parts.append(f"Hello! I'm your AI travel concierge.")
         if location:
             response_parts.append(f"I see you're planning a trip to {location}.")
     
     # Detect plan request
-    if any(keyword in message_lower for keyword in plan_requests):
+    if "plan" in intents:
         if location:
             response_parts.append(f"I can help you create a personalized itinerary for {location}!")
             if local_info:
@@ -285,7 +1371,7 @@ async def generate_chat_response(
             response_parts.append("I'd be happy to help you plan your trip! Which location are you visiting?")
     
     # Detect restaurant queries
-    elif any(keyword in message_lower for keyword in restaurant_queries):
+    elif "restaurant" in intents:
         if local_info:
             response_parts.append(f"Here are some great dining options I found for {location}:")
             # Extract restaurant info from local_info if available
@@ -295,7 +1381,7 @@ async def generate_chat_response(
             response_parts.append(f"I can help you find restaurants in {location}. Let me search for options.")
     
     # Detect weather queries
-    elif any(keyword in message_lower for keyword in weather_queries):
+    elif "weather" in intents:
         if local_info and "weather" in local_info.lower():
             response_parts.append(f"Weather information for {location}:")
             response_parts.append(local_info.split("weather")[1][:200] if "weather" in local_info else "Check your packing list for weather-appropriate clothing.")
@@ -303,13 +1389,13 @@ async def generate_chat_response(
             response_parts.append(f"For accurate weather in {location}, check a weather app for current conditions.")
     
     # Detect packing queries
-    elif any(keyword in message_lower for keyword in packing_queries):
+    elif "packing" in intents:
         response_parts.append(f"Here's what I recommend packing for your trip to {location}:")
         if party_type:
             response_parts.append(f"Since you're traveling as a {party_type}, I'll tailor my suggestions accordingly.")
     
     # Detect event queries
-    elif any(keyword in message_lower for keyword in event_queries):
+    elif "event" in intents:
         if local_info:
             if "event" in local_info.lower():
                 response_parts.append(f"Here are some events happening during your visit to {location}:")
@@ -342,179 +1428,134 @@ async def generate_chat_response(
     
     return "\n".join(response_parts)
 
+@STAGE_SECONDS.timed("search")
 async def search_local_information(location: str, query_type: str = "general") -> str:
-    """Search for local information using Tavily API"""
+    """
+    Search for local information using Tavily API
+    Topics are fetched concurrently without blocking the event loop; topics that
+    miss their deadline are dropped and the rest are returned as partial results
+    """
     if not tavily_client:
         return "Local search not available - using general knowledge only"
 
     try:
-        search_query = f"{location} {query_type} information for travelers"
-        response = tavily_client.search(query=search_query, search_depth="advanced")
-
-        if response and "results" in response:
-            # Extract relevant information from search results
-            results_text = ""
-            for result in response["results"][:3]:  # Top 3 results
-                if "content" in result:
-                    results_text += f"\n{result['title']}: {result['content'][:200]}..."
-
-            return results_text if results_text else "No specific local information found"
-        else:
-            return "No search results available"
+        results_text = await tavily_client.search(location, query_type)
+        if results_text is None:
+            return "Search service temporarily unavailable"
+        return results_text if results_text.strip() else "No specific local information found"
     except Exception as e:
         print(f"Tavily search error: {e}")
         return "Search service temporarily unavailable"
 
-def create_travel_plan_prompt(request: AgentRequest, local_info: str = "") -> str:
-    """Create a detailed prompt for the AI agent"""
-    local_context = f"\n\nLOCAL INFORMATION:\n{local_info}" if local_info else ""
-    return f"""
-    You are an expert travel concierge for Airbnb. Create a personalized travel plan for a guest.
-
-    BOOKING DETAILS:
-    - Location: {request.booking_context.location}
-    - Check-in: {request.booking_context.start_date}
-    - Check-out: {request.booking_context.end_date}
-    - Travel Party: {request.booking_context.party_type}
-
-    GUEST PREFERENCES:
-    - Budget Level: {request.preferences.budget}
-    - Interests: {', '.join(request.preferences.interests)}
-    - Mobility Needs: {request.preferences.mobility_needs or 'None specified'}
-    - Dietary Restrictions: {', '.join(request.preferences.dietary_filters) if request.preferences.dietary_filters else 'None'}{local_context}
-
-    Please provide a detailed response in the following JSON format:
-    {{
-        "day_by_day_plan": [
-            {{
-                "day": "Day 1",
-                "morning": "Morning activity description",
-                "afternoon": "Afternoon activity description",
-                "evening": "Evening activity description"
-            }}
-        ],
-        "activity_cards": [
-            {{
-                "title": "Activity Name",
-                "address": "Activity Address",
-                "price_tier": "Budget/Mid-range/Luxury",
-                "duration": "2-3 hours",
-                "tags": ["tag1", "tag2"],
-                "wheelchair_friendly": true/false,
-                "child_friendly": true/false
-            }}
-        ],
-        "restaurant_recommendations": [
-            {{
-                "name": "Restaurant Name",
-                "cuisine": "Cuisine Type",
-                "address": "Restaurant Address",
-                "price_tier": "Budget/Mid-range/Luxury",
-                "dietary_options": ["vegetarian", "vegan", "gluten-free"]
-            }}
-        ],
-        "packing_checklist": [
-            "Item 1 based on weather and activities",
-            "Item 2 based on weather and activities"
-        ]
-    }}
-
-    Consider the location's typical weather, local attractions, and cultural aspects.
-    Ensure all recommendations align with the guest's budget, interests, mobility needs, and dietary restrictions.
-    Provide practical, specific recommendations with addresses where possible.
+@STAGE_SECONDS.timed("prompt_build")
+def create_travel_plan_prompt(
+    request: AgentRequest,
+    local_info: str = "",
+    history: Optional[List[Dict[str, str]]] = None,
+    page: Optional[DayPage] = None
+) -> PlanPrompt:
     """
+    Create a detailed prompt for the AI agent
+    The schema instructions are a fixed system prefix; booking details,
+    history and local information form a suffix trimmed to the context budget
+    """
+    days = (page.start, page.end, page.total) if page else None
+    plan_prompt = build_travel_plan_prompt(request, local_info, history, days=days)
+    if any(plan_prompt.trimmed.values()):
+        print(f"Prompt trimmed to fit context window: {plan_prompt.trimmed}")
+    return plan_prompt
 
 async def generate_enhanced_mock_travel_plan(request: AgentRequest) -> AgentResponse:
     """
     Generate an enhanced mock travel plan with detailed, personalized recommendations
     """
-    # Get local information to make recommendations more accurate
-    local_info = ""
-    if tavily_client:
-        try:
-            local_info = await search_local_information(
-                request.booking_context.location,
-                "attractions restaurants activities"
-            )
-        except Exception as e:
-            print(f"Tavily search failed: {e}")
-    
-    return generate_mock_travel_plan_detailed(request, local_info)
+    return (await get_cached_mock_plan(request)).plan
+
+async def fetch_plan_local_info(location: str) -> str:
+    """Get local information to make plan recommendations more accurate"""
+    if not tavily_client:
+        return ""
+    try:
+        return await search_local_information(
+            location,
+            "attractions restaurants activities"
+        )
+    except Exception as e:
+        print(f"Tavily search failed: {e}")
+        return ""
+
+async def get_cached_mock_plan(request: AgentRequest, local_info: Optional[str] = None) -> CachedPlan:
+    """
+    Return the mock plan for a request from the plan cache, building and
+    serializing it once per (request, local-info version)
+    """
+    if local_info is None:
+        local_info = await fetch_plan_local_info(request.booking_context.location)
+
+    async def build() -> CachedPlan:
+        with STAGE_SECONDS.time("plan_build"):
+            plan = generate_mock_travel_plan_detailed(request, local_info)
+        with STAGE_SECONDS.time("response_encode"):
+            return CachedPlan.from_plan(plan)
+
+    return await plan_cache.get_or_load(plan_cache_key(request, local_info), build)
 
 def generate_mock_travel_plan_detailed(request: AgentRequest, local_info: str) -> AgentResponse:
-    """Generate a detailed mock travel plan with personalized recommendations"""
-    from datetime import datetime
-    
-    # Calculate number of days
-    start_date = datetime.strptime(request.booking_context.start_date, "%Y-%m-%d")
-    end_date = datetime.strptime(request.booking_context.end_date, "%Y-%m-%d")
-    num_days = max(1, (end_date - start_date).days)
-    
+    """
+    Generate a detailed mock travel plan with personalized recommendations
+    Values come from the request and the catalog, so models are constructed
+    without re-validation
+    """
     # Parse location
     location_name = request.booking_context.location.split(',')[0] if ',' in request.booking_context.location else request.booking_context.location
     
-    # Generate detailed day plans
-    day_plans = []
-    for i in range(min(num_days, 5)):  # Max 5 days
-        day_num = i + 1
-        morning_activity = f"Start Day {day_num} with breakfast at a local café in {location_name}. Explore the neighborhood and soak in the local atmosphere."
-        afternoon_activity = f"Discover {location_name}'s top attractions. Perfect for {request.booking_context.party_type} with {request.preferences.budget} budget."
-        evening_activity = f"Enjoy dinner featuring {', '.join(request.preferences.interests[:2]) if request.preferences.interests else 'local'} cuisine, followed by an evening stroll."
-        
-        day_plans.append(DayPlan(
-            day=f"Day {day_num}",
-            morning=morning_activity,
-            afternoon=afternoon_activity,
-            evening=evening_activity
-        ))
+    # The first page of days; later days are built on request from the cursor
+    page = first_page(request)
+    day_plans = mock_days(request, page.start, page.end)
     
     # Generate activity cards based on interests
     activities = []
     base_interests = request.preferences.interests if request.preferences.interests else ["culture", "food", "sightseeing"]
     
-    # Create diverse activity cards
-    activity_templates = [
-        ("Cultural Museum Tour", "Museum District", "2-3 hours", ["culture", "history", "indoor"]),
-        ("Food Market Experience", "Local Market Square", "1-2 hours", ["food", "shopping", "local"]),
-        ("Historical Walking Tour", "Old Town Center", "3-4 hours", ["history", "walking", "sightseeing"]),
-        ("Art Gallery Visit", "Arts Quarter", "2 hours", ["art", "culture", "indoor"]),
-        ("Scenic Viewpoint", "City Overlook", "1 hour", ["nature", "photography", "scenic"]),
-        ("Local Food Tour", "Restaurant Quarter", "2-3 hours", ["food", "culture", "local"])
-    ]
-    
-    # Select activities based on user interests
-    selected_activities = []
-    for template in activity_templates:
-        if any(tag in base_interests for tag in template[3]):
-            selected_activities.append(template)
-    
-    # If no matches, use first 3
-    if not selected_activities:
-        selected_activities = activity_templates[:3]
+    # Select the best-matching activities from the catalog
+    mobility_needs = (request.preferences.mobility_needs or "").lower()
+    wheelchair_default = True if not mobility_needs else "wheelchair" not in mobility_needs
+    child_default = "family" in request.booking_context.party_type.lower() or "kids" in request.booking_context.party_type.lower()
+    selected_activities = catalog.top_activities(
+        request.booking_context.location,
+        base_interests,
+        k=3,
+        required_access=WHEELCHAIR if "wheelchair" in mobility_needs else 0
+    )
     
-    for title, location, duration, tags in selected_activities[:3]:
-        activities.append(ActivityCard(
-            title=f"{title} in {location_name}",
-            address=f"{location}, {location_name}",
-            price_tier=request.preferences.budget,
-            duration=duration,
-            tags=tags,
-            wheelchair_friendly=True if not request.preferences.mobility_needs else "wheelchair" not in request.preferences.mobility_needs.lower(),
-            child_friendly="family" in request.booking_context.party_type.lower() or "kids" in request.booking_context.party_type.lower()
+    for entry in selected_activities:
+        activities.append(ActivityCard.model_construct(
+            title=f"{entry.title} in {location_name}" if entry.generic else entry.title,
+            address=f"{entry.area}, {location_name}" if entry.generic else entry.area,
+            price_tier=entry.price_tier or request.preferences.budget,
+            duration=entry.duration,
+            tags=list(entry.tags),
+            wheelchair_friendly=wheelchair_default if entry.wheelchair_friendly is None else entry.wheelchair_friendly,
+            child_friendly=child_default if entry.child_friendly is None else entry.child_friendly
         ))
     
     # Generate restaurant recommendations
     restaurants = []
-    cuisine_types = ["Italian", "Local", "Mediterranean", "Asian Fusion", "French", "Seafood", "Farm-to-Table"]
+    default_dietary = request.preferences.dietary_filters if request.preferences.dietary_filters else ["vegetarian", "vegan", "gluten-free"]
+    selected_restaurants = catalog.top_restaurants(
+        request.booking_context.location,
+        base_interests,
+        k=4,
+        dietary_filters=request.preferences.dietary_filters
+    )
     
-    for i, cuisine in enumerate(cuisine_types[:4]):
-        dietary_opts = request.preferences.dietary_filters if request.preferences.dietary_filters else ["vegetarian", "vegan", "gluten-free"]
-        restaurants.append(RestaurantRec(
-            name=f"{cuisine} Bistro",
-            cuisine=cuisine,
-            address=f"Restaurant District, {location_name}",
-            price_tier=request.preferences.budget,
-            dietary_options=dietary_opts
+    for entry in selected_restaurants:
+        restaurants.append(RestaurantRec.model_construct(
+            name=f"{entry.cuisine} Bistro" if entry.generic else entry.title,
+            cuisine=entry.cuisine,
+            address=f"{entry.area}, {location_name}" if entry.generic else entry.area,
+            price_tier=entry.price_tier or request.preferences.budget,
+            dietary_options=default_dietary if entry.dietary_options is None else entry.dietary_options
         ))
     
     # Enhanced packing checklist
@@ -544,25 +1585,47 @@ def generate_mock_travel_plan_detailed(request: AgentRequest, local_info: str) -
     if any("shopping" in s.lower() for s in base_interests):
         packing_list.append("Extra suitcase space")
     
-    return AgentResponse(
+    return AgentResponse.model_construct(
         day_by_day_plan=day_plans,
         activity_cards=activities[:3],
         restaurant_recommendations=restaurants[:4],
-        packing_checklist=packing_list[:12]
+        packing_checklist=packing_list[:12],
+        total_days=page.total,
+        next_cursor=page.next_cursor
     )
 
+def mock_days(request: AgentRequest, start: int, end: int) -> List[DayPlan]:
+    """Template days [start, end) of a stay; each depends only on the request and its number"""
+    location_name = request.booking_context.location.split(',')[0] if ',' in request.booking_context.location else request.booking_context.location
+    day_plans = []
+    for i in range(start, end):
+        day_num = i + 1
+        morning_activity = f"Start Day {day_num} with breakfast at a local café in {location_name}. Explore the neighborhood and soak in the local atmosphere."
+        afternoon_activity = f"Discover {location_name}'s top attractions. Perfect for {request.booking_context.party_type} with {request.preferences.budget} budget."
+        evening_activity = f"Enjoy dinner featuring {', '.join(request.preferences.interests[:2]) if request.preferences.interests else 'local'} cuisine, followed by an evening stroll."
+        
+        day_plans.append(DayPlan.model_construct(
+            day=f"Day {day_num}",
+            morning=morning_activity,
+            afternoon=afternoon_activity,
+            evening=evening_activity
+        ))
+    return day_plans
+
+def with_page(plan: AgentResponse, page: DayPage) -> AgentResponse:
+    """Limit a plan to its first page of days and point it at the next page"""
+    return plan.model_copy(update={
+        "day_by_day_plan": list(plan.day_by_day_plan)[:page.end - page.start],
+        "total_days": page.total,
+        "next_cursor": page.next_cursor
+    })
+
 def generate_mock_travel_plan(request: AgentRequest) -> AgentResponse:
     """Generate a mock travel plan when AI is not available (legacy function)"""
-    from datetime import datetime, timedelta
-    
-    # Calculate number of days
-    start_date = datetime.strptime(request.booking_context.start_date, "%Y-%m-%d")
-    end_date = datetime.strptime(request.booking_context.end_date, "%Y-%m-%d")
-    num_days = (end_date - start_date).days
-    
-    # Generate day plans
+    # Generate the first page of day plans
+    page = first_page(request)
     day_plans = []
-    for i in range(min(num_days, 5)):  # Max 5 days
+    for i in range(page.start, page.end):
         day_plans.append(DayPlan(
             day=f"Day {i+1}",
             morning=f"Start your day with breakfast and explore the local neighborhood around {request.booking_context.location}. Visit local cafés and shops to get a feel for the area.",
@@ -628,57 +1691,71 @@ def generate_mock_travel_plan(request: AgentRequest) -> AgentResponse:
         day_by_day_plan=day_plans,
         activity_cards=activities,
         restaurant_recommendations=restaurants,
-        packing_checklist=packing_list[:10]
+        packing_checklist=packing_list[:10],
+        total_days=page.total,
+        next_cursor=page.next_cursor
     )
 
+async def stream_ai_plan(request: AgentRequest, local_info: str = ""):
+    """
+    Generate a plan with Ollama, validating the output while it streams.
+    Yields ("token", text) and ("section", (name, items)) as output arrives,
+    ("retry", reason) when an attempt is abandoned, and finally ("plan", plan).
+    An attempt is cut off at the first invalid element, so a bad generation
+    stops costing model time early; free-form output is retried once in JSON
+    mode. Raises PlanParseError when every attempt fails.
+    """
+    page = first_page(request)
+    prompt = create_travel_plan_prompt(request, local_info, page=page)
+    error = None
+    for attempt, output_format in enumerate(OLLAMA_PLAN_FORMATS):
+        if error is not None:
+            yield "retry", str(error)
+        parser = IncrementalPlanParser(PLAN_SECTION_TYPES)
+        stream = ollama_client.stream(prompt.prompt, system=prompt.system, format=output_format, seed=page.seed)
+        started = time.perf_counter()
+        first_token = True
+        parse_seconds = 0.0
+        try:
+            async for token in stream:
+                if first_token:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, "llm_first_token")
+                    first_token = False
+                yield "token", token
+                parse_started = time.perf_counter()
+                sections = parser.feed(token)
+                parse_seconds += time.perf_counter() - parse_started
+                for section in sections:
+                    yield "section", section
+                if parser.done:
+                    break
+            plan = with_page(parser.plan(AgentResponse), page)
+        except PlanParseError as e:
+            print(f"Invalid plan output (attempt {attempt + 1}): {e}")
+            error = e
+            continue
+        finally:
+            # Closing the stream stops the generation in Ollama
+            await stream.aclose()
+            STAGE_SECONDS.observe(time.perf_counter() - started, "llm_total")
+            STAGE_SECONDS.observe(parse_seconds, "parse")
+        yield "plan", plan
+        return
+    raise PlanParseError(f"no valid plan after {len(OLLAMA_PLAN_FORMATS)} attempts: {error}")
+
+def fallback_reason(error: Exception) -> str:
+    """Label for the plan fallback counter"""
+    if isinstance(error, PlanParseError):
+        return "invalid_output"
+    if isinstance(error, OllamaOverloaded):
+        return "overloaded"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    return "error"
+
 def parse_ai_response(response: str, request: AgentRequest) -> AgentResponse:
-    """Parse the AI response into structured format"""
-    try:
-        # In a production system, you'd use proper JSON parsing and validation
-        # For now, return a mock response structure
-        return AgentResponse(
-            day_by_day_plan=[
-                DayPlan(
-                    day="Day 1",
-                    morning="Morning exploration of local area",
-                    afternoon="Visit popular attractions",
-                    evening="Dinner at recommended restaurant"
-                )
-            ],
-            activity_cards=[
-                ActivityCard(
-                    title="City Tour",
-                    address=f"{request.booking_context.location} City Center",
-                    price_tier=request.preferences.budget,
-                    duration="3-4 hours",
-                    tags=request.preferences.interests,
-                    wheelchair_friendly=request.preferences.mobility_needs != "wheelchair_accessible" if request.preferences.mobility_needs else True,
-                    child_friendly="family" in request.booking_context.party_type.lower()
-                )
-            ],
-            restaurant_recommendations=[
-                RestaurantRec(
-                    name="Local Restaurant",
-                    cuisine="Local Cuisine",
-                    address=f"{request.booking_context.location} Downtown",
-                    price_tier=request.preferences.budget,
-                    dietary_options=request.preferences.dietary_filters
-                )
-            ],
-            packing_checklist=[
-                "Comfortable walking shoes",
-                "Weather-appropriate clothing",
-                "Camera for sightseeing"
-            ]
-        )
-    except Exception as e:
-        # Fallback response in case of parsing errors
-        return AgentResponse(
-            day_by_day_plan=[],
-            activity_cards=[],
-            restaurant_recommendations=[],
-            packing_checklist=[]
-        )
+    """Parse and validate a complete AI response; raises PlanParseError if invalid"""
+    return parse_plan(response, PLAN_SECTION_TYPES, AgentResponse)
 
 if __name__ == "__main__":
     import uvicorn
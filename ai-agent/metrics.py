@@ -0,0 +1,375 @@
+import asyncio
+import functools
+import inspect
+import os
+import socket
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# How often each worker process publishes its metrics and status for the
+# others; a worker that stops publishing drops out after three intervals
+WORKER_STATS_INTERVAL = float(os.getenv("WORKER_STATS_INTERVAL", "5"))
+
+# Latency buckets in seconds, from in-process work (ms) up to LLM generations
+STAGE_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _simple_samples(name: str, labelnames: Tuple[str, ...], series: Dict[Labels, float]) -> List[str]:
+    return [
+        f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}"
+        for labels, value in series.items()
+    ]
+
+
+# How each worker's value of a series is combined into one: counters and
+# histograms add up, gauges say which of these applies
+AGGREGATES = {
+    "sum": sum,
+    "max": max,
+    "min": min,
+    "mean": lambda values: sum(values) / len(values)
+}
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+    aggregate = "sum"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def series(self) -> Dict[Labels, float]:
+        return dict(self._values)
+
+    def samples(self, series: Optional[Dict[Labels, float]] = None) -> List[str]:
+        return _simple_samples(self.name, self.labelnames, self.series() if series is None else series)
+
+
+class Gauge:
+    """Value that goes up and down, without labels"""
+
+    kind = "gauge"
+    labelnames: Tuple[str, ...] = ()
+
+    def __init__(self, name: str, help: str, aggregate: str = "sum"):
+        self.name = name
+        self.help = help
+        self.aggregate = aggregate
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def series(self) -> Dict[Labels, float]:
+        return {(): self.value}
+
+    def samples(self, series: Optional[Dict[Labels, float]] = None) -> List[str]:
+        return _simple_samples(self.name, (), self.series() if series is None else series)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a bisect and two list updates, so it
+    is cheap enough to leave on for every request. Buckets are stored as
+    per-bucket counts and made cumulative only when scraped.
+    """
+
+    kind = "histogram"
+    aggregate = "sum"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = STAGE_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        """Observe the wall time of a with-block (works across awaits)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def timed(self, *labels: str):
+        """Decorator observing each call of a function or coroutine function"""
+        def decorate(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.time(*labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(*labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def series(self) -> Dict[Labels, list]:
+        return {labels: [list(counts), total] for labels, (counts, total) in self._series.items()}
+
+    def samples(self, series: Optional[Dict[Labels, list]] = None) -> List[str]:
+        lines = []
+        for labels, (counts, total) in (self._series if series is None else series).items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Gauge or counter whose samples are read from live objects at scrape time,
+    e.g. limiter queue depths or cache counters, so nothing is recorded on
+    the request path.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...],
+        collect: Callable[[], Iterable[Tuple[Labels, float]]],
+        kind: str = "gauge",
+        aggregate: str = "sum"
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.collect = collect
+        self.kind = kind
+        self.aggregate = "sum" if kind == "counter" else aggregate
+
+    def series(self) -> Dict[Labels, float]:
+        return {tuple(labels): value for labels, value in self.collect()}
+
+    def samples(self, series: Optional[Dict[Labels, float]] = None) -> List[str]:
+        return _simple_samples(self.name, self.labelnames, self.series() if series is None else series)
+
+
+def merge_series(metric, workers: List[Dict[Labels, Any]]) -> Dict[Labels, Any]:
+    """One series from every worker's series of a metric"""
+    if metric.kind == "histogram":
+        merged: Dict[Labels, list] = {}
+        for series in workers:
+            for labels, (counts, total) in series.items():
+                current = merged.get(labels)
+                if current is None:
+                    merged[labels] = [list(counts), total]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+        return merged
+    values: Dict[Labels, List[float]] = {}
+    for series in workers:
+        for labels, value in series.items():
+            values.setdefault(labels, []).append(value)
+    combine = AGGREGATES[metric.aggregate]
+    return {labels: combine(found) for labels, found in values.items()}
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text format"""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, aggregate: str = "sum") -> Gauge:
+        return self.register(Gauge(name, help, aggregate))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = STAGE_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, labelnames: Tuple[str, ...],
+                 collect: Callable[[], Iterable[Tuple[Labels, float]]],
+                 kind: str = "gauge", aggregate: str = "sum") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, labelnames, collect, kind, aggregate))
+
+    def snapshot(self) -> Dict[str, list]:
+        """Every metric's series as JSON-ready [labels, value] pairs, for other workers to merge"""
+        snapshot = {}
+        for metric in self._metrics:
+            try:
+                snapshot[metric.name] = [[list(labels), value] for labels, value in metric.series().items()]
+            except Exception as e:
+                print(f"Metric {metric.name} failed to collect: {e}")
+        return snapshot
+
+    def render(self, others: Iterable[Dict[str, list]] = ()) -> str:
+        """
+        Prometheus text for this process, merged with snapshots taken in
+        other worker processes
+        """
+        others = list(others)
+        lines = []
+        for metric in self._metrics:
+            try:
+                if others:
+                    workers = [metric.series()] + [
+                        {tuple(labels): value for labels, value in other.get(metric.name, ())}
+                        for other in others
+                    ]
+                    samples = metric.samples(merge_series(metric, workers))
+                else:
+                    samples = metric.samples()
+            except Exception as e:
+                # A broken collector must not take the whole scrape down
+                print(f"Metric {metric.name} failed to collect: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency per route and the number
+    of requests in flight. Only the app's parameter-free route paths are used
+    as labels; anything else is grouped as "other" to bound cardinality.
+    """
+
+    def __init__(self, app, duration: Histogram, in_flight: Gauge):
+        self.app = app
+        self.duration = duration
+        self.in_flight = in_flight
+        self.paths: Optional[set] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.paths is None:
+            self.paths = {
+                route.path for route in scope["app"].routes if "{" not in route.path
+            }
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        self.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_flight.dec()
+            self.duration.observe(time.perf_counter() - started, scope["method"], path, status[0])
+
+
+class WorkerStats:
+    """
+    Shares each worker process's metrics snapshot and status through the
+    node's shared cache tier, so /metrics, /cache/stats and /readyz describe
+    every worker in the pod whichever one answers. A worker republishes its
+    own snapshot when it answers a scrape, so each worker's counters only
+    move forward from one scrape to the next.
+    """
+
+    def __init__(self, registry: MetricsRegistry, tier, status: Callable[[], Dict[str, Any]],
+                 interval: float = WORKER_STATS_INTERVAL):
+        self.registry = registry
+        # SharedTier (set/scan/delete) storing JSON-encoded records
+        self.tier = tier
+        self.status = status
+        self.interval = interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+
+    def publish(self):
+        record = {"metrics": self.registry.snapshot(), "status": self.status()}
+        self.tier.set(self.worker_id, record, self.interval * 3)
+
+    async def run(self):
+        while True:
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"Worker stats publish failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def others(self) -> Dict[str, Dict[str, Any]]:
+        """Latest record of every other live worker, by worker id"""
+        return {worker_id: record for worker_id, record in await self.tier.scan() if worker_id != self.worker_id}
+
+    async def render(self) -> str:
+        """Prometheus text summed (or otherwise aggregated) over every worker"""
+        self.publish()
+        others = await self.others()
+        return self.registry.render(record["metrics"] for record in others.values())
+
+    def stop(self):
+        self.tier.delete(self.worker_id)
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from concurrency import ConcurrencyLimiter, Overloaded
+from prompts import OLLAMA_NUM_CTX
+
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_MAX_IN_FLIGHT = int(os.getenv("OLLAMA_MAX_IN_FLIGHT", "2"))
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "8"))
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "10"))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10"))
+
+
+class OllamaOverloaded(Overloaded):
+    """Ollama's in-flight limit and wait queue are both full"""
+
+
+class OllamaClient:
+    """
+    Async client for Ollama's /api/generate over a pooled keep-alive connection.
+    Each model gets its own in-flight cap and bounded wait queue. Abandoning a
+    stream (timeout or client disconnect) closes the HTTP response, which makes
+    Ollama stop the generation instead of finishing it for nobody.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str = OLLAMA_MODEL,
+        timeout: float = OLLAMA_TIMEOUT,
+        max_in_flight: int = OLLAMA_MAX_IN_FLIGHT,
+        max_queue: int = OLLAMA_MAX_QUEUE,
+        queue_timeout: float = OLLAMA_QUEUE_TIMEOUT
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._limiters: Dict[str, ConcurrencyLimiter] = {}
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS
+            )
+        )
+        # Create the default model's limiter up front so its queue gauges are
+        # exported before the first generation
+        self.limiter()
+
+    def limiter(self, model: Optional[str] = None) -> ConcurrencyLimiter:
+        model = model or self.model
+        if model not in self._limiters:
+            self._limiters[model] = ConcurrencyLimiter(
+                f"ollama:{model}",
+                max_in_flight=self.max_in_flight,
+                max_queue=self.max_queue,
+                queue_timeout=self.queue_timeout
+            )
+        return self._limiters[model]
+
+    async def stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        system: Optional[str] = None,
+        format: Optional[str] = None,
+        seed: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield response tokens as Ollama produces them.
+        Pass static instructions as `system`: an identical prefix on every call
+        lets Ollama reuse the loaded model's prompt cache instead of prefilling it.
+        format="json" constrains the output to valid JSON; a seed makes the
+        output repeatable for the same prompt.
+        """
+        model = model or self.model
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {"num_ctx": OLLAMA_NUM_CTX}
+        }
+        if system:
+            payload["system"] = system
+        if format:
+            payload["format"] = format
+        if seed is not None:
+            payload["options"]["seed"] = seed
+        try:
+            async with self.limiter(model).slot():
+                async with self._client.stream("POST", "/api/generate", json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise RuntimeError(chunk["error"])
+                        if chunk.get("response"):
+                            yield chunk["response"]
+                        if chunk.get("done"):
+                            break
+        except Overloaded as e:
+            raise OllamaOverloaded(str(e), e.retry_after) from e
+
+    async def generate(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        system: Optional[str] = None,
+        format: Optional[str] = None,
+        seed: Optional[int] = None
+    ) -> str:
+        """
+        Return the full completion for a prompt.
+        On timeout the underlying request is cancelled, not left running.
+        """
+        async def collect() -> str:
+            tokens = []
+            stream = self.stream(prompt, model, system, format, seed)
+            try:
+                async for token in stream:
+                    tokens.append(token)
+            finally:
+                await stream.aclose()
+            return "".join(tokens)
+
+        return await asyncio.wait_for(collect(), timeout or self.timeout)
+
+    async def load_model(self, model: Optional[str] = None):
+        """
+        Load a model into Ollama's memory without generating anything, so the
+        first real request does not pay the model load time.
+        """
+        payload = {"model": model or self.model, "keep_alive": OLLAMA_KEEP_ALIVE}
+        response = await self._client.post("/api/generate", json=payload)
+        response.raise_for_status()
+
+    @property
+    def saturated(self) -> bool:
+        """True when any model's in-flight slots and wait queue are all taken"""
+        return any(limiter.saturated for limiter in self._limiters.values())
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        return {model: limiter.stats() for model, limiter in self._limiters.items()}
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,102 @@
+import hashlib
+import json
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from encoding import COMPRESS_MIN_BYTES, compress, negotiate_encoding
+
+
+class CachedPlan:
+    """
+    A generated plan together with its pre-serialized body and ETag.
+    Compressed variants are built on first request and kept with the entry.
+    """
+
+    __slots__ = ("_plan", "_model", "body", "etag", "variants")
+
+    def __init__(self, plan: Optional[BaseModel], body: bytes, etag: str, model: Optional[type] = None):
+        self._plan = plan
+        self._model = model
+        self.body = body
+        self.etag = etag
+        self.variants: Dict[str, bytes] = {}
+
+    @property
+    def plan(self) -> BaseModel:
+        # Entries read from the shared cache tier are decoded on first use
+        if self._plan is None:
+            self._plan = self._model.model_validate_json(self.body)
+        return self._plan
+
+    @classmethod
+    def from_plan(cls, plan: BaseModel) -> "CachedPlan":
+        # pydantic-core's serializer, no dict round trip and no re-validation
+        body = plan.model_dump_json().encode("utf-8")
+        return cls(plan, body, content_etag(body))
+
+    @classmethod
+    def from_body(cls, body: bytes, model: type) -> "CachedPlan":
+        return cls(None, body, content_etag(body), model)
+
+    def encoded(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str], str]:
+        """(body, content-encoding, ETag) for a client's Accept-Encoding"""
+        if len(self.body) < COMPRESS_MIN_BYTES:
+            return self.body, None, self.etag
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is None:
+            return self.body, None, self.etag
+        body = self.variants.get(encoding)
+        if body is None:
+            body = self.variants[encoding] = compress(self.body, encoding)
+        return body, encoding, representation_etag(self.etag, encoding)
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag derived from the response bytes"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def representation_etag(etag: str, encoding: str) -> str:
+    """ETag of a compressed representation; each encoding gets its own tag"""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def strip_representation(etag: str) -> str:
+    for encoding in ("gzip", "br"):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def local_info_version(local_info: str) -> str:
+    return hashlib.sha256((local_info or "").encode("utf-8")).hexdigest()[:16]
+
+
+def plan_cache_key(request: BaseModel, local_info: str) -> str:
+    """
+    Canonical hash of the request plus the version of the local information
+    it was built from. Field order and JSON formatting do not affect the key.
+    """
+    canonical = json.dumps(request.model_dump(), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{digest}:{local_info_version(local_info)}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an If-None-Match header against an ETag (weak comparison).
+    Tags of compressed representations match the plan they encode.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if strip_representation(candidate) == etag:
+            return True
+    return False
@@ -0,0 +1,201 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+
+# Characters of preamble (e.g. "Here is your plan:" or a ``` fence) tolerated
+# before the opening brace
+PLAN_MAX_PREAMBLE_CHARS = int(os.getenv("PLAN_MAX_PREAMBLE_CHARS", "200"))
+
+
+class PlanParseError(ValueError):
+    """The model output can no longer become a valid plan"""
+
+
+class IncrementalPlanParser:
+    """
+    Consumes streamed LLM output for a plan and validates it as it arrives.
+
+    Tracks JSON structure character by character. Each element of a list
+    section is validated as soon as it closes, and each top-level section is
+    returned from feed() as soon as its value is complete, so callers can
+    publish sections early and abort as soon as the output goes bad.
+    """
+
+    def __init__(self, sections: Dict[str, Any]):
+        # section name -> element type (a pydantic model or str)
+        self.sections = sections
+        self.buffer = ""
+        self.result: Dict[str, list] = {}
+        self.done = False
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start: Optional[int] = None
+        self._current_key: Optional[str] = None
+        self._expect_key = True
+        self._value_start: Optional[int] = None
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, list]]:
+        """Add output; return the sections completed by it, in order"""
+        if self.done:
+            return []
+        self.buffer += chunk
+        completed = []
+        buffer = self.buffer
+        while self._pos < len(buffer):
+            index = self._pos
+            char = buffer[index]
+            self._pos += 1
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                elif index >= PLAN_MAX_PREAMBLE_CHARS:
+                    raise PlanParseError("no JSON object at start of output")
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None:
+                        self._current_key = json.loads(buffer[self._key_start:index + 1])
+                        self._key_start = None
+                continue
+
+            if char.isspace():
+                continue
+
+            if self._depth == 1:
+                if self._expect_key:
+                    if char == '"':
+                        self._in_string = True
+                        self._key_start = index
+                    elif char == ":":
+                        if self._current_key is None:
+                            raise PlanParseError("object key missing")
+                        self._expect_key = False
+                    elif char == "}":
+                        self._finish_object()
+                        return completed
+                    elif char != ",":
+                        raise PlanParseError(f"unexpected {char!r} in plan object")
+                    continue
+                if self._value_start is None:
+                    # First character of a top-level value
+                    self._value_start = index
+                    if self._current_key in self.sections and char != "[":
+                        raise PlanParseError(f"{self._current_key} must be a list")
+                    if char in "[{":
+                        self._depth += 1
+                    elif char == '"':
+                        self._in_string = True
+                    continue
+                if char in ",}":
+                    # End of a scalar top-level value
+                    self._complete_value(buffer[self._value_start:index], completed)
+                    if char == "}":
+                        self._finish_object()
+                        return completed
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 2 and self._element_start is None:
+                    self._element_start = index
+            elif char in "[{":
+                if self._depth == 2 and self._element_start is None:
+                    self._element_start = index
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 2 and self._element_start is not None:
+                    self._check_element(buffer[self._element_start:index + 1])
+                    self._element_start = None
+                elif self._depth == 1:
+                    self._complete_value(buffer[self._value_start:index + 1], completed)
+            elif char == ",":
+                if self._depth == 2 and self._element_start is not None:
+                    self._check_element(buffer[self._element_start:index])
+                    self._element_start = None
+            elif self._depth == 2 and self._element_start is None:
+                # Bare scalar element (number, true, null, ...)
+                self._element_start = index
+        return completed
+
+    def _check_element(self, text: str):
+        element_type = self.sections.get(self._current_key)
+        if element_type is None:
+            return
+        text = text.strip()
+        if not text:
+            return
+        try:
+            value = json.loads(text)
+        except ValueError as e:
+            raise PlanParseError(f"malformed {self._current_key} element: {e}")
+        self._validate_element(element_type, value)
+
+    def _validate_element(self, element_type: Any, value: Any) -> Any:
+        if element_type is str:
+            if not isinstance(value, str):
+                raise PlanParseError(f"{self._current_key} items must be strings")
+            return value
+        try:
+            return element_type.model_validate(value)
+        except ValidationError as e:
+            raise PlanParseError(f"invalid {self._current_key} item: {e.errors()[0]['msg']}")
+
+    def _complete_value(self, text: str, completed: List[Tuple[str, list]]):
+        key = self._current_key
+        self._value_start = None
+        # A non-section value can close straight to the top level without
+        # ending its last element
+        self._element_start = None
+        self._current_key = None
+        self._expect_key = True
+        if key not in self.sections:
+            return
+        try:
+            items = json.loads(text)
+        except ValueError as e:
+            raise PlanParseError(f"malformed {key}: {e}")
+        element_type = self.sections[key]
+        validated = [self._validate_element_for(key, element_type, item) for item in items]
+        self.result[key] = validated
+        completed.append((key, validated))
+
+    def _validate_element_for(self, key: str, element_type: Any, item: Any) -> Any:
+        self._current_key = key
+        try:
+            return self._validate_element(element_type, item)
+        finally:
+            self._current_key = None
+
+    def _finish_object(self):
+        self.done = True
+        missing = [key for key in self.sections if key not in self.result]
+        if missing:
+            raise PlanParseError(f"plan is missing {', '.join(missing)}")
+
+    def plan(self, model: type) -> BaseModel:
+        """Build the final response model once the object is complete"""
+        if not self.done:
+            raise PlanParseError("plan output ended before the JSON object closed")
+        return model.model_construct(**self.result)
+
+
+def parse_plan(text: str, sections: Dict[str, Any], model: type) -> BaseModel:
+    """Parse a complete model output in one go"""
+    parser = IncrementalPlanParser(sections)
+    parser.feed(text)
+    return parser.plan(model)
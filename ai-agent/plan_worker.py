@@ -0,0 +1,23 @@
+"""
+Standalone plan job worker: consumes PLAN_JOB_TOPIC and publishes results on
+PLAN_JOB_EVENTS_TOPIC without serving HTTP. Use it to scale plan generation
+separately from the API (which then runs with PLAN_JOB_WORKER=false).
+
+    JOB_BROKER=kafka KAFKA_BROKERS=kafka:9092 python plan_worker.py
+"""
+import asyncio
+
+import main
+
+
+async def run():
+    await main.warm_up()
+    try:
+        await main.plan_jobs.run(worker=True)
+    finally:
+        await main.plan_jobs.stop()
+        await main.ollama_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,118 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+# Plans built at once in the background (one keeps Ollama free for users)
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "1"))
+# Bookings waiting for idle capacity; the oldest is dropped beyond this
+PRECOMPUTE_MAX_PENDING = int(os.getenv("PRECOMPUTE_MAX_PENDING", "1000"))
+# How often an idle worker re-checks for capacity, and a running build for contention
+PRECOMPUTE_IDLE_POLL = float(os.getenv("PRECOMPUTE_IDLE_POLL", "0.5"))
+
+
+class Precomputer:
+    """
+    Low-priority background builds. Work starts only while `idle()` is true,
+    and a running build is cancelled and requeued as soon as `contended()`
+    reports interactive traffic waiting, so precomputation only ever uses
+    capacity nobody else wants. Items are deduplicated by key.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[Any], Awaitable[Any]],
+        idle: Callable[[], bool],
+        contended: Callable[[], bool],
+        concurrency: int = PRECOMPUTE_CONCURRENCY,
+        max_pending: int = PRECOMPUTE_MAX_PENDING,
+        poll_interval: float = PRECOMPUTE_IDLE_POLL
+    ):
+        self.build = build
+        self.idle = idle
+        self.contended = contended
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self._pending: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._running: Dict[Hashable, asyncio.Task] = {}
+        self._wake = asyncio.Event()
+        self.completed = 0
+        self.preempted = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def offer(self, key: Hashable, item: Any):
+        """Queue an item, replacing any pending item with the same key"""
+        if key in self._running:
+            return
+        self._pending[key] = item
+        self._pending.move_to_end(key)
+        while len(self._pending) > self.max_pending:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._wake.set()
+
+    def discard(self, key: Hashable):
+        """Forget an item, cancelling its build if one is running"""
+        self._pending.pop(key, None)
+        task = self._running.get(key)
+        if task:
+            task.cancel()
+
+    async def run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            if not self._pending:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if not self.idle():
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await slots.acquire()
+            if not self._pending:
+                slots.release()
+                continue
+            key, item = self._pending.popitem(last=False)
+            task = asyncio.create_task(self._run_one(key, item))
+            self._running[key] = task
+
+            def finished(task, key=key):
+                self._running.pop(key, None)
+                slots.release()
+            task.add_done_callback(finished)
+
+    async def _run_one(self, key: Hashable, item: Any):
+        build = asyncio.create_task(self.build(item))
+        try:
+            while True:
+                done, _ = await asyncio.wait({build}, timeout=self.poll_interval)
+                if done:
+                    build.result()
+                    self.completed += 1
+                    return
+                if self.contended():
+                    # Give the capacity back and try again when it is idle
+                    build.cancel()
+                    self.preempted += 1
+                    self._pending[key] = item
+                    self._pending.move_to_end(key, last=False)
+                    self._wake.set()
+                    return
+        except asyncio.CancelledError:
+            build.cancel()
+            raise
+        except Exception as e:
+            print(f"Precompute failed for {key}: {e}")
+            self.failed += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "running": len(self._running),
+            "completed": self.completed,
+            "preempted": self.preempted,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
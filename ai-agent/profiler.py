@@ -0,0 +1,402 @@
+import asyncio
+import contextvars
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Nothing below is installed unless this is set (and PROFILE_TOKEN is too):
+# no middleware, no task factory and no sampler thread
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+# Requests sent with this header are profiled. The header value must match
+# PROFILE_TOKEN, as must X-Admin-Token on the admin endpoints
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "x-profile").lower().encode("latin-1")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Seconds between samples of a profiled request
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Sampling of one request stops after this long
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+# Finished request profiles kept for download
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+# Always-on sampling of the event loop for hot stacks; 0 turns it off
+PROFILE_CONTINUOUS_HZ = float(os.getenv("PROFILE_CONTINUOUS_HZ", "0"))
+# Distinct stacks the continuous profile tracks; rarer ones are lumped together
+PROFILE_MAX_STACKS = int(os.getenv("PROFILE_MAX_STACKS", "5000"))
+
+# (qualified name, file, first line): one flame-graph frame per function
+FrameKey = Tuple[str, str, int]
+OTHER_STACK: Tuple[FrameKey, ...] = (("(other stacks)", "", 0),)
+# Awaitables that cannot be walked into, by a readable name
+AWAITABLE_NAMES = {
+    "FutureIter": "Future",
+    "_GatheringFuture": "gather",
+    "async_generator_asend": "async generator",
+    "async_generator_athrow": "async generator"
+}
+
+_active_profile: contextvars.ContextVar = contextvars.ContextVar("active_profile", default=None)
+
+
+def frame_key(frame) -> FrameKey:
+    code = frame.f_code
+    return (code.co_qualname, code.co_filename, code.co_firstlineno)
+
+
+def thread_stack(frame) -> List[Any]:
+    """Frames of a thread's stack, outermost first"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def await_chain(coro) -> Tuple[List[Any], Any]:
+    """
+    Frames of a suspended coroutine and everything it is awaiting, outermost
+    first, plus the object at the bottom of the chain (usually a future)
+    """
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        awaited = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None) or getattr(coro, "gi_yieldfrom", None)
+        if awaited is None or not hasattr(awaited, "cr_frame") and not hasattr(awaited, "ag_frame") and not hasattr(awaited, "gi_frame"):
+            return frames, awaited
+        coro = awaited
+    return frames, None
+
+
+def waiting_on(awaited) -> FrameKey:
+    """Synthetic leaf frame naming what a suspended task waits for"""
+    if isinstance(awaited, asyncio.Task):
+        coro = awaited.get_coro()
+        return (f"[await task {getattr(coro, '__qualname__', type(coro).__name__)}]", "", 0)
+    if awaited is None:
+        return ("[await]", "", 0)
+    name = type(awaited).__name__
+    return (f"[await {AWAITABLE_NAMES.get(name, name)}]", "", 0)
+
+
+def is_idle(frames: List[Any]) -> bool:
+    """The event loop is blocked in its selector, waiting for I/O"""
+    return bool(frames) and frames[-1].f_code.co_name in ("select", "poll", "epoll", "kqueue", "control") \
+        and frames[-1].f_code.co_filename.endswith("selectors.py")
+
+
+class RequestProfile:
+    """
+    Wall-clock samples of one request: one lane per task it started, each
+    sample the task's stack, running or suspended. Consecutive identical
+    samples are merged into one weighted sample.
+    """
+
+    __slots__ = ("profile_id", "method", "path", "started_at", "started", "ended", "tasks", "lanes")
+
+    def __init__(self, method: str, path: str):
+        self.profile_id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.tasks: Dict[asyncio.Task, str] = {}
+        # lane name -> [stacks, weights in seconds]
+        self.lanes: Dict[str, list] = {}
+
+    def add_task(self, task: asyncio.Task):
+        coro = task.get_coro()
+        name = getattr(coro, "__qualname__", None) or task.get_name()
+        self.tasks[task] = f"{name} ({len(self.tasks)})" if self.tasks else f"{self.method} {self.path}"
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self.tasks.pop(task, None)
+
+    def record(self, lane: str, stack: Tuple[FrameKey, ...], weight: float):
+        stacks, weights = self.lanes.setdefault(lane, [[], []])
+        if stacks and stacks[-1] == stack:
+            weights[-1] += weight
+        else:
+            stacks.append(stack)
+            weights.append(weight)
+
+    @property
+    def duration(self) -> float:
+        return (self.ended or time.perf_counter()) - self.started
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1),
+            "finished": self.ended is not None,
+            "tasks": len(self.lanes)
+        }
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        return speedscope(
+            f"{self.method} {self.path} {self.profile_id}",
+            [(lane, stacks, [weight * 1000 for weight in weights]) for lane, (stacks, weights) in self.lanes.items()],
+            self.duration * 1000
+        )
+
+
+def speedscope(name: str, lanes: List[Tuple[str, list, list]], end_value: float, unit: str = "milliseconds") -> Dict[str, Any]:
+    """speedscope file with one sampled profile per lane (https://www.speedscope.app)"""
+    frames: List[Dict[str, Any]] = []
+    index: Dict[FrameKey, int] = {}
+    profiles = []
+    for lane, stacks, weights in lanes:
+        samples = []
+        for stack in stacks:
+            sample = []
+            for key in stack:
+                position = index.get(key)
+                if position is None:
+                    position = index[key] = len(frames)
+                    frame = {"name": key[0]}
+                    if key[1]:
+                        frame["file"] = key[1]
+                        frame["line"] = key[2]
+                    frames.append(frame)
+                sample.append(position)
+            samples.append(sample)
+        profiles.append({
+            "type": "sampled",
+            "name": lane,
+            "unit": unit,
+            "startValue": 0,
+            "endValue": end_value if unit == "milliseconds" else sum(weights),
+            "samples": samples,
+            "weights": weights
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "ai-agent profiler",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": profiles
+    }
+
+
+class SamplingProfiler:
+    """
+    In-process sampling profiler for the event loop. A daemon thread reads
+    the loop thread's stack (sys._current_frames) and, for each task of a
+    profiled request, walks its coroutine await chain, so suspended tasks
+    show where they are waiting and the running one shows its full call
+    stack. Tasks a profiled request creates are attached to its profile by
+    a loop task factory, through a context variable.
+    """
+
+    def __init__(
+        self,
+        interval: float = PROFILE_INTERVAL,
+        continuous_hz: float = PROFILE_CONTINUOUS_HZ,
+        keep: int = PROFILE_KEEP,
+        max_seconds: float = PROFILE_MAX_SECONDS,
+        max_stacks: int = PROFILE_MAX_STACKS
+    ):
+        self.interval = interval
+        self.continuous_interval = 1.0 / continuous_hz if continuous_hz > 0 else 0.0
+        self.keep = keep
+        self.max_seconds = max_seconds
+        self.max_stacks = max_stacks
+        self.active: Dict[str, RequestProfile] = {}
+        self.finished: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self.hot_stacks: Counter = Counter()
+        self.continuous_samples = 0
+        self.idle_samples = 0
+        self._loop_thread: Optional[int] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Install the task factory and start the sampler; call from the loop thread"""
+        self._loop_thread = threading.get_ident()
+        previous = loop.get_task_factory()
+
+        def task_factory(loop, coro, **kwargs):
+            if previous is not None:
+                task = previous(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            profile = _active_profile.get()
+            if profile is not None and profile.ended is None:
+                profile.add_task(task)
+            return task
+
+        loop.set_task_factory(task_factory)
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def begin(self, method: str, path: str) -> Tuple[RequestProfile, contextvars.Token]:
+        """Start profiling the current task and whatever it spawns"""
+        profile = RequestProfile(method, path)
+        profile.add_task(asyncio.current_task())
+        self.active[profile.profile_id] = profile
+        self._wake.set()
+        return profile, _active_profile.set(profile)
+
+    def end(self, profile: RequestProfile, token: contextvars.Token):
+        _active_profile.reset(token)
+        profile.ended = time.perf_counter()
+        profile.tasks = {}
+        self.active.pop(profile.profile_id, None)
+        self.finished[profile.profile_id] = profile
+        while len(self.finished) > self.keep:
+            self.finished.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        return self.finished.get(profile_id) or self.active.get(profile_id)
+
+    def _run(self):
+        last_sample = last_continuous = time.perf_counter()
+        while not self._stop.is_set():
+            if self.active:
+                delay = self.interval
+            elif self.continuous_interval:
+                delay = self.continuous_interval
+            else:
+                # Nothing to sample: sleep until a profiled request arrives
+                self._wake.wait()
+                self._wake.clear()
+                last_sample = time.perf_counter()
+                continue
+            time.sleep(delay)
+            # Weighted by the time actually elapsed, which includes any
+            # oversleep while the loop thread held the GIL
+            now = time.perf_counter()
+            elapsed, last_sample = now - last_sample, now
+            try:
+                frames = thread_stack(sys._current_frames().get(self._loop_thread))
+                if not frames:
+                    continue
+                if self.active:
+                    self._sample_requests(frames, elapsed, now)
+                if self.continuous_interval and now - last_continuous >= self.continuous_interval:
+                    last_continuous = now
+                    self._sample_continuous(frames)
+            except Exception as e:
+                # A frame can disappear mid-walk; drop the sample
+                print(f"Profiler sample failed: {e}")
+
+    def _sample_requests(self, frames: List[Any], weight: float, now: float):
+        running = {id(frame): position for position, frame in enumerate(frames)}
+        for profile in list(self.active.values()):
+            if now - profile.started > self.max_seconds:
+                continue
+            for task, lane in list(profile.tasks.items()):
+                chain, awaited = await_chain(task.get_coro())
+                if not chain:
+                    continue
+                position = running.get(id(chain[0]))
+                if position is not None:
+                    # Running now: its full stack is on the loop thread
+                    stack = tuple(frame_key(frame) for frame in frames[position:])
+                else:
+                    stack = tuple(frame_key(frame) for frame in chain) + (waiting_on(awaited),)
+                profile.record(lane, stack, weight)
+
+    def _sample_continuous(self, frames: List[Any]):
+        self.continuous_samples += 1
+        if is_idle(frames):
+            self.idle_samples += 1
+            return
+        stack = tuple(frame_key(frame) for frame in frames)
+        if stack not in self.hot_stacks and len(self.hot_stacks) >= self.max_stacks:
+            stack = OTHER_STACK
+        self.hot_stacks[stack] += 1
+
+    def hot(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most frequent busy stacks of the continuous profile, innermost frame first"""
+        busy = self.continuous_samples - self.idle_samples
+        return [
+            {
+                "count": count,
+                "share": round(count / busy, 4) if busy else 0.0,
+                "stack": [f"{name} ({os.path.basename(path)}:{line})" if path else name
+                          for name, path, line in reversed(stack)]
+            }
+            for stack, count in self.hot_stacks.most_common(limit)
+        ]
+
+    def hot_speedscope(self) -> Dict[str, Any]:
+        stacks = list(self.hot_stacks)
+        weights = [self.hot_stacks[stack] for stack in stacks]
+        return speedscope("event loop (continuous)", [("event loop", stacks, weights)], sum(weights), unit="none")
+
+    def hot_collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, for flamegraph.pl"""
+        return "".join(
+            ";".join(name for name, _, _ in stack) + f" {count}\n"
+            for stack, count in self.hot_stacks.items()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "active": len(self.active),
+            "stored": len(self.finished),
+            "continuous_hz": round(1.0 / self.continuous_interval, 2) if self.continuous_interval else 0,
+            "continuous_samples": self.continuous_samples,
+            "idle_samples": self.idle_samples,
+            "distinct_stacks": len(self.hot_stacks)
+        }
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling requests that carry PROFILE_HEADER; the
+    profile id is returned in X-Profile-Id. Other requests pay one header
+    scan.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, token: str = PROFILE_TOKEN):
+        self.app = app
+        self.profiler = profiler
+        self.token = token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        value = _header(scope, PROFILE_HEADER)
+        if value is None or not self.token or not hmac.compare_digest(value.encode(), self.token.encode()):
+            await self.app(scope, receive, send)
+            return
+        profile, token = self.profiler.begin(scope["method"], scope["path"])
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", [])) + [(b"x-profile-id", profile.profile_id.encode("latin-1"))]
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.profiler.end(profile, token)
@@ -0,0 +1,214 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sessions import estimate_tokens
+
+# Context window requested from Ollama and the share kept free for the answer
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+PROMPT_RESERVED_OUTPUT_TOKENS = int(os.getenv("PROMPT_RESERVED_OUTPUT_TOKENS", "1536"))
+# Longest a single free-text preference field may be in the prompt
+PROMPT_FIELD_MAX_CHARS = int(os.getenv("PROMPT_FIELD_MAX_CHARS", "300"))
+
+# Fixed instructions sent as Ollama's system prompt. It is byte-identical on
+# every call, so with keep_alive the model's KV cache for it is reused and only
+# the per-request suffix is prefilled.
+TRAVEL_PLAN_SYSTEM_PREFIX = """You are an expert travel concierge for Airbnb. Create a personalized travel plan for a guest.
+
+Please provide a detailed response in the following JSON format:
+{
+    "day_by_day_plan": [
+        {
+            "day": "Day 1",
+            "morning": "Morning activity description",
+            "afternoon": "Afternoon activity description",
+            "evening": "Evening activity description"
+        }
+    ],
+    "activity_cards": [
+        {
+            "title": "Activity Name",
+            "address": "Activity Address",
+            "price_tier": "Budget/Mid-range/Luxury",
+            "duration": "2-3 hours",
+            "tags": ["tag1", "tag2"],
+            "wheelchair_friendly": true/false,
+            "child_friendly": true/false
+        }
+    ],
+    "restaurant_recommendations": [
+        {
+            "name": "Restaurant Name",
+            "cuisine": "Cuisine Type",
+            "address": "Restaurant Address",
+            "price_tier": "Budget/Mid-range/Luxury",
+            "dietary_options": ["vegetarian", "vegan", "gluten-free"]
+        }
+    ],
+    "packing_checklist": [
+        "Item 1 based on weather and activities",
+        "Item 2 based on weather and activities"
+    ]
+}
+
+Consider the location's typical weather, local attractions, and cultural aspects.
+Ensure all recommendations align with the guest's budget, interests, mobility needs, and dietary restrictions.
+Provide practical, specific recommendations with addresses where possible."""
+
+TRAVEL_PLAN_PREFIX_TOKENS = estimate_tokens(TRAVEL_PLAN_SYSTEM_PREFIX)
+
+# System prompt for the later days of a long stay, generated a range at a time
+TRAVEL_DAYS_SYSTEM_PREFIX = """You are an expert travel concierge for Airbnb. Continue a guest's day-by-day travel plan for the days requested.
+
+Please provide a detailed response in the following JSON format:
+{
+    "day_by_day_plan": [
+        {
+            "day": "Day 6",
+            "morning": "Morning activity description",
+            "afternoon": "Afternoon activity description",
+            "evening": "Evening activity description"
+        }
+    ]
+}
+
+Include exactly the requested days, in order. Vary the activities from day to day across a long stay.
+Ensure all recommendations align with the guest's budget, interests, mobility needs, and dietary restrictions."""
+
+TRAVEL_DAYS_PREFIX_TOKENS = estimate_tokens(TRAVEL_DAYS_SYSTEM_PREFIX)
+
+
+class PlanPrompt:
+    """System prefix (static) and per-request prompt suffix, plus trim report"""
+
+    __slots__ = ("system", "prompt", "tokens", "trimmed")
+
+    def __init__(self, system: str, prompt: str, trimmed: Dict[str, int]):
+        self.system = system
+        self.prompt = prompt
+        self.tokens = estimate_tokens(system) + estimate_tokens(prompt)
+        self.trimmed = trimmed
+
+    def __str__(self) -> str:
+        return f"{self.system}\n\n{self.prompt}"
+
+
+def clip(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)].rstrip() + "..."
+
+
+def fit_tokens(text: str, max_tokens: int) -> str:
+    """
+    Trim text to roughly max_tokens, cutting at a line break when possible so
+    search snippets are dropped whole rather than mid-sentence.
+    """
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max_tokens * 4
+    cut = text.rfind("\n", 0, max_chars)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return text[:cut].rstrip()
+
+
+def fit_history(history: List[Dict[str, str]], max_tokens: int) -> List[Dict[str, str]]:
+    """Keep the most recent turns that fit in the budget, oldest first"""
+    kept = []
+    used = 0
+    for message in reversed(history):
+        cost = estimate_tokens(message["content"]) + 4
+        if used + cost > max_tokens:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def day_range_line(start: int, end: int, total: int) -> str:
+    """Which days of the stay to plan, as 0-based [start, end) of total"""
+    days = f"Day {start + 1}" if end - start == 1 else f"Day {start + 1} to Day {end}"
+    return f"\n- Days to Plan: {days} of a {total}-day stay"
+
+
+def booking_details(request, days: str = "") -> str:
+    booking = request.booking_context
+    prefs = request.preferences
+    field = PROMPT_FIELD_MAX_CHARS
+    return f"""BOOKING DETAILS:
+- Location: {clip(booking.location, field)}
+- Check-in: {booking.start_date}
+- Check-out: {booking.end_date}
+- Travel Party: {clip(booking.party_type, field)}{days}
+
+GUEST PREFERENCES:
+- Budget Level: {clip(prefs.budget, field)}
+- Interests: {clip(', '.join(prefs.interests), field)}
+- Mobility Needs: {clip(prefs.mobility_needs, field) if prefs.mobility_needs else 'None specified'}
+- Dietary Restrictions: {clip(', '.join(prefs.dietary_filters), field) if prefs.dietary_filters else 'None'}"""
+
+
+def build_travel_plan_prompt(
+    request,
+    local_info: str = "",
+    history: Optional[List[Dict[str, str]]] = None,
+    num_ctx: int = OLLAMA_NUM_CTX,
+    reserved_output: int = PROMPT_RESERVED_OUTPUT_TOKENS,
+    days: Optional[Tuple[int, int, int]] = None
+) -> PlanPrompt:
+    """
+    Build the variable part of the travel plan prompt within the context budget.
+    Booking details and preferences always fit (long fields are clipped);
+    conversation history comes next, newest turns first; local information
+    gets whatever budget remains. `days` limits the day-by-day plan to a
+    (start, end, total) range of a long stay.
+    """
+    details = booking_details(request, day_range_line(*days) if days else "")
+    remaining = num_ctx - reserved_output - TRAVEL_PLAN_PREFIX_TOKENS - estimate_tokens(details)
+    trimmed = {}
+
+    history_text = ""
+    if history:
+        # History may use at most half of what is left, local info gets the rest
+        kept = fit_history(history, max(0, remaining // 2))
+        trimmed["history_turns"] = len(history) - len(kept)
+        if kept:
+            history_text = "\n\nCONVERSATION SO FAR:\n" + "\n".join(
+                f"{message['role']}: {message['content']}" for message in kept
+            )
+            remaining -= estimate_tokens(history_text)
+
+    local_context = ""
+    if local_info:
+        fitted = fit_tokens(local_info, remaining - 8)
+        trimmed["local_info_chars"] = len(local_info) - len(fitted)
+        if fitted:
+            local_context = f"\n\nLOCAL INFORMATION:\n{fitted}"
+
+    prompt = details + history_text + local_context
+    return PlanPrompt(TRAVEL_PLAN_SYSTEM_PREFIX, prompt, trimmed)
+
+
+def build_day_range_prompt(
+    request,
+    start: int,
+    end: int,
+    total: int,
+    local_info: str = "",
+    num_ctx: int = OLLAMA_NUM_CTX,
+    reserved_output: int = PROMPT_RESERVED_OUTPUT_TOKENS
+) -> PlanPrompt:
+    """Prompt for days [start, end) of a stay; local information fills the remaining budget"""
+    details = booking_details(request, day_range_line(start, end, total))
+    remaining = num_ctx - reserved_output - TRAVEL_DAYS_PREFIX_TOKENS - estimate_tokens(details)
+    trimmed = {}
+    local_context = ""
+    if local_info:
+        fitted = fit_tokens(local_info, remaining - 8)
+        trimmed["local_info_chars"] = len(local_info) - len(fitted)
+        if fitted:
+            local_context = f"\n\nLOCAL INFORMATION:\n{fitted}"
+    return PlanPrompt(TRAVEL_DAYS_SYSTEM_PREFIX, details + local_context, trimmed)
@@ -0,0 +1,115 @@
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+import httpx
+
+from cache import TTLCache, normalize_key_part
+
+TAVILY_SEARCH_URL = os.getenv("TAVILY_SEARCH_URL", "https://api.tavily.com/search")
+TAVILY_SEARCH_DEPTH = os.getenv("TAVILY_SEARCH_DEPTH", "advanced")
+TAVILY_TOPIC_TIMEOUT = float(os.getenv("TAVILY_TOPIC_TIMEOUT", "6.0"))
+TAVILY_MAX_CONNECTIONS = int(os.getenv("TAVILY_MAX_CONNECTIONS", "20"))
+TAVILY_RESULTS_PER_TOPIC = int(os.getenv("TAVILY_RESULTS_PER_TOPIC", "3"))
+
+# Filler words dropped when a query type such as "attractions and activities"
+# is split into independently searchable topics
+_TOPIC_STOPWORDS = {"and", "or", "the", "of", "for", "with"}
+
+
+def split_topics(query_type: str) -> List[str]:
+    """Split a query type like "attractions restaurants events" into topics"""
+    topics = []
+    for word in query_type.lower().replace(",", " ").split():
+        if word not in _TOPIC_STOPWORDS and word not in topics:
+            topics.append(word)
+    return topics or ["general"]
+
+
+class TavilySearch:
+    """
+    Async Tavily client backed by a pooled keep-alive HTTP connection.
+    Each topic of a query is searched concurrently under its own deadline,
+    and whatever topics finish in time are returned as partial results.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = TAVILY_SEARCH_URL,
+        topic_timeout: float = TAVILY_TOPIC_TIMEOUT,
+        max_connections: int = TAVILY_MAX_CONNECTIONS,
+        results_per_topic: int = TAVILY_RESULTS_PER_TOPIC,
+        cache: Optional[TTLCache] = None
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.topic_timeout = topic_timeout
+        self.results_per_topic = results_per_topic
+        self.cache = cache
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(topic_timeout, connect=min(topic_timeout, 3.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+
+    async def search_topic(self, location: str, topic: str) -> str:
+        """Search a single topic for a location and format the top results"""
+        payload = {
+            "api_key": self.api_key,
+            "query": f"{location} {topic} information for travelers",
+            "search_depth": TAVILY_SEARCH_DEPTH,
+            "max_results": self.results_per_topic
+        }
+        response = await self._client.post(self.base_url, json=payload)
+        response.raise_for_status()
+        return format_results(response.json(), self.results_per_topic)
+
+    async def search(self, location: str, query_type: str = "general") -> Optional[str]:
+        """
+        Fan out one search per topic and join the sections that completed.
+        Returns None when every topic failed or timed out.
+        """
+        topics = split_topics(query_type)
+        results = await asyncio.gather(
+            *(self._cached_search(location, topic) for topic in topics)
+        )
+        sections = [text for text in results if text]
+        if not sections:
+            return None
+        return "".join(sections)
+
+    async def _cached_search(self, location: str, topic: str) -> str:
+        if not self.cache:
+            return await self._search_with_deadline(location, topic)
+        # Empty sections (errors/timeouts) are not cached so they get retried
+        return await self.cache.get_or_load(
+            (normalize_key_part(location), topic),
+            lambda: self._search_with_deadline(location, topic)
+        )
+
+    async def _search_with_deadline(self, location: str, topic: str) -> str:
+        try:
+            return await asyncio.wait_for(
+                self.search_topic(location, topic),
+                timeout=self.topic_timeout
+            )
+        except asyncio.TimeoutError:
+            print(f"Tavily search timed out for topic '{topic}' in {location}")
+        except Exception as e:
+            print(f"Tavily search error for topic '{topic}' in {location}: {e}")
+        return ""
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def format_results(response: Dict, limit: int) -> str:
+    """Format Tavily results the same way the original sync lookup did"""
+    results_text = ""
+    for result in (response or {}).get("results", [])[:limit]:
+        if "content" in result:
+            results_text += f"\n{result.get('title', '')}: {result['content'][:200]}..."
+    return results_text
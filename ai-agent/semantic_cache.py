@@ -0,0 +1,324 @@
+import os
+import re
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # semantic cache disabled without numpy
+    np = None
+
+from cache import normalize_key_part
+from itinerary import PLAN_PAGE_DAYS, trip_days
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "21600"))
+# Minimum cosine similarity (of party and budget) for a cached plan to answer
+# a request whose interests and needs it already satisfies
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# Nearest plans checked against a request's dietary and mobility needs
+SEMANTIC_CACHE_CANDIDATES = int(os.getenv("SEMANTIC_CACHE_CANDIDATES", "8"))
+# Largest difference in trip length that adapting the days can cover
+SEMANTIC_CACHE_MAX_DAY_DELTA = int(os.getenv("SEMANTIC_CACHE_MAX_DAY_DELTA", "2"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "256"))
+
+STOPWORDS = {"a", "an", "and", "the", "with", "of", "for", "to", "my", "our", "in", "on", "+", "&"}
+# Spellings that mean the same thing for plan purposes
+SYNONYMS = {
+    "children": "kids", "child": "kids", "kid": "kids", "toddlers": "kids", "toddler": "kids",
+    "families": "family", "couples": "couple", "partner": "couple", "romantic": "couple",
+    "alone": "solo", "single": "solo", "friend": "friends", "group": "friends",
+    "guest": "guests", "people": "guests", "persons": "guests", "adults": "guests",
+    "cheap": "budget", "low": "budget", "economy": "budget",
+    "moderate": "mid", "mid-range": "mid", "midrange": "mid", "medium": "mid", "standard": "mid",
+    "high": "luxury", "premium": "luxury", "upscale": "luxury",
+    "foodie": "food", "dining": "food", "cuisine": "food", "restaurants": "food",
+    "museums": "museum", "historical": "history", "outdoors": "nature", "hiking": "nature",
+    "wheelchair-accessible": "wheelchair", "accessible": "wheelchair",
+    "veggie": "vegetarian", "plant-based": "vegan", "gluten": "gluten-free"
+}
+# Free-text feature groups compared by similarity, each as a bag of tokens.
+# Interests, dietary and mobility needs decide what a plan contains, so they
+# are matched exactly instead (see plan_constraints).
+FIELD_WEIGHTS = {"party": 1.0, "budget": 1.0}
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9\-]*")
+
+
+def tokens(text: str) -> List[str]:
+    result = []
+    for token in _TOKEN.findall((text or "").lower()):
+        if token in STOPWORDS or token.isdigit():
+            continue
+        token = SYNONYMS.get(token, token)
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = SYNONYMS.get(token[:-1], token[:-1])
+        result.append(token)
+    return result
+
+
+def plan_features(request) -> Dict[str, List[str]]:
+    """Normalized token bags of the request fields that shape a plan (not dates or city)"""
+    preferences = request.preferences
+    features = {
+        "party": tokens(request.booking_context.party_type),
+        "budget": tokens(preferences.budget),
+        "interests": sorted({token for interest in preferences.interests for token in tokens(interest)}),
+        "dietary": sorted({token for item in preferences.dietary_filters for token in tokens(item)}),
+        "mobility": tokens(preferences.mobility_needs or "")
+    }
+    # An empty group must match another empty group, not anything
+    return {field: values or ["none"] for field, values in features.items()}
+
+
+def plan_constraints(features: Dict[str, List[str]]) -> Tuple[str, FrozenSet[str]]:
+    """
+    (interest key, needs) of a request. A cached plan can only answer a
+    request with exactly the same interests, whose dietary and mobility
+    needs are all among the ones the plan was built for.
+    """
+    needs = frozenset(
+        f"{field}:{value}" for field in ("dietary", "mobility") for value in features[field] if value != "none"
+    )
+    return "+".join(features["interests"]), needs
+
+
+class HashingEmbedder:
+    """
+    Local CPU-only encoder: signed feature hashing of each token group into a
+    fixed-size vector, groups normalized and weighted, the result L2
+    normalized so a dot product is the cosine similarity
+    """
+
+    def __init__(self, dim: int = SEMANTIC_CACHE_DIM, weights: Dict[str, float] = FIELD_WEIGHTS):
+        self.dim = dim
+        self.weights = weights
+
+    def embed(self, features: Dict[str, List[str]]):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for field, weight in self.weights.items():
+            values = features.get(field) or []
+            if not values:
+                continue
+            group = np.zeros(self.dim, dtype=np.float32)
+            for value in values:
+                digest = zlib.crc32(f"{field}:{value}".encode("utf-8"))
+                group[digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+            norm = np.linalg.norm(group)
+            if norm:
+                vector += group * (weight / norm)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SemanticIndex:
+    """
+    Vectors in one preallocated NumPy matrix with per-row partition (city),
+    trip length and expiry. Lookups score a batch of queries against every
+    live row with one matrix product and take the top k per query.
+    """
+
+    def __init__(
+        self,
+        dim: int = SEMANTIC_CACHE_DIM,
+        max_entries: int = SEMANTIC_CACHE_SIZE,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL,
+        max_day_delta: int = SEMANTIC_CACHE_MAX_DAY_DELTA
+    ):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_day_delta = max_day_delta
+        self._vectors = np.zeros((min(64, max_entries), dim), dtype=np.float32)
+        self._partitions = np.zeros(len(self._vectors), dtype=np.int64)
+        self._days = np.zeros(len(self._vectors), dtype=np.int64)
+        self._expires = np.zeros(len(self._vectors), dtype=np.float64)
+        self._values: List[Any] = [None] * len(self._vectors)
+        self._size = 0
+        self._partition_ids: Dict[str, int] = {}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _partition_id(self, partition: str) -> int:
+        return self._partition_ids.setdefault(partition, len(self._partition_ids) + 1)
+
+    def _grow(self):
+        capacity = min(len(self._vectors) * 2, self.max_entries)
+        extra = capacity - len(self._vectors)
+        self._vectors = np.vstack([self._vectors, np.zeros((extra, self.dim), dtype=np.float32)])
+        self._partitions = np.concatenate([self._partitions, np.zeros(extra, dtype=np.int64)])
+        self._days = np.concatenate([self._days, np.zeros(extra, dtype=np.int64)])
+        self._expires = np.concatenate([self._expires, np.zeros(extra, dtype=np.float64)])
+        self._values.extend([None] * extra)
+
+    def _free_row(self, now: float) -> int:
+        if self._size < len(self._vectors):
+            return self._size
+        if len(self._vectors) < self.max_entries:
+            self._grow()
+            return self._size
+        # Full: reuse an expired row, else the one closest to expiry
+        row = int(np.argmin(self._expires[:self._size]))
+        if self._expires[row] > now:
+            self.evictions += 1
+        self._size -= 1
+        last = self._size
+        if row != last:
+            self._move(last, row)
+        return last
+
+    def _move(self, source: int, target: int):
+        self._vectors[target] = self._vectors[source]
+        self._partitions[target] = self._partitions[source]
+        self._days[target] = self._days[source]
+        self._expires[target] = self._expires[source]
+        self._values[target] = self._values[source]
+
+    def add(self, partition: str, vector, days: int, value: Any):
+        now = time.time()
+        row = self._free_row(now)
+        self._vectors[row] = vector
+        self._partitions[row] = self._partition_id(partition)
+        self._days[row] = days
+        self._expires[row] = now + self.ttl_seconds
+        self._values[row] = value
+        self._size = max(self._size, row + 1)
+
+    def search(self, partitions: Sequence[str], vectors, days: Sequence[int],
+               k: int = 1) -> List[List[Tuple[float, Any]]]:
+        """Top-k (similarity, value) per query among live rows of its partition and trip length"""
+        results: List[List[Tuple[float, Any]]] = [[] for _ in partitions]
+        if not self._size:
+            return results
+        now = time.time()
+        size = self._size
+        scores = np.asarray(vectors, dtype=np.float32).reshape(len(partitions), self.dim) @ self._vectors[:size].T
+        live = self._expires[:size] > now
+        for i, partition in enumerate(partitions):
+            partition_id = self._partition_ids.get(partition)
+            if partition_id is None:
+                continue
+            mask = live & (self._partitions[:size] == partition_id)
+            mask &= np.abs(self._days[:size] - days[i]) <= self.max_day_delta
+            row_scores = np.where(mask, scores[i], -np.inf)
+            top = min(k, size)
+            candidates = np.argpartition(-row_scores, top - 1)[:top]
+            for row in candidates[np.argsort(-row_scores[candidates])]:
+                if np.isfinite(row_scores[row]):
+                    results[i].append((float(row_scores[row]), self._values[row]))
+        return results
+
+
+def adapt_plan(plan, source_request, request):
+    """
+    Reuse a plan generated for a similar request: relabel and trim (or
+    repeat) its days to the new trip's first page and swap the old dates in
+    the text for the new ones. Activities, restaurants and packing stay as is.
+    """
+    days = list(plan.day_by_day_plan)
+    target = min(trip_days(request), PLAN_PAGE_DAYS)
+    replacements = _date_replacements(source_request, request)
+    adapted = []
+    for i in range(target if days else 0):
+        day = days[i % len(days)]
+        fields = {"day": f"Day {i + 1}"}
+        for name in ("morning", "afternoon", "evening"):
+            text = getattr(day, name)
+            for old, new in replacements:
+                text = text.replace(old, new)
+            fields[name] = text
+        adapted.append(day.model_copy(update=fields))
+    return plan.model_copy(update={"day_by_day_plan": adapted})
+
+
+def _date_replacements(source_request, request) -> List[Tuple[str, str]]:
+    """Old -> new strings for each day of the source trip, in ISO and 'June 3' form"""
+    try:
+        old_start = datetime.strptime(source_request.booking_context.start_date, "%Y-%m-%d")
+        new_start = datetime.strptime(request.booking_context.start_date, "%Y-%m-%d")
+    except ValueError:
+        return []
+    if old_start == new_start:
+        return []
+    replacements = []
+    for offset in range(trip_days(source_request) + 1):
+        old, new = old_start + timedelta(days=offset), new_start + timedelta(days=offset)
+        replacements.append((old.strftime("%Y-%m-%d"), new.strftime("%Y-%m-%d")))
+        replacements.append((f"{old:%B} {old.day}", f"{new:%B} {new.day}"))
+    return replacements
+
+
+class SemanticPlanCache:
+    """
+    Nearest-neighbour cache of generated plans. A cached plan answers a
+    request, adapted, when it is for the same city and interests, covers
+    every dietary and mobility need of the request, has a similar trip
+    length, and its party type and budget are close enough.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, enabled: bool = SEMANTIC_CACHE_ENABLED,
+                 candidates: int = SEMANTIC_CACHE_CANDIDATES):
+        self.enabled = enabled and np is not None
+        self.threshold = threshold
+        self.candidates = candidates
+        if self.enabled:
+            self.embedder = HashingEmbedder()
+            self.index = SemanticIndex(dim=self.embedder.dim)
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, request, plan):
+        if not self.enabled:
+            return
+        features = plan_features(request)
+        interests, needs = plan_constraints(features)
+        self.index.add(self._partition(request, interests), self.embedder.embed(features), trip_days(request),
+                       (request, plan, needs))
+
+    @staticmethod
+    def _partition(request, interests: str) -> str:
+        return normalize_key_part(request.booking_context.location) + "|" + interests
+
+    def lookup(self, request) -> Optional[Tuple[float, Any]]:
+        """(similarity, adapted plan) for the nearest cached plan above threshold"""
+        return self.lookup_many([request])[0]
+
+    def lookup_many(self, requests: Sequence) -> List[Optional[Tuple[float, Any]]]:
+        if not self.enabled:
+            return [None] * len(requests)
+        features = [plan_features(request) for request in requests]
+        constraints = [plan_constraints(found) for found in features]
+        matches = self.index.search(
+            [self._partition(request, interests) for request, (interests, _) in zip(requests, constraints)],
+            np.stack([self.embedder.embed(found) for found in features]),
+            [trip_days(request) for request in requests],
+            k=self.candidates
+        )
+        results = []
+        for request, (_, needs), top in zip(requests, constraints, matches):
+            match = next(
+                ((score, value) for score, value in top if score >= self.threshold and needs <= value[2]), None
+            )
+            if match is None:
+                self.misses += 1
+                results.append(None)
+                continue
+            self.hits += 1
+            score, (source_request, plan, _) = match
+            results.append((score, adapt_plan(plan, source_request, request)))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.index) if self.enabled else 0,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
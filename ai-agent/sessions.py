@@ -0,0 +1,300 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Set, Tuple
+
+SESSION_WINDOW_TOKENS = int(os.getenv("SESSION_WINDOW_TOKENS", "1500"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", "32768"))
+SESSION_SUMMARY_MAX_CHARS = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "1200"))
+SESSIONS_MAX_BYTES = int(os.getenv("SESSIONS_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSIONS_MAX_COUNT = int(os.getenv("SESSIONS_MAX_COUNT", "50000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+
+# Fixed per-record overhead counted against the memory budget
+_TURN_OVERHEAD = 64
+_SESSION_OVERHEAD = 256
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+class Turn:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        self.tokens = estimate_tokens(content)
+
+    @property
+    def size(self) -> int:
+        return len(self.content) + _TURN_OVERHEAD
+
+
+class SessionAccessDenied(Exception):
+    """The session belongs to a different user"""
+
+
+class Session:
+    """
+    Compact per-session record: a sliding window of recent turns plus a
+    running summary of the turns that slid out of the window.
+    """
+
+    __slots__ = (
+        "session_id", "owner", "turns", "window_tokens", "summary", "overflow",
+        "last_access", "size", "summarizing", "version"
+    )
+
+    def __init__(self, session_id: str, owner: Optional[str] = None):
+        self.session_id = session_id
+        # User that started the session; None for anonymous callers, whose
+        # sessions are usable by whoever holds the (random) id
+        self.owner = owner
+        self.turns: deque = deque()
+        self.window_tokens = 0
+        self.summary = ""
+        # Turns pushed out of the window, waiting to be folded into the summary
+        self.overflow: List[Turn] = []
+        self.last_access = time.monotonic()
+        self.size = _SESSION_OVERHEAD
+        self.summarizing = False
+        # Bumped on every save, so workers can tell a newer shared copy
+        self.version = 0
+
+    def allows(self, user: Optional[str]) -> bool:
+        return self.owner is None or self.owner == user
+
+    def history(self) -> List[Dict[str, str]]:
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation: {self.summary}"})
+        messages.extend({"role": turn.role, "content": turn.content} for turn in self.turns)
+        return messages
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            "id": self.session_id,
+            "owner": self.owner,
+            "version": self.version,
+            "summary": self.summary,
+            "turns": [[turn.role, turn.content] for turn in self.turns],
+            "overflow": [[turn.role, turn.content] for turn in self.overflow]
+        }, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Session":
+        record = json.loads(data)
+        session = cls(record["id"], record.get("owner"))
+        session.version = record["version"]
+        session.summary = record["summary"]
+        for role, content in record["turns"]:
+            turn = Turn(role, content)
+            session.turns.append(turn)
+            session.window_tokens += turn.tokens
+            session.size += turn.size
+        session.overflow = [Turn(role, content) for role, content in record["overflow"]]
+        session.size += len(session.summary) + sum(turn.size for turn in session.overflow)
+        return session
+
+
+def summarize_turns(summary: str, turns: List[Turn], max_chars: int) -> str:
+    """
+    Fold older turns into the running summary. Keeps the first sentence of
+    each guest message, which carries most of the intent, and drops the rest.
+    """
+    points = [summary] if summary else []
+    for turn in turns:
+        if turn.role != "user":
+            continue
+        sentence = turn.content.strip().split("\n")[0]
+        for stop in (". ", "? ", "! "):
+            if stop in sentence:
+                sentence = sentence.split(stop)[0] + stop.strip()
+                break
+        points.append(f"Guest asked: {sentence[:160]}")
+    folded = " | ".join(points)
+    # Keep the most recent points when the summary outgrows its budget
+    return folded[-max_chars:] if len(folded) > max_chars else folded
+
+
+class SessionStore:
+    """
+    Server-side conversation sessions keyed by session id, so clients only
+    send the new message each turn. Enforces a per-session memory cap and
+    evicts least-recently-used sessions when the global budget is exceeded.
+    With a shared tier, saved sessions are visible to every worker process
+    and a newer shared copy replaces the local one. Session ids are only
+    ever generated here, and a session started by a user is only usable by
+    that user.
+    """
+
+    def __init__(
+        self,
+        window_tokens: int = SESSION_WINDOW_TOKENS,
+        session_max_bytes: int = SESSION_MAX_BYTES,
+        max_bytes: int = SESSIONS_MAX_BYTES,
+        max_sessions: int = SESSIONS_MAX_COUNT,
+        ttl_seconds: float = SESSION_TTL,
+        summary_max_chars: int = SESSION_SUMMARY_MAX_CHARS,
+        shared=None
+    ):
+        self.window_tokens = window_tokens
+        self.session_max_bytes = session_max_bytes
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.summary_max_chars = summary_max_chars
+        self.shared = shared
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.summaries = 0
+        # Running summary tasks; the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get_or_create(self, session_id: Optional[str] = None, user: Optional[str] = None) -> Tuple[Session, bool]:
+        """
+        Return (session, created) and mark it most recently used. An unknown
+        or expired id starts a new session under a new id; a session of
+        another user raises SessionAccessDenied.
+        """
+        if session_id and self.shared is not None:
+            await self._refresh_from_shared(session_id)
+        if session_id and session_id in self._sessions:
+            session = self._sessions[session_id]
+            if time.monotonic() - session.last_access <= self.ttl_seconds:
+                if not session.allows(user):
+                    raise SessionAccessDenied(session_id)
+                session.last_access = time.monotonic()
+                self._sessions.move_to_end(session_id)
+                return session, False
+            self._remove(session_id)
+            self.expirations += 1
+        session = Session(uuid.uuid4().hex, user)
+        self._sessions[session.session_id] = session
+        self.total_bytes += session.size
+        self._enforce_global_budget()
+        return session, True
+
+    def append(self, session: Session, role: str, content: str):
+        turn = Turn(role, content)
+        session.turns.append(turn)
+        session.window_tokens += turn.tokens
+        self._resize(session, turn.size)
+
+        # Slide the window, keeping at least the newest turn
+        while session.window_tokens > self.window_tokens and len(session.turns) > 1:
+            old = session.turns.popleft()
+            session.window_tokens -= old.tokens
+            session.overflow.append(old)
+
+        if session.overflow and not session.summarizing:
+            session.summarizing = True
+            try:
+                task = asyncio.get_running_loop().create_task(self._summarize(session))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            except RuntimeError:
+                # No running loop (e.g. called from sync code); fold inline
+                self._fold(session)
+                session.summarizing = False
+
+        # Per-session cap: drop the oldest window turns beyond the budget
+        while session.size > self.session_max_bytes and len(session.turns) > 1:
+            old = session.turns.popleft()
+            session.window_tokens -= old.tokens
+            self._resize(session, -old.size)
+
+        self._enforce_global_budget()
+
+    def save(self, session: Session):
+        """Publish the session to the shared tier (no-op without one)"""
+        if self.shared is None:
+            return
+        session.version += 1
+        self.shared.set(session.session_id, session, self.ttl_seconds)
+
+    async def _refresh_from_shared(self, session_id: str):
+        entry = await self.shared.get(session_id)
+        if entry is None:
+            return
+        stored = entry[0]
+        local = self._sessions.get(session_id)
+        if local is not None and local.version >= stored.version:
+            return
+        if local is not None:
+            self._remove(session_id)
+        self._sessions[session_id] = stored
+        self.total_bytes += stored.size
+        self._enforce_global_budget()
+
+    async def delete(self, session_id: str, user: Optional[str] = None) -> bool:
+        """Forget a session; False if it does not exist, SessionAccessDenied if it is another user's"""
+        session = self._sessions.get(session_id)
+        if self.shared is not None:
+            entry = await self.shared.get(session_id)
+            if entry is not None:
+                session = entry[0]
+        if session is None:
+            return False
+        if not session.allows(user):
+            raise SessionAccessDenied(session_id)
+        if self.shared is not None:
+            self.shared.delete(session_id)
+        if session_id in self._sessions:
+            self._remove(session_id)
+        return True
+
+    async def _summarize(self, session: Session):
+        # Runs after the response is sent so summarization is off the hot path
+        await asyncio.sleep(0)
+        try:
+            self._fold(session)
+        finally:
+            session.summarizing = False
+
+    def _fold(self, session: Session):
+        if not session.overflow:
+            return
+        pending, session.overflow = session.overflow, []
+        before = len(session.summary)
+        session.summary = summarize_turns(session.summary, pending, self.summary_max_chars)
+        freed = sum(turn.size for turn in pending)
+        self._resize(session, len(session.summary) - before - freed)
+        self.summaries += 1
+
+    def _resize(self, session: Session, delta: int):
+        session.size += delta
+        if session.session_id in self._sessions:
+            self.total_bytes += delta
+
+    def _remove(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self.total_bytes -= session.size
+
+    def _enforce_global_budget(self):
+        while self._sessions and (
+            self.total_bytes > self.max_bytes or len(self._sessions) > self.max_sessions
+        ):
+            session_id, _ = next(iter(self._sessions.items()))
+            self._remove(session_id)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "sessions": len(self._sessions),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "window_tokens": self.window_tokens,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "summaries": self.summaries,
+            "shared": self.shared.stats() if self.shared is not None else None
+        }
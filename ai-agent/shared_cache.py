@@ -0,0 +1,269 @@
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Cache shared by all worker processes on a node, e.g.
+#   sqlite:////dev/shm/ai-agent-cache.db   (tmpfs file, WAL mode)
+#   memory://                              (in-process stand-in for development)
+# Empty disables the shared tier.
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "20000"))
+# How long a worker waits for another worker's write lock before skipping
+SHARED_CACHE_BUSY_TIMEOUT = float(os.getenv("SHARED_CACHE_BUSY_TIMEOUT", "0.05"))
+
+
+class MemoryBackend:
+    """In-process stand-in with the shared backend interface (not cross-process)"""
+
+    # Calls never block, so they run directly on the event loop
+    blocking = False
+
+    def __init__(self, max_entries: int = SHARED_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, bytes]] = {}
+
+    @classmethod
+    def from_url(cls, url: str) -> "MemoryBackend":
+        return cls()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        remaining = entry[0] - time.time()
+        if remaining <= 0:
+            del self._entries[key]
+            return None
+        return entry[1], remaining
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        self._entries[key] = (time.time() + ttl_seconds, value)
+        if len(self._entries) > self.max_entries:
+            # Drop the entry closest to expiry
+            del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def scan(self, prefix: str) -> List[Tuple[str, bytes]]:
+        now = time.time()
+        return [
+            (key, value) for key, (expires_at, value) in self._entries.items()
+            if key.startswith(prefix) and expires_at > now
+        ]
+
+
+class SQLiteBackend:
+    """
+    Node-local cache in a SQLite file shared by every worker process. Put the
+    file on tmpfs (/dev/shm); WAL mode lets readers proceed while a worker
+    writes, and a short busy timeout makes lock contention a cache miss
+    rather than a stall.
+    """
+
+    PRUNE_EVERY = 256
+    # Calls can wait up to busy_timeout for a lock, so they run off the loop
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = SHARED_CACHE_MAX_ENTRIES,
+                 busy_timeout: float = SHARED_CACHE_BUSY_TIMEOUT):
+        self.path = path
+        self.max_entries = max_entries
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._writes = 0
+
+    @classmethod
+    def from_url(cls, url: str) -> "SQLiteBackend":
+        # sqlite:////abs/path.db -> /abs/path.db, sqlite:///rel.db -> rel.db
+        return cls(url[len("sqlite:///"):])
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per process; connections must not cross a fork
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Cache contents can be recomputed, so durability is not needed
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_expiry ON entries(expires_at)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            return None
+        return row[0], remaining
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl_seconds)
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def scan(self, prefix: str) -> List[Tuple[str, bytes]]:
+        """Live (key, value) pairs whose key starts with prefix"""
+        return self._connection().execute(
+            "SELECT key, value FROM entries WHERE key >= ? AND key < ? AND expires_at > ?",
+            (prefix, prefix + "\uffff", time.time())
+        ).fetchall()
+
+    def prune(self):
+        """Drop expired entries, then the soonest-expiring ones beyond max_entries"""
+        conn = self._connection()
+        conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            "SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+_BACKENDS: Dict[str, Callable[[str], Any]] = {
+    "sqlite": SQLiteBackend.from_url,
+    "memory": MemoryBackend.from_url
+}
+
+
+def register_backend(scheme: str, factory: Callable[[str], Any]):
+    """
+    Add a backend (e.g. redis) constructed from URLs with this scheme. A
+    backend has get/set/delete/scan like SQLiteBackend, and blocking = False
+    only if its calls are safe to make on the event loop.
+    """
+    _BACKENDS[scheme] = factory
+
+
+def open_backend(url: str = SHARED_CACHE_URL):
+    """Backend for a SHARED_CACHE_URL, or None when the shared tier is disabled"""
+    if not url:
+        return None
+    scheme = url.split(":", 1)[0]
+    if scheme not in _BACKENDS:
+        raise ValueError(f"Unknown shared cache backend '{scheme}'")
+    return _BACKENDS[scheme](url)
+
+
+def shared_key(namespace: str, key: Hashable) -> str:
+    parts = key if isinstance(key, tuple) else (key,)
+    return namespace + ":" + "\x1f".join(str(part) for part in parts)
+
+
+# Blocking backend calls of this process run on one thread: the event loop
+# never waits on a file lock, and writes land in the order they were made
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+
+
+def backend_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    # Created lazily, and again after a fork, whose child has no threads
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache")
+        _executor_pid = os.getpid()
+    return _executor
+
+
+async def run_backend(backend, call: Callable[..., Any], *args) -> Any:
+    """Await a backend call, on the backend thread if it can block"""
+    if not getattr(backend, "blocking", True):
+        return call(*args)
+    return await asyncio.get_running_loop().run_in_executor(backend_executor(), call, *args)
+
+
+def submit_backend(backend, call: Callable[..., Any], *args):
+    """Run a backend call without waiting for it (writes and deletes)"""
+    if not getattr(backend, "blocking", True):
+        call(*args)
+    else:
+        backend_executor().submit(call, *args)
+
+
+class SharedTier:
+    """
+    One namespace of the shared backend, with value encoding. Reads are
+    awaited and writes are fire-and-forget; a blocking backend is only
+    ever called from the backend thread. Backend errors (e.g. a lock held
+    past the busy timeout) count as misses or skipped writes, so the shared
+    tier can only make a worker faster, never fail it.
+    """
+
+    def __init__(self, backend, namespace: str,
+                 encode: Callable[[Any], bytes], decode: Callable[[bytes], Any]):
+        self.backend = backend
+        self.namespace = namespace
+        self.encode = encode
+        self.decode = decode
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """(value, remaining ttl seconds) or None"""
+        try:
+            entry = await run_backend(self.backend, self.backend.get, shared_key(self.namespace, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            value = self.decode(entry[0])
+        except Exception as e:
+            self.errors += 1
+            print(f"Shared cache read failed ({self.namespace}): {e}")
+            return None
+        self.hits += 1
+        return value, entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float):
+        try:
+            data = self.encode(value)
+        except Exception as e:
+            self.errors += 1
+            print(f"Shared cache write failed ({self.namespace}): {e}")
+            return
+        submit_backend(self.backend, self._write, self.backend.set, shared_key(self.namespace, key), data, ttl_seconds)
+
+    def delete(self, key: Hashable):
+        submit_backend(self.backend, self._write, self.backend.delete, shared_key(self.namespace, key))
+
+    def _write(self, call: Callable[..., Any], *args):
+        try:
+            call(*args)
+        except Exception as e:
+            self.errors += 1
+            print(f"Shared cache write failed ({self.namespace}): {e}")
+
+    async def scan(self) -> List[Tuple[str, Any]]:
+        """Every live (key, value) in the namespace; keys without the namespace prefix"""
+        prefix = shared_key(self.namespace, "")
+        try:
+            rows = await run_backend(self.backend, self.backend.scan, prefix)
+            return [(key[len(prefix):], self.decode(value)) for key, value in rows]
+        except Exception as e:
+            self.errors += 1
+            print(f"Shared cache scan failed ({self.namespace}): {e}")
+            return []
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
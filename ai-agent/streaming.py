@@ -0,0 +1,90 @@
+import asyncio
+from typing import Any, AsyncIterator
+
+from encoding import dumps
+
+# Disable proxy buffering (nginx honours X-Accel-Buffering) so events flush
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+
+PLAN_SECTIONS = [
+    "day_by_day_plan",
+    "activity_cards",
+    "restaurant_recommendations",
+    "packing_checklist"
+]
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    """Encode one Server-Sent Event with a JSON payload"""
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+def sse_comment(text: str = "") -> bytes:
+    """SSE comment line, used to flush headers immediately and as keep-alive"""
+    return f": {text}\n\n".encode("utf-8")
+
+
+def plan_section_event(section: str, items: list) -> bytes:
+    """plan_section event for one section's validated items"""
+    data = [item.model_dump() if hasattr(item, "model_dump") else item for item in items]
+    return sse_event("plan_section", {"section": section, "data": data})
+
+
+def plan_section_events(plan) -> list:
+    """
+    One plan_section event per AgentResponse section, then a plan_pages event
+    with the cursor for the remaining days when the stay is longer
+    """
+    data = plan.model_dump()
+    events = [
+        sse_event("plan_section", {"section": section, "data": data[section]})
+        for section in PLAN_SECTIONS
+    ]
+    if data.get("next_cursor"):
+        events.append(sse_event("plan_pages", {"total_days": data["total_days"], "next_cursor": data["next_cursor"]}))
+    return events
+
+
+async def within_deadline(source: AsyncIterator, seconds: float) -> AsyncIterator:
+    """
+    Items of source until `seconds` have passed, then asyncio.TimeoutError.
+    The source runs in its own task feeding a queue and only the waits for
+    its items are timed, so the deadline never fires while the consumer is
+    suspended in a yield (e.g. writing an event to a slow client).
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        # (True, item) per item, then (False, None) or (False, error)
+        try:
+            async for item in source:
+                queue.put_nowait((True, item))
+            queue.put_nowait((False, None))
+        except Exception as e:
+            queue.put_nowait((False, e))
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            if not queue.empty():
+                # Produced in time, however long the consumer took
+                more, value = queue.get_nowait()
+            else:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                more, value = await asyncio.wait_for(queue.get(), remaining)
+            if not more:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        # Cancelling the pump closes the source (and stops the generation)
+        task.cancel()
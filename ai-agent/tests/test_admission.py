@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import AdmissionController, TokenBuckets, request_identity
+from concurrency import Overloaded
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_burst_then_refill(clock):
+    buckets = TokenBuckets(rate=2, burst=3)
+    assert [buckets.take("u") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("u") == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert buckets.take("u") == 0
+    clock[0] += 100
+    assert [buckets.take("u") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("u") > 0
+    assert buckets.limited == 2
+
+
+def test_bucket_cost_and_refund(clock):
+    buckets = TokenBuckets(rate=1, burst=5)
+    assert buckets.take("u", cost=5) == 0
+    assert buckets.take("u", cost=2) == pytest.approx(2)
+    buckets.refund("u", cost=2)
+    assert buckets.take("u", cost=2) == 0
+
+
+def test_bucket_keys_are_bounded(clock):
+    buckets = TokenBuckets(rate=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        buckets.take(key)
+    assert buckets.stats()["keys"] == 2
+    # "a" was dropped and comes back with a full bucket
+    assert buckets.take("a") == 0
+
+
+def test_rate_limit_refunds_the_user_bucket(clock):
+    controller = AdmissionController(
+        user_buckets=TokenBuckets(rate=1, burst=10),
+        ip_buckets=TokenBuckets(rate=1, burst=1)
+    )
+    controller.check_rate("interactive", "u", "1.2.3.4")
+    with pytest.raises(Overloaded) as raised:
+        controller.check_rate("interactive", "u", "1.2.3.4")
+    assert raised.value.status_code == 429
+    assert controller.user_buckets.take("u", cost=9) == 0
+    assert controller.shed == {("interactive", "rate limited"): 1}
+
+
+def test_full_class_sheds_without_blocking_others():
+    classes = {
+        "plan": {"concurrency": 1, "queue": 0, "deadline": 1.0, "cost": 1},
+        "interactive": {"concurrency": 1, "queue": 0, "deadline": 1.0, "cost": 1}
+    }
+    controller = AdmissionController(classes)
+
+    async def scenario():
+        await controller.acquire("plan")
+        with pytest.raises(Overloaded) as raised:
+            await controller.acquire("plan")
+        assert raised.value.status_code == 429
+        await controller.acquire("interactive")
+
+    asyncio.run(scenario())
+    assert controller.admitted == {"plan": 1, "interactive": 1}
+    assert controller.shed == {("plan", "shed"): 1}
+
+
+def test_request_identity_prefers_forwarded_headers(monkeypatch):
+    scope = {
+        "headers": [(b"x-user-id", b"42"), (b"x-forwarded-for", b"9.9.9.9, 10.0.0.1")],
+        "client": ("10.0.0.1", 5000)
+    }
+    assert request_identity(scope) == ("42", "9.9.9.9")
+    monkeypatch.setattr(admission, "ADMISSION_TRUST_FORWARDED", False)
+    assert request_identity(scope) == (None, "10.0.0.1")
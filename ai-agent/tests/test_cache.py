@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+from cache import TTLCache, normalize_key_part
+from shared_cache import MemoryBackend, SharedTier
+
+
+class Loader:
+    """Counts calls and returns its result once released"""
+
+    def __init__(self, result="value"):
+        self.calls = 0
+        self.result = result
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def test_normalize_key_part():
+    assert normalize_key_part("  San   Jose ") == "san jose"
+    assert normalize_key_part(None) == ""
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache()
+    loader = Loader()
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(cache.get_or_load("k", loader)) for _ in range(5)]
+        while not loader.calls:
+            await asyncio.sleep(0)
+        assert cache.loading("k")
+        loader.release.set()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(scenario()) == ["value"] * 5
+    assert loader.calls == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["coalesced"] == 4
+    assert cache.get("k") == "value"
+
+
+def test_cancelled_waiter_does_not_cancel_the_load():
+    cache = TTLCache()
+    loader = Loader()
+
+    async def scenario():
+        first = asyncio.ensure_future(cache.get_or_load("k", loader))
+        second = asyncio.ensure_future(cache.get_or_load("k", loader))
+        while not loader.calls:
+            await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        loader.release.set()
+        return await second
+
+    assert asyncio.run(scenario()) == "value"
+    assert cache.get("k") == "value"
+
+
+def test_failures_are_shared_but_not_cached():
+    cache = TTLCache()
+    loader = Loader(RuntimeError("down"))
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(cache.get_or_load("k", loader)) for _ in range(3)]
+        while not loader.calls:
+            await asyncio.sleep(0)
+        loader.release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(scenario()))
+    assert loader.calls == 1
+    assert not cache.loading("k")
+    assert cache.get("k") is None
+
+
+def test_cache_if_rejects_empty_results():
+    cache = TTLCache()
+
+    async def empty():
+        return []
+
+    assert asyncio.run(cache.get_or_load("k", empty)) == []
+    assert cache.get("k") is None
+
+
+def test_lru_eviction_and_expiry(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(max_entries=2, ttl_seconds=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["expirations"] == 1
+
+
+def test_shared_tier_is_read_before_loading():
+    shared = SharedTier(MemoryBackend(), "test", lambda value: json.dumps(value).encode(), json.loads)
+    shared.set("k", "from another worker", 60)
+    cache = TTLCache(shared=shared)
+    loader = Loader()
+
+    value = asyncio.run(cache.get_or_load("k", loader))
+    assert value == "from another worker"
+    assert loader.calls == 0
+    assert cache.get("k") == "from another worker"
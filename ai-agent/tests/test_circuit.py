@@ -0,0 +1,90 @@
+import pytest
+
+from circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, percentile
+
+
+@pytest.fixture
+def clock():
+    return [0.0]
+
+
+def make_breaker(clock) -> CircuitBreaker:
+    return CircuitBreaker(
+        "test", window=60, min_samples=4, p95_threshold=10, error_rate_threshold=0.5,
+        cooldown=30, clock=lambda: clock[0]
+    )
+
+
+def test_percentile():
+    assert percentile(range(1, 101), 0.95) == 95
+    assert percentile([3.0], 0.95) == 3.0
+
+
+def test_stays_closed_below_min_samples(clock):
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        breaker.record(50, ok=False)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_opens_on_slow_p95_and_rejects_during_cooldown(clock):
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.record(15, ok=True)
+    assert breaker.state == OPEN
+    clock[0] += 29
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_opens_on_error_rate(clock):
+    breaker = make_breaker(clock)
+    for ok in (True, False, False, False):
+        breaker.record(1, ok=ok)
+    assert breaker.state == OPEN
+
+
+def test_old_samples_leave_the_window(clock):
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        breaker.record(50, ok=False)
+    clock[0] += 61
+    breaker.record(1, ok=True)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["samples"] == 1
+
+
+def test_half_open_allows_one_probe_and_closes_on_fast_success(clock):
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.record(1, ok=False)
+    clock[0] += 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(2, ok=True)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["samples"] == 0
+
+
+def test_failed_or_slow_probe_reopens(clock):
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.record(1, ok=False)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record(12, ok=True)
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+    assert not breaker.allow()
+
+
+def test_lost_probe_is_replaced_after_cooldown(clock):
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.record(1, ok=False)
+    clock[0] += 30
+    assert breaker.allow()
+    clock[0] += 30
+    assert breaker.allow()
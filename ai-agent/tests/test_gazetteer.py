@@ -0,0 +1,62 @@
+import pytest
+
+from gazetteer import Gazetteer, Place, fold, load_gazetteer
+
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer(Place(row) for row in [
+        {"name": "Paris", "country_code": "FR", "population": 2_100_000},
+        {"name": "Paris", "region_code": "TX", "country_code": "US", "population": 25_000},
+        {"name": "Portland", "region_code": "OR", "country_code": "US", "population": 640_000},
+        {"name": "Portland", "region_code": "ME", "country_code": "US", "population": 68_000},
+        {"name": "Saint Louis", "region_code": "MO", "country_code": "US", "population": 300_000},
+        {"name": "San Francisco", "region_code": "CA", "country_code": "US", "population": 870_000,
+         "aliases": ["sf"]},
+        {"name": "Zürich", "country_code": "CH", "country": "Switzerland", "population": 420_000}
+    ])
+
+
+def test_fold():
+    assert fold("  St. Louis ") == "saint louis"
+    assert fold("ZÜRICH") == "zurich"
+    assert fold("Bed & Breakfast") == "bed and breakfast"
+
+
+def test_lookup_prefers_most_populous(gazetteer):
+    assert gazetteer.lookup("paris").label == "Paris, France"
+    assert gazetteer.lookup("Portland").region_code == "OR"
+
+
+def test_qualifiers_pick_the_place(gazetteer):
+    assert gazetteer.lookup("Paris, Texas").label == "Paris, TX, United States"
+    assert gazetteer.lookup("Portland ME").region_code == "ME"
+    assert gazetteer.lookup("portland, maine, usa").region_code == "ME"
+
+
+def test_spelling_variants_resolve_to_one_id(gazetteer):
+    ids = {gazetteer.lookup(text).place_id for text in ("St Louis", "saint louis, MO", "ST. LOUIS")}
+    assert ids == {"us-mo-saint-louis"}
+    assert gazetteer.lookup("Zurich").name == "Zürich"
+    assert gazetteer.lookup("SF").name == "San Francisco"
+
+
+def test_unknown_locations(gazetteer):
+    assert gazetteer.lookup("Atlantis") is None
+    assert gazetteer.lookup(" , ") is None
+    assert gazetteer.lookup("Paris, Germany") is None
+    # Empty input is not a lookup
+    assert gazetteer.stats()["unresolved"] == 2
+
+
+def test_suggest(gazetteer):
+    assert [place.label for place in gazetteer.suggest("par")] == ["Paris, France", "Paris, TX, United States"]
+    assert [place.region_code for place in gazetteer.suggest("portland m")] == ["ME"]
+    assert gazetteer.suggest("par", limit=1)[0].country_code == "FR"
+    assert gazetteer.suggest("") == []
+
+
+def test_built_in_places_load():
+    gazetteer = load_gazetteer(None)
+    assert gazetteer.lookup("nyc").name == "New York"
+    assert gazetteer.lookup("San Jose, California").region_code == "CA"
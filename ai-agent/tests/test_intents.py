@@ -0,0 +1,28 @@
+from benchmarks.intent_bench import check_regressions
+from intents import DEFAULT_INTENT_TABLE, IntentClassifier, inflections
+
+
+def test_regression_cases():
+    assert check_regressions(IntentClassifier(DEFAULT_INTENT_TABLE).classify) == []
+
+
+def test_inflections_are_closed():
+    forms = inflections("plan")
+    assert {"plan", "plans", "planned", "planning", "planner"} <= forms
+    assert not {"plane", "planets", "plants"} & forms
+    assert {"activity", "activities"} <= inflections("activity")
+    assert {"schedule", "scheduled", "scheduling"} <= inflections("schedule")
+
+
+def test_whole_words_only():
+    classifier = IntentClassifier(DEFAULT_INTENT_TABLE)
+    assert classifier.classify("this is the weather") == {"weather"}
+    assert "greeting" not in classifier.classify("this")
+
+
+def test_stemmed_phrase():
+    classifier = IntentClassifier({"plan": ["day trip*"]})
+    assert classifier.classify("any day trips nearby") == {"plan"}
+    assert classifier.classify("a day tripod") == set()
+    assert classifier.counts("day trip or day trips") == {"plan": 2}
+
@@ -0,0 +1,78 @@
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from itinerary import (
+    PLAN_MAX_PAGE_DAYS, InvalidCursor, decode_cursor, encode_cursor, first_page, page_from_cursor
+)
+
+
+class Booking(BaseModel):
+    location: str
+    start_date: str
+    end_date: str
+
+
+class Preferences(BaseModel):
+    budget: str
+    interests: List[str]
+
+
+class Request(BaseModel):
+    booking_context: Booking
+    preferences: Preferences
+
+
+def make_request(end_date: str = "2025-01-21", location: str = "Lisbon") -> Request:
+    return Request(
+        booking_context=Booking(location=location, start_date="2025-01-01", end_date=end_date),
+        preferences=Preferences(budget="medium", interests=["food"])
+    )
+
+
+def test_cursors_walk_every_day_once():
+    request = make_request()
+    page = first_page(request, size=5)
+    days = list(range(page.start, page.end))
+    while page.next_cursor:
+        page = page_from_cursor(request, page.next_cursor, limit=7)
+        days.extend(range(page.start, page.end))
+    assert days == list(range(20))
+    assert page.total == 20
+
+
+def test_cursor_is_deterministic_and_keeps_seed():
+    page = first_page(make_request(), size=5)
+    assert page.next_cursor == first_page(make_request(), size=5).next_cursor
+    assert page_from_cursor(make_request(), page.next_cursor).seed == page.seed
+
+
+def test_cursor_rejected_for_another_request():
+    cursor = first_page(make_request(), size=5).next_cursor
+    with pytest.raises(InvalidCursor, match="different plan request"):
+        page_from_cursor(make_request(location="Porto"), cursor)
+
+
+def test_malformed_and_past_end_cursors():
+    request = make_request()
+    fingerprint = first_page(request).fingerprint
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not a cursor!", fingerprint)
+    with pytest.raises(InvalidCursor, match="malformed"):
+        decode_cursor(encode_cursor(fingerprint, 1, -3), fingerprint)
+    with pytest.raises(InvalidCursor, match="past the last day"):
+        page_from_cursor(request, encode_cursor(fingerprint, 1, 20))
+
+
+def test_page_size_is_capped():
+    request = make_request(end_date="2025-03-01")
+    page = page_from_cursor(request, first_page(request, size=5).next_cursor, limit=1000)
+    assert page.end - page.start == PLAN_MAX_PAGE_DAYS
+
+
+def test_chunks_align_to_chunk_size():
+    request = make_request()
+    fingerprint = first_page(request).fingerprint
+    page = page_from_cursor(request, encode_cursor(fingerprint, 1, 3), limit=9)
+    assert page.chunks(size=5) == [(0, 5), (5, 10), (10, 15)]
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import pytest
+
+from broker import InMemoryBroker
+from jobs import Job, JobQueue, JobQueueUnavailable, JobStore
+
+
+class Result:
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+
+
+async def plan_handler(payload):
+    if payload.get("fail"):
+        raise ValueError("no plan")
+    return Result(json.dumps({"city": payload["city"]}).encode(), '"etag"')
+
+
+async def wait_finished(store: JobStore, job_id: str) -> Job:
+    for _ in range(200):
+        job = await store.get(job_id)
+        if job is not None and job.finished:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_store_never_moves_a_job_backwards():
+    store = JobStore()
+    job = Job("j1")
+    assert store.update(job.transition("done"))
+    assert not store.update(job.transition("running"))
+    assert asyncio.run(store.get("j1")).status == "done"
+
+
+def test_owner_is_kept_in_records_but_not_responses():
+    job = Job("j1", owner="alice").transition("done", result=b'{"days": []}', etag='"x"')
+    restored = Job.from_bytes(job.to_bytes())
+    assert restored.owner == "alice"
+    assert restored.result == b'{"days":[]}'
+    assert "owner" not in json.loads(job.response_bytes())
+    assert restored.allows("alice") and not restored.allows("bob") and not restored.allows(None)
+    assert Job("j2").allows("bob")
+
+
+def test_jobs_run_to_done_or_failed():
+    store = JobStore()
+    queue = JobQueue(InMemoryBroker(), store, plan_handler)
+
+    async def scenario():
+        runner = asyncio.create_task(queue.run(worker=True))
+        while not queue.available:
+            await asyncio.sleep(0)
+        done = await queue.submit({"city": "Lisbon"}, owner="alice")
+        failed = await queue.submit({"fail": True})
+        results = await wait_finished(store, done.job_id), await wait_finished(store, failed.job_id)
+        runner.cancel()
+        await queue.stop()
+        return results
+
+    done, failed = asyncio.run(scenario())
+    assert done.status == "done"
+    assert json.loads(done.result) == {"city": "Lisbon"}
+    assert done.etag == '"etag"'
+    assert done.owner == "alice"
+    assert failed.status == "failed"
+    assert failed.error == "no plan"
+    assert queue.stats()["completed"] == 1
+    assert queue.stats()["failed"] == 1
+
+
+def test_submit_is_refused_until_connected_and_while_a_consumer_is_down():
+    queue = JobQueue(InMemoryBroker(), JobStore(), plan_handler)
+
+    async def scenario():
+        with pytest.raises(JobQueueUnavailable, match="not connected"):
+            await queue.submit({"city": "Lisbon"})
+        await queue.connect()
+        queue._consumer_state("events")(False)
+        assert not queue.available
+        with pytest.raises(JobQueueUnavailable, match="events"):
+            await queue.submit({"city": "Lisbon"})
+        queue._consumer_state("events")(True)
+        assert queue.available
+        await queue.submit({"city": "Lisbon"})
+
+    asyncio.run(scenario())
+
+
+class FlakyBroker(InMemoryBroker):
+    """Fails the first subscription to each topic"""
+
+    def __init__(self):
+        super().__init__()
+        self.failed = set()
+
+    async def subscribe(self, topic, group_id, from_beginning=True):
+        if topic not in self.failed:
+            self.failed.add(topic)
+            raise ConnectionError("broker unreachable")
+        async for message in super().subscribe(topic, group_id, from_beginning):
+            yield message
+
+
+def test_consumers_resubscribe_after_a_failure():
+    store = JobStore()
+    queue = JobQueue(FlakyBroker(), store, plan_handler)
+
+    async def scenario():
+        runner = asyncio.create_task(queue.run(worker=True))
+        await asyncio.sleep(0.1)
+        # Both consumers failed and are backing off
+        assert queue.consumers_down == {"events", "jobs"}
+        with pytest.raises(JobQueueUnavailable):
+            await queue.submit({"city": "Lisbon"})
+        while not queue.available:
+            await asyncio.sleep(0.05)
+        job = await queue.submit({"city": "Lisbon"})
+        finished = await wait_finished(store, job.job_id)
+        runner.cancel()
+        await queue.stop()
+        return finished
+
+    assert asyncio.run(scenario()).status == "done"
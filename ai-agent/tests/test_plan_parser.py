@@ -0,0 +1,72 @@
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from plan_parser import PLAN_MAX_PREAMBLE_CHARS, IncrementalPlanParser, PlanParseError, parse_plan
+
+
+class Stop(BaseModel):
+    name: str
+    minutes: int
+
+
+class Plan(BaseModel):
+    stops: List[Stop]
+    tips: List[str]
+
+
+SECTIONS = {"stops": Stop, "tips": str}
+
+
+def test_sections_complete_as_they_close():
+    parser = IncrementalPlanParser(SECTIONS)
+    assert parser.feed('Here you go: {"stops": [{"name": "Pier", "minutes": 30}') == []
+    completed = parser.feed('], "tips"')
+    assert [key for key, _ in completed] == ["stops"]
+    assert completed[0][1][0].name == "Pier"
+    assert parser.feed(': ["Go early"]}') == [("tips", ["Go early"])]
+    assert parser.done
+    assert parser.plan(Plan).tips == ["Go early"]
+
+
+def test_bad_element_aborts_before_section_closes():
+    parser = IncrementalPlanParser(SECTIONS)
+    parser.feed('{"stops": [{"name": "Pier", "minutes": 30}, ')
+    with pytest.raises(PlanParseError, match="invalid stops item"):
+        parser.feed('{"name": "Museum", "minutes": "soon"}')
+
+
+def test_wrong_type_aborts_on_first_character():
+    parser = IncrementalPlanParser(SECTIONS)
+    with pytest.raises(PlanParseError, match="must be a list"):
+        parser.feed('{"stops": {')
+
+
+def test_non_json_output_aborts_after_preamble():
+    parser = IncrementalPlanParser(SECTIONS)
+    parser.feed("x" * (PLAN_MAX_PREAMBLE_CHARS - 1))
+    with pytest.raises(PlanParseError, match="no JSON object"):
+        parser.feed("xx")
+
+
+def test_string_contents_do_not_affect_structure():
+    plan = parse_plan('{"stops": [], "tips": ["use \\"]}\\" quotes", "{not json"]}', SECTIONS, Plan)
+    assert plan.tips == ['use "]}" quotes', "{not json"]
+
+
+def test_missing_section_and_truncation():
+    with pytest.raises(PlanParseError, match="missing tips"):
+        parse_plan('{"stops": []}', SECTIONS, Plan)
+    with pytest.raises(PlanParseError, match="ended before"):
+        parse_plan('{"stops": [], "tips": ["a"', SECTIONS, Plan)
+
+
+@pytest.mark.parametrize("meta", ['{"v": 1}', "[1, 2]", '[{"v": 1}]'])
+def test_non_section_containers_before_sections(meta):
+    plan = parse_plan(
+        '{"meta": ' + meta + ', "stops": [{"name": "Pier", "minutes": 30}], "tips": ["Go early"]}',
+        SECTIONS, Plan
+    )
+    assert plan.stops[0].name == "Pier"
+    assert plan.tips == ["Go early"]
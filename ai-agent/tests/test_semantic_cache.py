@@ -0,0 +1,112 @@
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel
+
+from semantic_cache import SemanticPlanCache, np
+
+pytestmark = pytest.mark.skipif(np is None, reason="semantic cache needs numpy")
+
+
+class Booking(BaseModel):
+    location: str
+    start_date: str
+    end_date: str
+    party_type: str
+
+
+class Preferences(BaseModel):
+    budget: str
+    interests: List[str]
+    dietary_filters: List[str] = []
+    mobility_needs: Optional[str] = None
+
+
+class Request(BaseModel):
+    booking_context: Booking
+    preferences: Preferences
+
+
+class Day(BaseModel):
+    day: str
+    morning: str
+    afternoon: str
+    evening: str
+
+
+class Plan(BaseModel):
+    day_by_day_plan: List[Day]
+
+
+def make_request(location="Lisbon", start="2025-06-01", end="2025-06-04", party="couple", budget="mid-range",
+                 interests=("food", "history"), dietary=(), mobility=None) -> Request:
+    return Request(
+        booking_context=Booking(location=location, start_date=start, end_date=end, party_type=party),
+        preferences=Preferences(budget=budget, interests=list(interests), dietary_filters=list(dietary),
+                                mobility_needs=mobility)
+    )
+
+
+PLAN = Plan(day_by_day_plan=[
+    Day(day=f"Day {i}", morning=f"Market on 2025-06-0{i}", afternoon="Castle", evening="Fado")
+    for i in range(1, 4)
+])
+
+
+def cache_with(request: Request, threshold: float = 0.92) -> SemanticPlanCache:
+    cache = SemanticPlanCache(threshold=threshold, enabled=True)
+    cache.add(request, PLAN)
+    return cache
+
+
+def test_equivalent_request_hits_and_is_adapted():
+    cache = cache_with(make_request())
+    match = cache.lookup(make_request(start="2025-07-01", end="2025-07-04", party="Couples", budget="Medium"))
+    assert match is not None
+    score, plan = match
+    assert score == pytest.approx(1.0, abs=1e-5)
+    assert plan.day_by_day_plan[0].morning == "Market on 2025-07-01"
+    assert cache.stats()["hits"] == 1
+
+
+def test_threshold_separates_hit_from_miss():
+    stored, similar = make_request(budget="mid-range"), make_request(budget="luxury")
+    score, _ = cache_with(stored, threshold=0.0).lookup(similar)
+    assert score < 1.0
+    assert cache_with(stored, threshold=score - 0.01).lookup(similar) is not None
+    assert cache_with(stored, threshold=score + 0.01).lookup(similar) is None
+
+
+def test_default_threshold_rejects_a_different_budget_and_party():
+    cache = cache_with(make_request())
+    assert cache.lookup(make_request(budget="luxury")) is None
+    assert cache.lookup(make_request(party="family")) is None
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.parametrize("changes", [
+    {"interests": ("food",)},
+    {"interests": ("food", "history", "nightlife")},
+    {"dietary": ("vegan",)},
+    {"mobility": "wheelchair"},
+    {"location": "Porto"},
+    {"end": "2025-06-10"}
+])
+def test_no_match_across_partitions_even_at_zero_threshold(changes):
+    cache = cache_with(make_request(), threshold=0.0)
+    assert cache.lookup(make_request(**changes)) is None
+
+
+def test_plan_covering_more_needs_answers_a_subset():
+    cache = cache_with(make_request(dietary=("vegetarian", "gluten-free"), mobility="wheelchair"))
+    assert cache.lookup(make_request(dietary=("veggie",))) is not None
+    assert cache.lookup(make_request(dietary=("vegetarian", "vegan"))) is None
+
+
+def test_nearest_candidate_that_covers_the_needs_wins():
+    cache = SemanticPlanCache(threshold=0.3, enabled=True)
+    cache.add(make_request(), PLAN)
+    cache.add(make_request(budget="luxury", dietary=("vegan",)), PLAN)
+    # The closer plan lacks the vegan need, so the vegan one answers
+    score, _ = cache.lookup(make_request(dietary=("vegan",)))
+    assert score < 1.0
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from sessions import Session, SessionAccessDenied, SessionStore
+from shared_cache import MemoryBackend, SharedTier
+
+
+def shared_tier() -> SharedTier:
+    return SharedTier(MemoryBackend(), "sessions", Session.to_bytes, Session.from_bytes)
+
+
+def test_client_ids_are_never_adopted():
+    store = SessionStore()
+    session, created = asyncio.run(store.get_or_create("chosen-by-client", "alice"))
+    assert created
+    assert session.session_id != "chosen-by-client"
+    assert session.owner == "alice"
+
+
+def test_other_users_are_rejected():
+    store = SessionStore()
+
+    async def scenario():
+        session, _ = await store.get_or_create(None, "alice")
+        assert (await store.get_or_create(session.session_id, "alice")) == (session, False)
+        for user in ("bob", None):
+            with pytest.raises(SessionAccessDenied):
+                await store.get_or_create(session.session_id, user)
+            with pytest.raises(SessionAccessDenied):
+                await store.delete(session.session_id, user)
+        assert await store.delete(session.session_id, "alice")
+        assert not await store.delete(session.session_id, "alice")
+
+    asyncio.run(scenario())
+
+
+def test_anonymous_sessions_are_bearer_ids():
+    store = SessionStore()
+
+    async def scenario():
+        session, _ = await store.get_or_create(None, None)
+        assert (await store.get_or_create(session.session_id, "bob")) == (session, False)
+
+    asyncio.run(scenario())
+
+
+def test_owner_survives_the_shared_tier():
+    tier = shared_tier()
+    first, second = SessionStore(shared=tier), SessionStore(shared=tier)
+
+    async def scenario():
+        session, _ = await first.get_or_create(None, "alice")
+        first.append(session, "user", "hello")
+        await asyncio.gather(*first._tasks)
+        first.save(session)
+        seen, created = await second.get_or_create(session.session_id, "alice")
+        assert not created
+        assert seen.history() == [{"role": "user", "content": "hello"}]
+        with pytest.raises(SessionAccessDenied):
+            await second.get_or_create(session.session_id, "bob")
+        with pytest.raises(SessionAccessDenied):
+            await SessionStore(shared=tier).delete(session.session_id, "bob")
+
+    asyncio.run(scenario())
+
+
+def test_overflow_is_summarized_in_a_tracked_task():
+    store = SessionStore(window_tokens=20)
+
+    async def scenario():
+        session, _ = await store.get_or_create(None, "alice")
+        for i in range(6):
+            store.append(session, "user", f"message number {i} about the museum and dinner plans")
+        assert session.summarizing
+        assert len(store._tasks) == 1
+        await asyncio.gather(*store._tasks)
+        return session
+
+    session = asyncio.run(scenario())
+    assert not session.summarizing
+    assert not session.overflow
+    assert session.summary
+    assert not store._tasks
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from streaming import within_deadline
+
+
+async def ticks(count: int, interval: float, closed: list):
+    try:
+        for i in range(count):
+            await asyncio.sleep(interval)
+            yield i
+    finally:
+        closed.append(True)
+
+
+async def collect(source, seconds: float, consumer_delay: float = 0.0) -> list:
+    items = []
+    async for item in within_deadline(source, seconds):
+        items.append(item)
+        await asyncio.sleep(consumer_delay)
+    return items
+
+
+def test_items_pass_through_within_deadline():
+    closed = []
+    assert asyncio.run(collect(ticks(3, 0.001, closed), 1.0)) == [0, 1, 2]
+    assert closed == [True]
+
+
+def test_slow_source_times_out_and_is_closed():
+    closed = []
+
+    async def scenario():
+        items = []
+        with pytest.raises(asyncio.TimeoutError):
+            async for item in within_deadline(ticks(100, 0.02, closed), 0.05):
+                items.append(item)
+        await asyncio.sleep(0.01)
+        return items
+
+    assert len(asyncio.run(scenario())) < 5
+    assert closed == [True]
+
+
+def test_slow_consumer_keeps_items_produced_in_time():
+    closed = []
+    # The consumer outlives the deadline, but every item was produced before it
+    assert asyncio.run(collect(ticks(3, 0.001, closed), 0.05, consumer_delay=0.05)) == [0, 1, 2]
+
+
+def test_source_errors_are_raised():
+    async def failing():
+        yield 1
+        raise ValueError("bad output")
+
+    with pytest.raises(ValueError, match="bad output"):
+        asyncio.run(collect(failing(), 1.0))
@@ -0,0 +1,47 @@
+import os
+import time
+from typing import Dict, Iterable
+
+# Retry interval bounds while waiting for a backend (e.g. Ollama) to come up
+WARMUP_RETRY_INITIAL = float(os.getenv("WARMUP_RETRY_INITIAL", "1"))
+WARMUP_RETRY_MAX = float(os.getenv("WARMUP_RETRY_MAX", "30"))
+
+
+class WarmupState:
+    """
+    Startup warm-up stages and their outcome. The readiness probe reports
+    ready only once every required stage has completed.
+    """
+
+    def __init__(self, stages: Iterable[str]):
+        self.started = time.monotonic()
+        self.completed: Dict[str, float] = {}
+        self.required = list(stages)
+        self.errors: Dict[str, str] = {}
+        self.attempts: Dict[str, int] = {}
+
+    def attempt(self, stage: str):
+        self.attempts[stage] = self.attempts.get(stage, 0) + 1
+
+    def done(self, stage: str):
+        self.completed[stage] = round(time.monotonic() - self.started, 3)
+        self.errors.pop(stage, None)
+
+    def failed(self, stage: str, error: Exception):
+        self.errors[stage] = str(error) or type(error).__name__
+
+    @property
+    def ready(self) -> bool:
+        return all(stage in self.completed for stage in self.required)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "ready": self.ready,
+            "stages": {
+                stage: "done" if stage in self.completed else "pending"
+                for stage in self.required
+            },
+            "seconds": self.completed,
+            "attempts": self.attempts,
+            "errors": self.errors
+        }
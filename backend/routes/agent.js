@@ -4,10 +4,72 @@ const { requireAuth } = require('../middleware/auth');
 
 const router = express.Router();
 
+// Identify the caller to the agent's per-user and per-IP rate limits
+const agentHeaders = (req, headers = {}) => ({
+  'Content-Type': 'application/json',
+  'X-User-Id': String(req.session.userId),
+  'X-Forwarded-For': req.ip,
+  ...headers
+});
+
+// Pass the agent's Retry-After on when it sheds a request with 429
+const forwardRetryAfter = (res, error) => {
+  if (error.response && error.response.headers['retry-after']) {
+    res.set('Retry-After', error.response.headers['retry-after']);
+  }
+};
+
+// Pipe a Server-Sent-Events response from the AI agent straight through so
+// events reach the browser as soon as the agent emits them
+const proxyEventStream = async (req, res, path, payload) => {
+  const aiAgentUrl = process.env.AI_AGENT_URL || 'http://ai-agent:8000';
+  const controller = new AbortController();
+  req.on('close', () => controller.abort());
+
+  const response = await axios.post(`${aiAgentUrl}${path}`, payload, {
+    responseType: 'stream',
+    signal: controller.signal,
+    headers: agentHeaders(req, { Accept: 'text/event-stream' })
+  });
+
+  res.status(response.status);
+  res.set({
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    Connection: 'keep-alive',
+    'X-Accel-Buffering': 'no'
+  });
+  res.flushHeaders();
+  response.data.pipe(res);
+};
+
+const handleStreamError = (res, error, fallbackMessage) => {
+  if (res.headersSent) {
+    return res.end();
+  }
+
+  if (error.code === 'ECONNREFUSED') {
+    return res.status(503).json({
+      error: 'AI Agent service is not available'
+    });
+  }
+
+  if (error.response && error.response.status === 429) {
+    forwardRetryAfter(res, error);
+    return res.status(429).json({
+      error: 'AI Agent is busy, please retry shortly'
+    });
+  }
+
+  res.status(500).json({
+    error: fallbackMessage
+  });
+};
+
 // Chat endpoint - for conversational AI agent
 router.post('/chat', requireAuth, async (req, res) => {
   try {
-    const { user_message, booking_context, conversation_history } = req.body;
+    const { user_message, booking_context, conversation_history, session_id } = req.body;
 
     // Validate required fields
     if (!user_message) {
@@ -21,12 +83,11 @@ router.post('/chat', requireAuth, async (req, res) => {
     const response = await axios.post(`${aiAgentUrl}/chat`, {
       user_message,
       booking_context: booking_context || null,
-      conversation_history: conversation_history || []
+      conversation_history: conversation_history || [],
+      session_id: session_id || null
     }, {
       timeout: 30000, // 30 second timeout for chat
-      headers: {
-        'Content-Type': 'application/json'
-      }
+      headers: agentHeaders(req)
     });
 
     res.json(response.data);
@@ -41,6 +102,7 @@ router.post('/chat', requireAuth, async (req, res) => {
     }
 
     if (error.response) {
+      forwardRetryAfter(res, error);
       return res.status(error.response.status).json({
         error: error.response.data.detail || 'AI Agent service error'
       });
@@ -66,16 +128,40 @@ router.post('/travel-plan', requireAuth, async (req, res) => {
 
     // Call AI agent service
     const aiAgentUrl = process.env.AI_AGENT_URL || 'http://ai-agent:8000';
+    const headers = agentHeaders(req);
+    if (req.headers['if-none-match']) {
+      headers['If-None-Match'] = req.headers['if-none-match'];
+    }
+    if (req.headers['x-latency-budget']) {
+      headers['X-Latency-Budget'] = req.headers['x-latency-budget'];
+    }
+
     const response = await axios.post(`${aiAgentUrl}/generate-plan`, {
       booking_context,
       preferences
     }, {
       timeout: 120000, // 120 second timeout
-      headers: {
-        'Content-Type': 'application/json'
+      headers,
+      // 304 means the caller's copy (matched by ETag) is still current
+      validateStatus: (status) => (status >= 200 && status < 300) || status === 304
+    });
+
+    if (response.headers.etag) {
+      res.set('ETag', response.headers.etag);
+      res.set('Cache-Control', 'private, no-cache');
+    }
+
+    // Which plan was served, and whether an AI upgrade is still generating
+    ['x-plan-source', 'x-plan-fallback', 'x-plan-upgrade'].forEach((name) => {
+      if (response.headers[name]) {
+        res.set(name, response.headers[name]);
       }
     });
 
+    if (response.status === 304) {
+      return res.status(304).end();
+    }
+
     res.json(response.data);
 
   } catch (error) {
@@ -88,6 +174,7 @@ router.post('/travel-plan', requireAuth, async (req, res) => {
     }
 
     if (error.response) {
+      forwardRetryAfter(res, error);
       return res.status(error.response.status).json({
         error: error.response.data.detail || 'AI Agent service error'
       });
@@ -99,4 +186,176 @@ router.post('/travel-plan', requireAuth, async (req, res) => {
   }
 });
 
+const handleJobError = (res, error, fallbackMessage) => {
+  if (error.code === 'ECONNREFUSED') {
+    return res.status(503).json({
+      error: 'AI Agent service is not available'
+    });
+  }
+
+  if (error.response) {
+    forwardRetryAfter(res, error);
+    return res.status(error.response.status).json({
+      error: error.response.data.detail || 'AI Agent service error'
+    });
+  }
+
+  res.status(500).json({
+    error: fallbackMessage
+  });
+};
+
+// Queue a travel plan; answers 202 with a job id instead of holding the
+// connection open while the plan is generated
+router.post('/travel-plan/jobs', requireAuth, async (req, res) => {
+  try {
+    const { booking_context, preferences } = req.body;
+
+    if (!booking_context || !preferences) {
+      return res.status(400).json({
+        error: 'booking_context and preferences are required'
+      });
+    }
+
+    const aiAgentUrl = process.env.AI_AGENT_URL || 'http://ai-agent:8000';
+    const response = await axios.post(`${aiAgentUrl}/plan-jobs`, {
+      booking_context,
+      preferences
+    }, {
+      timeout: 10000,
+      headers: agentHeaders(req)
+    });
+
+    res.set('Location', `${req.baseUrl}/travel-plan/jobs/${response.data.job_id}`);
+    if (response.headers['retry-after']) {
+      res.set('Retry-After', response.headers['retry-after']);
+    }
+    res.status(202).json(response.data);
+
+  } catch (error) {
+    console.error('AI Agent job submit error:', error.message);
+    handleJobError(res, error, 'Failed to queue travel plan');
+  }
+});
+
+// Poll a queued travel plan; the plan is in `result` once status is done
+router.get('/travel-plan/jobs/:jobId', requireAuth, async (req, res) => {
+  try {
+    const aiAgentUrl = process.env.AI_AGENT_URL || 'http://ai-agent:8000';
+    const response = await axios.get(
+      `${aiAgentUrl}/plan-jobs/${encodeURIComponent(req.params.jobId)}`,
+      { timeout: 10000, headers: agentHeaders(req) }
+    );
+
+    res.set('Cache-Control', 'no-store');
+    if (response.headers['retry-after']) {
+      res.set('Retry-After', response.headers['retry-after']);
+    }
+    res.json(response.data);
+
+  } catch (error) {
+    console.error('AI Agent job status error:', error.message);
+    handleJobError(res, error, 'Failed to get travel plan status');
+  }
+});
+
+// Later days of a long stay's plan, from the plan's next_cursor
+router.post('/travel-plan/days', requireAuth, async (req, res) => {
+  try {
+    const { booking_context, preferences, cursor, limit } = req.body;
+
+    if (!booking_context || !preferences || !cursor) {
+      return res.status(400).json({
+        error: 'booking_context, preferences and cursor are required'
+      });
+    }
+
+    const aiAgentUrl = process.env.AI_AGENT_URL || 'http://ai-agent:8000';
+    const response = await axios.post(`${aiAgentUrl}/generate-plan/days`, {
+      booking_context,
+      preferences,
+      cursor,
+      limit: limit || null
+    }, {
+      timeout: 60000,
+      headers: agentHeaders(req)
+    });
+
+    ['x-plan-source', 'x-plan-fallback'].forEach((name) => {
+      if (response.headers[name]) {
+        res.set(name, response.headers[name]);
+      }
+    });
+    res.json(response.data);
+
+  } catch (error) {
+    console.error('AI Agent plan days error:', error.message);
+    handleJobError(res, error, 'Failed to get more plan days');
+  }
+});
+
+// Streaming chat endpoint - emits the reply and plan sections as SSE events
+router.post('/chat/stream', requireAuth, async (req, res) => {
+  const { user_message, booking_context, conversation_history, session_id } = req.body;
+
+  if (!user_message) {
+    return res.status(400).json({
+      error: 'user_message is required'
+    });
+  }
+
+  try {
+    await proxyEventStream(req, res, '/chat/stream', {
+      user_message,
+      booking_context: booking_context || null,
+      conversation_history: conversation_history || [],
+      session_id: session_id || null
+    });
+  } catch (error) {
+    console.error('AI Agent chat stream error:', error.message);
+    handleStreamError(res, error, 'Failed to process chat message');
+  }
+});
+
+// Streaming travel plan endpoint - forwards LLM tokens and plan sections as SSE events
+router.post('/travel-plan/stream', requireAuth, async (req, res) => {
+  const { booking_context, preferences } = req.body;
+
+  if (!booking_context || !preferences) {
+    return res.status(400).json({
+      error: 'booking_context and preferences are required'
+    });
+  }
+
+  try {
+    await proxyEventStream(req, res, '/generate-plan/stream', {
+      booking_context,
+      preferences
+    });
+  } catch (error) {
+    console.error('AI Agent plan stream error:', error.message);
+    handleStreamError(res, error, 'Failed to generate travel plan');
+  }
+});
+
+// Location autocomplete backed by the agent's gazetteer
+router.get('/locations/suggest', requireAuth, async (req, res) => {
+  try {
+    const aiAgentUrl = process.env.AI_AGENT_URL || 'http://ai-agent:8000';
+    const response = await axios.get(`${aiAgentUrl}/locations/suggest`, {
+      params: { q: req.query.q || '', limit: req.query.limit || 8 },
+      timeout: 5000
+    });
+
+    if (response.headers['cache-control']) {
+      res.set('Cache-Control', response.headers['cache-control']);
+    }
+    res.json(response.data);
+
+  } catch (error) {
+    console.error('AI Agent location suggest error:', error.message);
+    handleJobError(res, error, 'Failed to suggest locations');
+  }
+});
+
 module.exports = router;
@@ -13,6 +13,8 @@ const AIAgent = ({ onClose }) => {
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
   const [userBookings, setUserBookings] = useState([]);
+  // Server-side conversation session; once set only the new message is sent
+  const [sessionId, setSessionId] = useState(null);
 
   // Auto-scroll to bottom when new messages arrive
   useEffect(() => {
@@ -84,14 +86,21 @@ const AIAgent = ({ onClose }) => {
 
     try {
       const bookingContext = getBookingContext();
-      const conversationHistory = messages.map(m => ({ role: m.role, content: m.content }));
+      const conversationHistory = sessionId
+        ? []
+        : messages.map(m => ({ role: m.role, content: m.content }));
 
       const response = await axios.post('/agent/chat', {
         user_message: userMsg,
         booking_context: bookingContext,
-        conversation_history: conversationHistory
+        conversation_history: conversationHistory,
+        session_id: sessionId
       });
 
+      if (response.data.session_id) {
+        setSessionId(response.data.session_id);
+      }
+
       // Add assistant response
       setMessages(prev => [...prev, { 
         role: 'assistant', 
@@ -185,7 +194,7 @@ const AIAgent = ({ onClose }) => {
             <div className="plan-summary">
               <p><strong>Activities:</strong> {currentTravelPlan.activity_cards?.length || 0}</p>
               <p><strong>Restaurants:</strong> {currentTravelPlan.restaurant_recommendations?.length || 0}</p>
-              <p><strong>Days:</strong> {currentTravelPlan.day_by_day_plan?.length || 0}</p>
+              <p><strong>Days:</strong> {currentTravelPlan.total_days || currentTravelPlan.day_by_day_plan?.length || 0}</p>
             </div>
           </div>
         )}
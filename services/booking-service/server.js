@@ -42,12 +42,15 @@ const handleBookingCreated = async (event) => {
     const result = await bookings.insertOne(booking);
     booking._id = result.insertedId;
     
-    // Publish booking created event for Owner service
+    // Publish booking created event for Owner service (and the AI agent,
+    // which precomputes a travel plan for the stay's location)
+    const property = await db.collection('properties').findOne({ _id: booking.property_id });
     await publishEvent(TOPICS.BOOKING_CREATED, {
       booking_id: result.insertedId.toString(),
       ...booking,
       property_id: booking.property_id.toString(),
-      traveler_id: booking.traveler_id.toString()
+      traveler_id: booking.traveler_id.toString(),
+      property_location: property ? property.location : null
     });
     
     console.log('Booking created:', result.insertedId);
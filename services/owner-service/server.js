@@ -139,10 +139,15 @@ app.put('/api/owner/bookings/:id/accept', verifyToken, async (req, res) => {
     );
 
     // Publish booking accepted event
+    // Stay details let the AI agent precompute the guest's travel plan
     await publishEvent(TOPICS.BOOKING_ACCEPTED, {
       booking_id: bookingId,
       property_id: booking.property_id.toString(),
       traveler_id: booking.traveler_id.toString(),
+      property_location: property.location,
+      check_in_date: booking.check_in_date,
+      check_out_date: booking.check_out_date,
+      number_of_guests: booking.number_of_guests,
       status: 'accepted'
     });
 